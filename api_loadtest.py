@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import random
+import http.client
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+import api_server
+import trust_metrics
+
+# API LOAD TEST
+# Serves synthetic aggregates from one server process pinned to one CPU core,
+# then hammers it from separate client processes over keep-alive connections.
+# Two scenarios: full 200 responses (gzip) and conditional polls (If-None-Match -> 304).
+#
+# Usage: python api_loadtest.py [rows] [seconds] [clients]
+
+PORT = int(os.getenv("API_LOADTEST_PORT", "8765"))
+PATHS = ["/v1/brief", "/v1/metrics", "/v1/signals?window=24H", "/v1/signals?window=7D", "/v1/trend?window=7D", "/v1/trend?window=90D"]
+
+
+def synthetic_frame(rows):
+    now = pd.Timestamp.now(tz='UTC')
+    rng = np.random.default_rng(7)
+    return pd.DataFrame({
+        "created_at": now - pd.to_timedelta(rng.random(rows) * api_server.HISTORY_DAYS * 86400, unit='s'),
+        "topic": rng.choice(["Economic Anxiety", "Institutional Integrity", "Identity Politics", "Public Competency", "Political Maneuvering"], rows),
+        "specific_trigger": rng.choice([f"Trigger {i}" for i in range(40)], rows),
+        "archetype": rng.choice(["Heartland Conservative", "Economic Pragmatist", "Urban Reformist", "Digital Cynic"], rows),
+        "impact_score": rng.normal(0, 1.2, rows),
+        "summary": "synthetic",
+    })
+
+
+def run_server(rows, ready):
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {0})
+    df = synthetic_frame(rows)
+    metrics = trust_metrics.TrustMetrics()
+    metrics.add_rows([{"created_at": t.isoformat(), "impact_score": v} for t, v in zip(df['created_at'], df['impact_score'])])
+    store = api_server.AggregateStore()
+    brief = {"content": {"headline": "Synthetic Brief"}, "net_trust_score": -0.3, "created_at": "2026-01-01T00:00:00"}
+    store.publish(api_server.build_payloads(df, brief, metrics), len(df))
+    print(f"🛰️ Server: {rows} rows -> {len(store.responses)} responses, built in {store.stats['last_build_ms']:.0f}ms (pinned to CPU 0)")
+    ready.set()
+    api_server.serve(store, PORT).serve_forever()
+
+
+def run_client(seconds, conditional, counter):
+    conn = http.client.HTTPConnection("127.0.0.1", PORT)
+    etags = {}
+    done = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        path = random.choice(PATHS)
+        headers = {"Accept-Encoding": "gzip"}
+        if conditional and path in etags:
+            headers["If-None-Match"] = etags[path]
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        if response.status == 200:
+            etags[path] = response.getheader("ETag")
+        done += 1
+    with counter.get_lock():
+        counter.value += done
+
+
+def scenario(name, seconds, clients, conditional):
+    counter = mp.Value("i", 0)
+    procs = [mp.Process(target=run_client, args=(seconds, conditional, counter)) for _ in range(clients)]
+    started = time.time()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    elapsed = time.time() - started
+    print(f"   {name:<28}{counter.value:>9} requests {counter.value / elapsed:>10.0f} req/s")
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    clients = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    ready = mp.Event()
+    server = mp.Process(target=run_server, args=(rows, ready), daemon=True)
+    server.start()
+    ready.wait()
+    time.sleep(0.3)
+
+    print(f"🔥 Load test: {clients} keep-alive clients x {seconds:.0f}s per scenario")
+    scenario("full body (200, gzip)", seconds, clients, conditional=False)
+    scenario("conditional poll (304)", seconds, clients, conditional=True)
+    server.terminate()
@@ -0,0 +1,243 @@
+import os
+import sys
+import json
+import gzip
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import pandas as pd
+import evidence_index
+import trust_metrics
+import downsample
+
+# READ-ONLY JSON API
+# Small standalone HTTP service for external consumers (newsroom tools) so they
+# stop scraping the dashboard or querying Supabase directly.
+# A background thread syncs new sentiment_logs rows incrementally (same path as
+# the dashboard's Evidence Log) and, only when something changed, rebuilds every
+# response body ONCE: JSON bytes, gzip bytes and a strong ETag. A request is a
+# dict lookup; a poll with a matching If-None-Match is an empty 304.
+#
+#   GET /v1/brief                  latest narrative_briefs entry
+#   GET /v1/metrics                window metrics for every window
+#   GET /v1/signals?window=24H     signal board tops (threats / wins / viral)
+#   GET /v1/trend?window=7D        downsampled trust trend (+ per-topic overlays)
+#   GET /v1/health                 build time, rows, refresh stats (not cached)
+#
+# Usage: python api_server.py [port]
+
+API_PORT = int(os.getenv("API_PORT", "8080"))
+REFRESH_SECONDS = int(os.getenv("API_REFRESH_SECONDS", "60"))
+CACHE_MAX_AGE = int(os.getenv("API_CACHE_MAX_AGE", "30"))
+HISTORY_DAYS = 90
+
+API_WINDOWS = {"24H": 1, "3D": 3, "7D": 7, "30D": 30, "90D": 90}
+DEFAULT_WINDOW = "24H"
+SIGNAL_TOP_N = 5
+
+
+def _signals(df):
+    neg = df[df['impact_score'] < 0]
+    pos = df[df['impact_score'] > 0]
+    return {
+        "voices": int(len(df)),
+        "threats": [{"trigger": k, "impact": round(float(v), 3)} for k, v in neg.groupby('specific_trigger')['impact_score'].sum().sort_values().head(SIGNAL_TOP_N).items()],
+        "wins": [{"trigger": k, "impact": round(float(v), 3)} for k, v in pos.groupby('specific_trigger')['impact_score'].sum().sort_values(ascending=False).head(SIGNAL_TOP_N).items()],
+        "viral": [{"trigger": k, "count": int(v)} for k, v in df['specific_trigger'].value_counts().head(SIGNAL_TOP_N).items()],
+    }
+
+
+def _trend(df):
+    def encode(series):
+        return {name: {"t": [ts.isoformat() for ts in x], "v": [round(float(y), 4) for y in values]} for name, (x, values) in series.items()}
+    return {
+        "trust": encode(downsample.trend_series(df)),
+        "by_topic": encode(downsample.trend_series(df, group_col='topic')),
+        "by_archetype": encode(downsample.trend_series(df, group_col='archetype')),
+    }
+
+
+def build_payloads(df, brief, metrics, now=None):
+    """
+    Every response body from one frame of rows (created_at as UTC datetimes).
+    Returns {path: python object}; pure, so it can be fed synthetic data.
+    """
+    now = now or time.time()
+    built_at = datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    payloads = {
+        "/v1/brief": {"brief": brief, "built_at": built_at},
+        "/v1/metrics": {"windows": {name: metrics.window(name, now) for name in API_WINDOWS}, "built_at": built_at},
+    }
+    cutoff_base = pd.Timestamp(now, unit='s', tz='UTC')
+    for name, days in API_WINDOWS.items():
+        window_df = df[df['created_at'] >= cutoff_base - pd.Timedelta(days=days)] if not df.empty else df
+        if window_df.empty:
+            payloads[f"/v1/signals?window={name}"] = {"window": name, "voices": 0, "threats": [], "wins": [], "viral": [], "built_at": built_at}
+            payloads[f"/v1/trend?window={name}"] = {"window": name, "trust": {}, "by_topic": {}, "by_archetype": {}, "built_at": built_at}
+            continue
+        payloads[f"/v1/signals?window={name}"] = {"window": name, **_signals(window_df), "built_at": built_at}
+        payloads[f"/v1/trend?window={name}"] = {"window": name, **_trend(window_df), "built_at": built_at}
+    return payloads
+
+
+class Response:
+    __slots__ = ("body", "gzipped", "etag")
+
+    def __init__(self, obj):
+        self.body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.gzipped = gzip.compress(self.body, 6)
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+
+
+class AggregateStore:
+    """Serialized responses, swapped atomically after each rebuild."""
+
+    def __init__(self):
+        self.responses = {}
+        self.stats = {"builds": 0, "last_build_ms": 0.0, "last_refresh_at": None, "rows": 0, "refresh_errors": 0}
+
+    def publish(self, payloads, rows):
+        started = time.perf_counter()
+        responses = {path: Response(obj) for path, obj in payloads.items()}
+        self.responses = responses  # single reference swap, readers never see a half-built set
+        self.stats["builds"] += 1
+        self.stats["rows"] = rows
+        self.stats["last_build_ms"] = (time.perf_counter() - started) * 1000
+
+    def get(self, path):
+        return self.responses.get(path)
+
+
+class Refresher:
+    """Incremental Supabase sync + rebuild only when the data version changes."""
+
+    def __init__(self, supabase, store, interval=REFRESH_SECONDS):
+        self.supabase = supabase
+        self.store = store
+        self.interval = interval
+        self.index = evidence_index.EvidenceIndex()
+        self.metrics = trust_metrics.TrustMetrics()
+        self.version = None
+        self._stop = threading.Event()
+
+    def _latest_brief(self):
+        response = self.supabase.table("narrative_briefs") \
+            .select("content, net_trust_score, created_at") \
+            .order("created_at", desc=True) \
+            .limit(1) \
+            .execute()
+        return response.data[0] if response.data else None
+
+    def refresh(self, now=None):
+        now = now or time.time()
+        cutoff = datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None) - timedelta(days=HISTORY_DAYS)
+        evidence_index.sync_from_supabase(self.index, self.supabase, cutoff.isoformat(), on_rows=self.metrics.add_rows)
+        brief = self._latest_brief()
+        # The hour is part of the version: windows slide even when no new rows arrive
+        version = (self.index.watermark, len(self.index), brief and brief.get("created_at"), int(now // 3600))
+        self.store.stats["last_refresh_at"] = now
+        if version == self.version and self.store.responses:
+            return False
+
+        # Trim expired rows roughly once a day (index timestamps are UTC epoch seconds)
+        cutoff_ts = now - HISTORY_DAYS * 86400
+        if len(self.index) and self.index.timestamps[0] < cutoff_ts - 86400:
+            self.index.compact(cutoff_ts)
+        df = evidence_index.to_frame(self.index)
+
+        self.store.publish(build_payloads(df, brief, self.metrics, now), len(df))
+        self.version = version
+        print(f"🛰️ API aggregates rebuilt: {len(df)} rows, {len(self.store.responses)} responses in {self.store.stats['last_build_ms']:.0f}ms")
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                self.store.stats["refresh_errors"] += 1
+                print(f"⚠️ API refresh failed (serving previous aggregates): {e}")
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def make_handler(store):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive for pollers
+        disable_nagle_algorithm = True  # Headers and body go out as separate writes
+
+        def _send(self, status, headers, body=b""):
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body and self.command != "HEAD":
+                self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/v1/health":
+                body = json.dumps(dict(store.stats, responses=len(store.responses))).encode("utf-8")
+                return self._send(200, {"Content-Type": "application/json", "Cache-Control": "no-store"}, body)
+
+            key = url.path
+            if url.path in ("/v1/signals", "/v1/trend"):
+                window = (parse_qs(url.query).get("window") or [DEFAULT_WINDOW])[0].upper()
+                key = f"{url.path}?window={window}"
+            response = store.get(key)
+            if response is None:
+                body = json.dumps({"error": "not found" if store.responses else "warming up"}).encode("utf-8")
+                return self._send(404 if store.responses else 503, {"Content-Type": "application/json", "Cache-Control": "no-store"}, body)
+
+            headers = {
+                "ETag": response.etag,
+                "Cache-Control": f"public, max-age={CACHE_MAX_AGE}",
+                "Vary": "Accept-Encoding",
+                "Access-Control-Allow-Origin": "*",
+            }
+            if response.etag in (self.headers.get("If-None-Match") or ""):
+                return self._send(304, headers)
+
+            headers["Content-Type"] = "application/json; charset=utf-8"
+            if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+                headers["Content-Encoding"] = "gzip"
+                return self._send(200, headers, response.gzipped)
+            return self._send(200, headers, response.body)
+
+        do_HEAD = do_GET
+
+        def log_message(self, format, *args):
+            pass  # One line per poll would drown the refresh logs
+
+    return Handler
+
+
+def serve(store, port=API_PORT):
+    server = ThreadingHTTPServer(("0.0.0.0", port), make_handler(store))
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    import storage
+
+    load_dotenv()
+
+    store = AggregateStore()
+    refresher = Refresher(storage.connect(), store)
+    refresher.refresh()
+    refresher.start()
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else API_PORT
+    print(f"🛰️ Kacang Kantoi API listening on :{port}")
+    serve(store, port).serve_forever()
@@ -1,11 +1,15 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from supabase import create_client, Client
 import os
+import time
+import threading
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+import evidence_index
+import trust_metrics
+import dashboard_figures
+import storage
+import scenario_engine
 
 # 1. CONFIGURATION
 st.set_page_config(
@@ -15,41 +19,22 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 load_dotenv()
+render_started = time.perf_counter()
 
-# 2. DESIGN SYSTEM (CSS)
-st.markdown("""
-<style>
-    /* IMPORT FONTS: Rubik (Headlines) & Inter (Body) */
-    @import url('https://fonts.googleapis.com/css2?family=Rubik:wght@400;500;700;900&family=Inter:wght@300;400;600;800&display=swap');
+# How often the (cheap) freshness probe hits Supabase. Everything heavier is
+# keyed on the freshness token, so it is rebuilt only when new data lands.
+FRESHNESS_TTL_SECONDS = 60
+
+# Evidence Log: searchable history depth and rows sent to the browser per page
+EVIDENCE_INDEX_DAYS = 90
+EVIDENCE_PAGE_SIZE = 25
 
+# 2. DESIGN SYSTEM (CSS)
+st.markdown("<style>" + dashboard_figures.DESIGN_CSS + """
     /* GLOBAL RESET */
     .stApp { background-color: #050505; font-family: 'Inter', sans-serif; }
     .block-container { padding-top: 2rem !important; padding-bottom: 5rem !important; }
 
-    /* --- HERO CARD --- */
-    .hero-card {
-        background-color: #FFFFFF;
-        border: 1px solid #222;
-        border-left: 10px solid #FFC107; /* Brand Yellow */
-        padding: 3rem;
-        border-radius: 2px;
-        margin-bottom: 2rem;
-    }
-    .hero-label {
-        color: #FFC107; font-family: 'Rubik', sans-serif; font-weight: 700;
-        letter-spacing: 2px; font-size: 0.9rem; text-transform: uppercase; margin-bottom: 10px;
-    }
-    .hero-title {
-        font-family: 'Rubik', sans-serif; font-size: 4.5rem !important; font-weight: 900 !important;
-        color: #000000 !important; text-transform: uppercase; line-height: 0.9;
-    }
-    .hero-title-highlight { color: #FFC107 !important; }
-    .hero-copy {
-        font-family: 'Inter', sans-serif; font-size: 1.15rem; color: #222; font-weight: 500;
-        line-height: 1.6; margin-top: 1.5rem; max-width: 800px;
-        border-left: 4px solid #000; padding-left: 20px;
-    }
-
     /* --- METRICS --- */
     [data-testid="stMetricLabel"] {
         font-family: 'Rubik', sans-serif; color: #888; font-size: 0.8rem !important;
@@ -59,52 +44,6 @@ st.markdown("""
         font-family: 'Rubik', sans-serif; color: #FFF; font-size: 2.5rem !important; font-weight: 700;
     }
 
-    /* --- SIGNAL BOARD --- */
-    .signal-title {
-        font-family: 'Rubik', sans-serif; color: #FFF; font-size: 1rem; font-weight: 700; 
-        text-transform: uppercase; margin-bottom: 10px; border-bottom: 2px solid #333; padding-bottom: 5px;
-    }
-    .signal-item {
-        font-family: 'Inter', sans-serif; font-size: 0.9rem; color: #CCC; 
-        margin-bottom: 5px; display: flex; justify-content: space-between;
-    }
-    .signal-score-pos { color: #00E396; font-weight: 700; }
-    .signal-score-neg { color: #FF4560; font-weight: 700; }
-
-    /* --- NARRATIVE BOX --- */
-    .narrative-box {
-        background-color: #111; 
-        border: 1px solid #333; 
-        border-left: 4px solid #FFC107;
-        padding: 20px; 
-        height: 100%;
-        margin-top: -15px; 
-    }
-    .narrative-header {
-        font-family: 'Rubik', sans-serif; color: #FFF; font-weight: 900; 
-        text-transform: uppercase; font-size: 1.3rem; margin-bottom: 5px; letter-spacing: 0.5px;
-    }
-    .narrative-sub {
-        font-family: 'Rubik', sans-serif; color: #FFC107; font-size: 0.75rem;
-        text-transform: uppercase; letter-spacing: 2px; margin-bottom: 10px; font-weight: 700;
-    }
-    .narrative-text {
-        font-family: 'Inter', sans-serif; color: #CCC; font-size: 1rem; line-height: 1.4; font-style: italic;
-    }
-
-    /* --- SPACER --- */
-    .spacer { margin-top: 40px; }
-
-    /* --- CHART HEADERS --- */
-    h3 {
-        font-family: 'Rubik', sans-serif; color: #FFF !important; text-transform: uppercase;
-        font-weight: 900 !important; font-size: 2rem !important; margin-top: 50px !important;
-        border-left: 6px solid #FFC107; padding-left: 15px;
-    }
-    .chart-caption {
-        font-family: 'Inter', sans-serif; color: #888; font-size: 0.95rem; margin-bottom: 25px; margin-left: 22px; max-width: 650px;
-    }
-
     /* --- CUSTOM TIME SELECTOR (THE TOGGLE BAR) --- */
     /* 1. Hide the label "Time Range:" */
     div[data-testid="stRadio"] > label {
@@ -149,28 +88,36 @@ st.markdown("""
     div[role="radiogroup"] [data-checked="true"] + div p {
         color: #FFC107 !important;
     }
-    
-    /* --- METHODOLOGY --- */
-    .methodology-header {
-        color: #FFC107; font-family: 'Rubik'; text-transform: uppercase; margin-bottom: 5px; font-size: 1rem; margin-top: 20px;
-    }
-    .methodology-text {
-        font-family: 'Inter'; color: #CCC; font-size: 0.95rem; line-height: 1.6; margin-bottom: 10px;
-    }
 </style>
 """, unsafe_allow_html=True)
 
 # 3. INITIALIZE CONNECTION
 @st.cache_resource
 def init_connection():
-    if not os.getenv("SUPABASE_URL") or not os.getenv("SUPABASE_KEY"):
-        return None
-    return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    try:
+        return storage.connect()
+    except ValueError:
+        return None  # No credentials: dashboard runs in offline mode
 
 supabase = init_connection()
 
 # 4. DATA LOADING
-def load_data(days_filter=1):
+@st.cache_data(ttl=FRESHNESS_TTL_SECONDS, show_spinner=False)
+def get_data_version():
+    """Freshness token: newest sentiment_logs + narrative_briefs timestamps."""
+    if not supabase: return "offline"
+    try:
+        latest_log = supabase.table("sentiment_logs").select("created_at").order("created_at", desc=True).limit(1).execute()
+        latest_brief = supabase.table("narrative_briefs").select("created_at").order("created_at", desc=True).limit(1).execute()
+        log_ts = latest_log.data[0]['created_at'] if latest_log.data else ""
+        brief_ts = latest_brief.data[0]['created_at'] if latest_brief.data else ""
+        return f"{log_ts}|{brief_ts}"
+    except Exception:
+        # Fall back to a time bucket so a flaky probe can't pin stale data forever
+        return f"bucket-{int(time.time() // FRESHNESS_TTL_SECONDS)}"
+
+@st.cache_data(ttl=3600, max_entries=16, show_spinner=False)
+def load_data(days_filter=1, data_version=None):
     if not supabase: return pd.DataFrame()
     try:
         cutoff_date = (datetime.utcnow() - timedelta(days=days_filter)).isoformat()
@@ -189,7 +136,8 @@ def load_data(days_filter=1):
     except Exception as e:
         return pd.DataFrame()
 
-def load_intelligence():
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_intelligence(data_version=None):
     if not supabase: return None
     try:
         response = supabase.table("narrative_briefs") \
@@ -203,26 +151,49 @@ def load_intelligence():
     except:
         return None
 
+# 5. SHARED CHART PAYLOADS
+# Built once per (time window, data version) and shared read-only by every
+# session, so a traffic spike costs one build per refresh instead of one per viewer.
+@st.cache_resource(ttl=3600, max_entries=16, show_spinner=False)
+def build_dashboard_payload(days, data_version):
+    return dashboard_figures.build_payload(load_data(days, data_version))
+
+@st.cache_resource
+def get_evidence_index():
+    return evidence_index.EvidenceIndex()
+
+@st.cache_resource
+def get_trust_metrics():
+    """Sliding-window engine fed by the same incremental sync as the evidence index."""
+    return trust_metrics.TrustMetrics()
+
+@st.cache_resource(ttl=3600, max_entries=4, show_spinner=False)
+def refresh_evidence_index(data_version):
+    """Incrementally index rows that arrived since the last sync (once per data version, all sessions)."""
+    index = get_evidence_index()
+    if not supabase: return index
+    cutoff = datetime.utcnow() - timedelta(days=EVIDENCE_INDEX_DAYS)
+    try:
+        evidence_index.sync_from_supabase(index, supabase, cutoff.isoformat(), on_rows=get_trust_metrics().add_rows)
+    except Exception as e:
+        print(f"⚠️ Evidence index sync failed: {e}")
+    # Trim expired rows roughly once a day rather than on every sync (index timestamps are UTC epoch seconds)
+    cutoff_ts = (cutoff - datetime(1970, 1, 1)).total_seconds()
+    if len(index) and index.timestamps[0] < cutoff_ts - 86400:
+        index.compact(cutoff_ts)
+    return index
+
+@st.cache_resource
+def get_render_stats():
+    """Process-wide rerun timings, shared by all sessions (each session runs on its own thread: update under the lock)."""
+    return {"reruns": 0, "total_ms": 0.0, "max_ms": 0.0}, threading.Lock()
+
 # --- STATE ---
 if 'time_range' not in st.session_state:
     st.session_state['time_range'] = 1
 
 # --- HERO SECTION ---
-st.markdown(f"""
-<div class="hero-card">
-    <div class="hero-label">OUR MISSION</div>
-    <div class="hero-title">BEYOND THE <br><span class="hero-title-highlight">WAYANG.</span></div>
-    <div class="hero-copy">
-        <b>Kacang Kantoi</b> exists because Malaysian politics is theater. 
-        While politicians rely on 3R distractions and short memories, we rely on <b>receipts</b>.
-        <br><br>
-        We are the nation's <b>Memory Guard</b>. We track the gap between what they say in Parliament and what you feel on the street.
-        No jargon. No spin. Just the data.
-        <br><br>
-        <i>Simple. Snackable. Undeniable.</i>
-    </div>
-</div>
-""", unsafe_allow_html=True)
+st.markdown(dashboard_figures.HERO_HTML, unsafe_allow_html=True)
 
 # --- SECTION HEADER ---
 st.markdown("### THE REALITY CHECK")
@@ -238,31 +209,37 @@ time_option = st.radio(
 
 # LOGIC
 time_map = {"24H": 1, "3 Days": 3, "7 Days": 7, "30 Days": 30, "3 Months": 90}
+window_map = {"24H": "24H", "3 Days": "3D", "7 Days": "7D", "30 Days": "30D", "3 Months": "90D"}
 days_to_load = time_map[time_option]
 
-df = load_data(days_to_load)
-latest_intel = load_intelligence()
+data_version = get_data_version()
+latest_intel = load_intelligence(data_version)
+payload = build_dashboard_payload(days_to_load, data_version)
 
 # CAPTION
 st.markdown(f"<div class='chart-caption'>Audit of digital conversations over the last <b>{time_option}</b>.</div>", unsafe_allow_html=True)
 
-if not df.empty:
-    total_abs_impact = df['impact_score'].abs().sum()
-    
-    if total_abs_impact > 0:
-        resistance_vol = df[df['impact_score'] < 0]['impact_score'].abs().sum()
-        resistance_pct = (resistance_vol / total_abs_impact) * 100
-        consensus_pct = 100 - resistance_pct
+# Headline metrics: constant-time lookups on the sliding-window engine,
+# falling back to the chart payload until the first sync has landed
+refresh_evidence_index(data_version)
+window_stats = get_trust_metrics().window(window_map[time_option])
+
+if payload:
+    if window_stats['count']:
+        voices = window_stats['count']
+        resistance_pct = window_stats['resistance_pct']
+        consensus_pct = window_stats['consensus_pct']
     else:
-        resistance_pct = 0
-        consensus_pct = 0
+        voices = payload['voices']
+        resistance_pct = payload['resistance_pct']
+        consensus_pct = payload['consensus_pct']
     
     m1, m2, m3, m4 = st.columns(4)
     
     with m1:
         st.metric(
             "Voices Scanned", 
-            len(df), 
+            voices, 
             delta="Sample Size", 
             help="Total verified data points in the selected timeframe."
         )
@@ -284,17 +261,7 @@ if not df.empty:
     with m4:
         # NARRATIVE BOX
         if latest_intel:
-            content = latest_intel['content']
-            headline = content.get('headline', 'System Stable')
-            narrative = content.get('public_narrative', content.get('dominant_narrative', 'Analyzing data streams...'))
-            
-            st.markdown(f"""
-            <div class="narrative-box">
-                <div class="narrative-sub">THE BOTTOM LINE</div>
-                <div class="narrative-header">{headline}</div>
-                <div class="narrative-text">"{narrative}"</div>
-            </div>
-            """, unsafe_allow_html=True)
+            st.markdown(dashboard_figures.narrative_html(latest_intel), unsafe_allow_html=True)
         else:
             st.info("Initializing Analyst...")
 
@@ -306,20 +273,17 @@ if not df.empty:
         
         with c1:
             st.markdown('<div class="signal-title" style="color:#FF4560;">🔥 WHAT\'S BURNING (Issues)</div>', unsafe_allow_html=True)
-            threats = df[df['impact_score'] < 0].groupby('specific_trigger')['impact_score'].sum().sort_values().head(5)
-            for trigger, score in threats.items():
+            for trigger, score in payload['threats']:
                 st.markdown(f'<div class="signal-item"><span>{trigger}</span><span class="signal-score-neg">{score:.1f}</span></div>', unsafe_allow_html=True)
 
         with c2:
             st.markdown('<div class="signal-title" style="color:#00E396;">🛡️ WHAT\'S WORKING (Wins)</div>', unsafe_allow_html=True)
-            wins = df[df['impact_score'] > 0].groupby('specific_trigger')['impact_score'].sum().sort_values(ascending=False).head(5)
-            for trigger, score in wins.items():
+            for trigger, score in payload['wins']:
                 st.markdown(f'<div class="signal-item"><span>{trigger}</span><span class="signal-score-pos">+{score:.1f}</span></div>', unsafe_allow_html=True)
 
         with c3:
             st.markdown('<div class="signal-title" style="color:#FFC107;">⚡ GOING VIRAL (Trending)</div>', unsafe_allow_html=True)
-            velocity = df['specific_trigger'].value_counts().head(5)
-            for trigger, count in velocity.items():
+            for trigger, count in payload['viral']:
                 st.markdown(f'<div class="signal-item"><span>{trigger}</span><span style="color:#FFF;">{count} posts</span></div>', unsafe_allow_html=True)
 
 else:
@@ -332,20 +296,8 @@ with col_charts_1:
     st.markdown("### WHO IS TALKING?")
     st.markdown("<div class='chart-caption'><b>The Share of Voice.</b> Demographic split for the selected timeframe.</div>", unsafe_allow_html=True)
     
-    if not df.empty:
-        voice_data = df['archetype'].value_counts().reset_index()
-        voice_data.columns = ['archetype', 'count']
-        
-        color_map = {
-            "Digital Cynic": "#FFC107", "Urban Reformist": "#FFFFFF",
-            "Heartland Conservative": "#FFA500", "Economic Pragmatist": "#808080",
-            "Unknown": "#333333"
-        }
-        
-        fig_donut = px.pie(voice_data, values='count', names='archetype', hole=0.6, color='archetype', color_discrete_map=color_map)
-        fig_donut.update_layout(template="plotly_dark", showlegend=True, legend=dict(orientation="h", y=-0.2, font=dict(family="Rubik", size=11)), margin=dict(t=0, b=0, l=0, r=0), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
-        fig_donut.update_traces(textinfo='percent', textfont=dict(family="Rubik", size=14))
-        st.plotly_chart(fig_donut, use_container_width=True)
+    if payload:
+        st.plotly_chart(payload['fig_donut'], use_container_width=True)
 
 with col_charts_2:
     st.markdown("### THE HEATMAP")
@@ -357,70 +309,71 @@ with col_charts_2:
     </div>
     """, unsafe_allow_html=True)
     
-    if not df.empty:
-        radar_data = df.groupby('topic').agg(
-            volume=('topic', 'count'), 
-            avg_sentiment=('impact_score', 'mean'),
-            trigger=('specific_trigger', lambda x: x.mode()[0] if not x.mode().empty else "Various")
-        ).reset_index()
-        
-        fig_radar = px.scatter(
-            radar_data, x="volume", y="avg_sentiment", color="avg_sentiment", 
-            size="volume", text="trigger", color_continuous_scale="RdYlGn", 
-            range_color=[-2.5, 2.5], size_max=60
-        )
-        fig_radar.update_traces(textposition='top center', textfont=dict(family="Rubik", size=12, color="white"))
-        fig_radar.update_layout(template="plotly_dark", xaxis_title="How Loud Is It?", yaxis_title="How Angry Are They?", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', showlegend=False, font=dict(family="Rubik"))
-        fig_radar.add_hline(y=0, line_width=1, line_dash="dash", line_color="#555")
-        fig_radar.add_vline(x=radar_data['volume'].median(), line_width=1, line_dash="dash", line_color="#555")
-        st.plotly_chart(fig_radar, use_container_width=True)
+    if payload:
+        st.plotly_chart(payload['fig_radar'], use_container_width=True)
 
 # --- TRAJECTORY ---
 st.markdown("### TRAJECTORY OF TRUST")
 st.markdown(f"<div class='chart-caption'><b>Trend over the last {time_option}.</b> <span style='color:#FF4560'>Red Band</span> = Crisis. <span style='color:#00E396'>Green Band</span> = Safe.</div>", unsafe_allow_html=True)
 
-if not df.empty:
-    if days_to_load <= 3:
-        sample_rate = 'H'
-    elif days_to_load <= 7:
-        sample_rate = '4H'
-    else:
-        sample_rate = 'D'
+overlay_option = st.radio("Overlay:", ("Trust Score", "By Topic", "By Voter"), horizontal=True, label_visibility="collapsed")
+overlay_key = {"Trust Score": "fig_trend", "By Topic": "fig_trend_topic", "By Voter": "fig_trend_archetype"}[overlay_option]
 
-    df_trend = df.set_index('created_at').resample(sample_rate)['impact_score'].mean().reset_index()
-    
-    fig_trend = go.Figure()
-    fig_trend.add_trace(go.Scatter(
-        x=df_trend['created_at'], 
-        y=df_trend['impact_score'], 
-        mode='lines+markers', 
-        line=dict(color='#FFC107', width=4), 
-        marker=dict(size=6, color='#FFF', line=dict(width=2, color='#000')), 
-        name='Trust Score'
-    ))
-    
-    # Zones
-    fig_trend.add_hrect(y0=-2.5, y1=-0.5, fillcolor="red", opacity=0.1, layer="below", line_width=0)
-    fig_trend.add_hrect(y0=0.5, y1=2.5, fillcolor="green", opacity=0.1, layer="below", line_width=0)
-    
-    fig_trend.update_layout(
-        template="plotly_dark", 
-        yaxis_title="Net Trust Score", 
-        yaxis_range=[-3, 3], 
-        xaxis_title=None, 
-        paper_bgcolor='rgba(0,0,0,0)', 
-        plot_bgcolor='rgba(0,0,0,0)', 
-        font=dict(family="Rubik"), 
-        hovermode="x unified"
-    )
-    st.plotly_chart(fig_trend, use_container_width=True)
+if payload:
+    st.plotly_chart(payload[overlay_key], use_container_width=True)
 
 # --- EVIDENCE LOG ---
 st.markdown("### THE EVIDENCE LOG")
 st.markdown("<div class='chart-caption'>The receipts. This is the raw, unfiltered feed of what people are actually saying, verified by our system.</div>", unsafe_allow_html=True)
-if not df.empty:
-    feed_df = df[['created_at', 'topic', 'specific_trigger', 'archetype', 'impact_score', 'summary']].copy()
-    st.dataframe(feed_df, use_container_width=True, column_config={"created_at": st.column_config.DatetimeColumn("Timestamp", format="D MMM, HH:mm"), "impact_score": st.column_config.NumberColumn("Impact", format="%.2f")}, hide_index=True)
+if supabase:
+    index = refresh_evidence_index(data_version)
+
+    f1, f2, f3, f4 = st.columns([3, 2, 2, 1])
+    with f1:
+        search_query = st.text_input("Search", placeholder="Search the receipts: diesel, SST, 安华...", label_visibility="collapsed")
+    with f2:
+        topic_filter = st.selectbox("Topic", ["All Topics", "Economic Anxiety", "Institutional Integrity", "Identity Politics", "Public Competency", "Political Maneuvering"], label_visibility="collapsed")
+    with f3:
+        archetype_filter = st.selectbox("Voice", ["All Voices"] + [a for a in dashboard_figures.ARCHETYPE_COLORS if a != "Unknown"], label_visibility="collapsed")
+    with f4:
+        page_number = st.number_input("Page", min_value=1, value=1, step=1, label_visibility="collapsed")
+
+    since_ts = (datetime.utcnow() - timedelta(days=days_to_load) - datetime(1970, 1, 1)).total_seconds()
+    query_started = time.perf_counter()
+    total_matches, page_rows = index.search(
+        search_query,
+        topic=None if topic_filter == "All Topics" else topic_filter,
+        archetype=None if archetype_filter == "All Voices" else archetype_filter,
+        since=since_ts,
+        page=int(page_number) - 1,
+        page_size=EVIDENCE_PAGE_SIZE
+    )
+    query_ms = (time.perf_counter() - query_started) * 1000
+    total_pages = max((total_matches + EVIDENCE_PAGE_SIZE - 1) // EVIDENCE_PAGE_SIZE, 1)
+
+    if page_rows:
+        feed_df = pd.DataFrame(page_rows)
+        feed_df['created_at'] = pd.to_datetime(feed_df['created_at'])
+        st.dataframe(feed_df, use_container_width=True, column_config={"created_at": st.column_config.DatetimeColumn("Timestamp", format="D MMM, HH:mm"), "impact_score": st.column_config.NumberColumn("Impact", format="%.2f")}, hide_index=True)
+    else:
+        st.info("No receipts match this search.")
+    st.markdown(f"<div class='chart-caption'>{total_matches:,} receipts · page {int(page_number)} of {total_pages} · searched in {query_ms:.1f}ms</div>", unsafe_allow_html=True)
+
+# --- WHAT-IF SCENARIOS ---
+# Written by scenario_engine.py; the panel only appears once a run has saved results
+scenario_results = scenario_engine.load_results()
+if scenario_results:
+    with st.expander(f"🎲 WHAT-IF SCENARIOS (LAST {scenario_results['window_days']} DAYS)"):
+        st.dataframe(pd.DataFrame(scenario_engine.summary_rows(scenario_results)), use_container_width=True, hide_index=True, column_config={
+            "NTS p5": st.column_config.NumberColumn(format="%+.3f"),
+            "NTS p50": st.column_config.NumberColumn(format="%+.3f"),
+            "NTS p95": st.column_config.NumberColumn(format="%+.3f"),
+            "Δ p50": st.column_config.NumberColumn(format="%+.3f"),
+            "P(below now)": st.column_config.NumberColumn(format="%.2f"),
+            "Resistance %": st.column_config.NumberColumn(format="%.1f"),
+        })
+        st.markdown(f"<div class='chart-caption'>{scenario_results['trials']:,} trials per scenario over {scenario_results['rows']:,} rows · "
+                    f"observed NTS {scenario_results['observed_nts']:+.3f} · run {scenario_results['generated_at'][:16]} UTC</div>", unsafe_allow_html=True)
 
 # --- TRANSPARENCY REPORT ---
 with st.expander("📁 TRANSPARENCY REPORT: HOW WE WORK"):
@@ -457,4 +410,18 @@ How do we calculate the score?
 <br><br>
 <i>We do not predict the future. We audit the present.</i>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# --- RENDER TIMING ---
+render_ms = (time.perf_counter() - render_started) * 1000
+render_stats, render_lock = get_render_stats()
+with render_lock:
+    render_stats['reruns'] += 1
+    render_stats['total_ms'] += render_ms
+    render_stats['max_ms'] = max(render_stats['max_ms'], render_ms)
+    reruns, avg_ms, max_ms = render_stats['reruns'], render_stats['total_ms'] / render_stats['reruns'], render_stats['max_ms']
+print(f"⏱️ Rerun rendered in {render_ms:.0f}ms (window={time_option}, version={data_version}) | "
+      f"avg {avg_ms:.0f}ms, max {max_ms:.0f}ms over {reruns} reruns")
+if payload:
+    size = f", {payload['trend_bytes'][overlay_key] / 1024:.1f} KB" if 'trend_bytes' in payload else ""
+    print(f"📈 Trend chart ({overlay_option}): {payload['trend_points'][overlay_key]} points{size}")
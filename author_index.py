@@ -0,0 +1,201 @@
+import os
+import json
+import math
+import time
+import fcntl
+from contextlib import contextmanager
+import numpy as np
+
+# AUTHOR REACH INDEX
+# Rolling per-author aggregates (views, shares, posting rate, average impact),
+# updated incrementally: every scrape and every classification batch touches
+# only the authors in that batch. Rolling = exponentially decayed sums
+# (HALF_LIFE_DAYS), so nothing is ever recomputed from history.
+#   - View / share counts on a video are cumulative, so only the growth since
+#     the last scrape of that video is added to its author.
+#   - A video counts as a post once, when it is first seen.
+# Feeds a 0..1 author score into candidate triage and picks the accounts for
+# targeted author-level scrape jobs. Shared by worker processes (file lock).
+
+INDEX_PATH = os.getenv("AUTHOR_INDEX_PATH", os.path.join("state", "author_index.json"))
+HALF_LIFE_DAYS = float(os.getenv("AUTHOR_HALF_LIFE_DAYS", "7"))
+SHARE_WEIGHT = 20              # One share ~ this many views of reach
+IMPACT_SHARE = 0.3             # Author score = 70% reach rank + 30% |avg impact| rank
+VIDEO_RETENTION_DAYS = 30      # Per-video counters kept this long (for growth deltas)
+AUTHOR_RETENTION_DAYS = 60     # Authors not seen for this long are dropped
+
+_TAU_DAYS = HALF_LIFE_DAYS / math.log(2)  # Decayed sum / _TAU_DAYS = rate per day
+
+
+def _decay(value, since, now):
+    return value * 0.5 ** (max(now - since, 0) / (HALF_LIFE_DAYS * 86400))
+
+
+class AuthorIndex:
+    def __init__(self, authors=None, videos=None, pruned_at=0.0):
+        self.authors = authors or {}   # handle -> {views, shares, posts, impact_sum, impact_n, updated_at, profile}
+        self.videos = videos or {}     # video_id -> [handle, views, shares, last_seen]
+        self.pruned_at = pruned_at
+        self._scores = None
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("authors"), data.get("videos"), data.get("pruned_at", 0.0))
+
+    def save(self, path=INDEX_PATH):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"authors": self.authors, "videos": self.videos, "pruned_at": self.pruned_at}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    # --- WRITES (O(batch)) ---
+    def _touch(self, handle, profile, now):
+        a = self.authors.get(handle)
+        if a is None:
+            a = self.authors[handle] = {"views": 0.0, "shares": 0.0, "posts": 0.0, "impact_sum": 0.0, "impact_n": 0.0, "updated_at": now, "profile": profile}
+        else:
+            for key in ("views", "shares", "posts", "impact_sum", "impact_n"):
+                a[key] = _decay(a[key], a["updated_at"], now)
+            a["updated_at"] = now
+        if profile:
+            a["profile"] = profile
+        self._scores = None
+        return a
+
+    def add_videos(self, videos, now=None):
+        """videos: dicts with id, author_handle, views, share_count (and profile). Returns authors touched."""
+        now = now if now is not None else time.time()
+        touched = set()
+        for v in videos:
+            handle = v.get("author_handle")
+            if not handle or handle == "unknown":
+                continue
+            video_id = str(v["id"])
+            views, shares = int(v.get("views") or 0), int(v.get("share_count") or 0)
+            seen = self.videos.get(video_id)
+            a = self._touch(handle, v.get("profile"), now)
+            if seen is None:
+                a["posts"] += 1
+                a["views"] += views
+                a["shares"] += shares
+            else:
+                # Only the growth since the last scrape (counts never go down for reach)
+                a["views"] += max(views - seen[1], 0)
+                a["shares"] += max(shares - seen[2], 0)
+            self.videos[video_id] = [handle, max(views, seen[1] if seen else 0), max(shares, seen[2] if seen else 0), now]
+            touched.add(handle)
+        return touched
+
+    def add_impacts(self, impacts, now=None):
+        """impacts: (author_handle, impact_score) pairs from one classification batch."""
+        now = now if now is not None else time.time()
+        for handle, impact in impacts:
+            if not handle or handle == "unknown":
+                continue
+            a = self._touch(handle, None, now)
+            a["impact_sum"] += float(impact)
+            a["impact_n"] += 1
+
+    def prune(self, now=None):
+        """Drop expired videos / authors (full pass, so at most once a day)."""
+        now = now if now is not None else time.time()
+        if now - self.pruned_at < 86400:
+            return
+        self.pruned_at = now
+        self.videos = {k: v for k, v in self.videos.items() if v[3] >= now - VIDEO_RETENTION_DAYS * 86400}
+        self.authors = {k: a for k, a in self.authors.items() if a["updated_at"] >= now - AUTHOR_RETENTION_DAYS * 86400}
+        self._scores = None
+
+    # --- READS ---
+    def stats(self, handle, now=None):
+        """Rolling rates for one author (per day), or None if unknown."""
+        a = self.authors.get(handle)
+        if a is None:
+            return None
+        now = now if now is not None else time.time()
+        views, shares, posts = (_decay(a[k], a["updated_at"], now) / _TAU_DAYS for k in ("views", "shares", "posts"))
+        return {
+            "views_per_day": views,
+            "shares_per_day": shares,
+            "posts_per_day": posts,
+            "avg_impact": a["impact_sum"] / a["impact_n"] if a["impact_n"] > 1e-9 else 0.0,
+            "reach": views + SHARE_WEIGHT * shares,
+            "profile": a.get("profile"),
+        }
+
+    def _rank_table(self, now):
+        """{handle: score}, score in 0..1 from reach rank and |avg impact| rank."""
+        handles = list(self.authors)
+        if not handles:
+            return {}
+        reach = np.empty(len(handles))
+        impact = np.empty(len(handles))
+        for i, h in enumerate(handles):
+            a = self.authors[h]
+            factor = 0.5 ** (max(now - a["updated_at"], 0) / (HALF_LIFE_DAYS * 86400))
+            reach[i] = (a["views"] + SHARE_WEIGHT * a["shares"]) * factor
+            impact[i] = abs(a["impact_sum"] / a["impact_n"]) if a["impact_n"] > 1e-9 else 0.0
+        n = max(len(handles) - 1, 1)
+        reach_rank = np.argsort(np.argsort(reach, kind="stable"), kind="stable") / n
+        impact_rank = np.argsort(np.argsort(impact, kind="stable"), kind="stable") / n
+        score = (1 - IMPACT_SHARE) * reach_rank + IMPACT_SHARE * impact_rank
+        return dict(zip(handles, score.tolist()))
+
+    def scores(self, handles, now=None):
+        """Author score per handle (0 for unknown authors), as a NumPy array aligned with handles."""
+        if self._scores is None:
+            self._scores = self._rank_table(now if now is not None else time.time())
+        return np.array([self._scores.get(h, 0.0) for h in handles], dtype=np.float64)
+
+    def top_authors(self, n, profile=None, now=None):
+        """Highest-reach handles (optionally within one profile partition)."""
+        now = now if now is not None else time.time()
+        ranked = []
+        for handle in self.authors:
+            s = self.stats(handle, now)
+            if profile and s["profile"] not in (None, profile):
+                continue
+            ranked.append((s["reach"], handle))
+        ranked.sort(reverse=True)
+        return [handle for _, handle in ranked[:n]]
+
+
+@contextmanager
+def updating(path=INDEX_PATH):
+    """Load, yield and save the index under an exclusive lock (worker processes share it)."""
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            index = AuthorIndex.load(path)
+            yield index
+            index.save(path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def record_videos(videos, path=INDEX_PATH):
+    """Fold one batch of saved videos into the index. Called from save_results."""
+    started = time.perf_counter()
+    with updating(path) as index:
+        touched = index.add_videos(videos)
+        index.prune()
+    print(f"👤 Author index: {len(touched)} authors updated ({len(index.authors)} tracked) in {(time.perf_counter() - started) * 1000:.0f}ms.")
+    return index
+
+
+def record_impacts(impacts, path=INDEX_PATH):
+    """Fold one classification batch's (author, impact) pairs into the index."""
+    if not impacts:
+        return
+    with updating(path) as index:
+        index.add_impacts(impacts)
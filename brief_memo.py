@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import hashlib
+
+# BRIEF MEMO (Evidence Fingerprinting)
+# A brief is a pure function of its evidence packet: the trust scores plus the
+# rows selected as evidence. If the same rows are selected again and the scores
+# have only drifted within tolerance, the previous brief is reused instead of
+# paying Gemini to rewrite the same story.
+
+MEMO_PATH = os.getenv("BRIEF_MEMO_PATH", os.path.join("state", "brief_memo.json"))
+DRIFT_TOLERANCE = float(os.getenv("BRIEF_DRIFT_TOLERANCE", "0.05"))  # Max |score change| still "unchanged"
+MEMO_SIZE = 20
+
+
+def evidence_key(evidence_ids):
+    """Order-independent hash of the selected evidence rows."""
+    ids = sorted(str(i) for i in evidence_ids)
+    return hashlib.sha256(json.dumps(ids).encode("utf-8")).hexdigest()[:16]
+
+
+def _load():
+    if os.path.exists(MEMO_PATH):
+        with open(MEMO_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    return {"entries": [], "lookups": 0, "hits": 0}
+
+
+def _save(memo):
+    folder = os.path.dirname(MEMO_PATH)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = MEMO_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(memo, f, ensure_ascii=False)
+    os.replace(tmp_path, MEMO_PATH)
+
+
+def lookup(scores, evidence_ids, tolerance=DRIFT_TOLERANCE):
+    """
+    scores: dict of named scores, e.g. {"current": .., "gap_yesterday": .., "gap_last_week": ..}
+    Returns {"brief": .., "live": bool} for an unchanged packet, or None. "live" is
+    True only when the match is the newest entry, i.e. the brief currently published;
+    an older match still has to be re-published (without a Gemini call).
+    """
+    memo = _load()
+    memo["lookups"] += 1
+    key = evidence_key(evidence_ids)
+
+    hit = None
+    for entry in reversed(memo["entries"]):
+        if entry["evidence_key"] != key or set(entry["scores"]) != set(scores):
+            continue
+        if all(abs(entry["scores"][name] - value) <= tolerance for name, value in scores.items()):
+            hit = entry
+            break
+
+    if hit:
+        memo["hits"] += 1
+    _save(memo)
+
+    rate = memo["hits"] / memo["lookups"] * 100
+    live = hit is not None and hit is memo["entries"][-1]
+    status = ("HIT (live brief)" if live else "HIT (re-publishing an earlier brief)") if hit else "MISS"
+    print(f"🧾 Brief memo {status} | evidence {key} | hit rate {rate:.0f}% ({memo['hits']}/{memo['lookups']})")
+    return {"brief": hit["brief"], "live": live} if hit else None
+
+
+def store(scores, evidence_ids, brief):
+    """Record a published brief as the newest entry (replacing any entry for the same evidence)."""
+    memo = _load()
+    key = evidence_key(evidence_ids)
+    memo["entries"] = [e for e in memo["entries"] if e["evidence_key"] != key]
+    memo["entries"].append({
+        "evidence_key": key,
+        "scores": scores,
+        "brief": brief,
+        "stored_at": time.time(),
+    })
+    memo["entries"] = memo["entries"][-MEMO_SIZE:]
+    _save(memo)
+
+
+def stats():
+    memo = _load()
+    return {
+        "lookups": memo["lookups"],
+        "hits": memo["hits"],
+        "hit_rate": memo["hits"] / memo["lookups"] if memo["lookups"] else 0.0,
+    }
@@ -0,0 +1,416 @@
+import os
+import sys
+import json
+import time
+import hashlib
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from google import genai
+from google.genai import types
+from dotenv import load_dotenv
+import evidence_packer
+import tracing
+import cassette
+import storage
+import gemini_quota
+
+# HIERARCHICAL BRIEFS (Map-Reduce over days)
+# Weekly / monthly / quarterly briefs are never written from raw rows:
+#   1. Day digest (no LLM): that day's latest narrative_briefs entry plus one
+#      per-topic line (volume, net impact, top triggers, strongest threat / win).
+#      Bounded size whatever the day's volume; cached once the day is over.
+#      Each digest records the highest sentiment_logs id it covers; rows that land
+#      later in a finished day (outbox replays, other workers) have bigger ids, so
+#      every run checks the ids above the watermark and rebuilds the days they hit.
+#      scoring.rescore drops the cached digests (their impact sums are stale).
+#   2. Week summary (1 Gemini call per calendar week): reduces its 7 day digests.
+#   3. Horizon brief (1 call per horizon per day): reduces the week summaries
+#      inside the horizon plus the leftover days at its edges.
+# Every level is cached in state/brief_rollup.json, keyed on a hash of its
+# inputs, so an hourly run only pays when a day rolls over. Token cost grows
+# with the number of days (and weeks), not with the number of rows.
+#
+# Output: one row per horizon in the horizon_briefs table
+#   (horizon, period_start, period_end, content, net_trust_score, input_key, created_at).
+#
+# Usage: python brief_rollup.py [7D 30D 90D]
+
+load_dotenv()
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+if not GEMINI_API_KEY:
+    raise ValueError("❌ Missing API Keys. Check your .env file.")
+
+client = cassette.wrap_gemini(genai.Client(api_key=GEMINI_API_KEY))
+supabase = cassette.wrap_supabase(storage.connect())
+
+GEMINI_MODEL = 'gemini-2.0-flash'
+ROLLUP_PATH = os.getenv("BRIEF_ROLLUP_PATH", os.path.join("state", "brief_rollup.json"))
+
+HORIZONS = {"7D": 7, "30D": 30, "90D": 90}
+KEEP_DAYS = max(HORIZONS.values()) + 14   # Cache entries older than this are pruned
+TRIGGERS_PER_TOPIC = 3
+PAGE_SIZE = 1000
+ID_LOOKBACK = 500   # Ids re-read below the watermark (they become visible at commit, not in order)
+
+
+def _load():
+    if os.path.exists(ROLLUP_PATH):
+        with open(ROLLUP_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    return {"days": {}, "weeks": {}, "horizons": {}}
+
+
+def _save(cache):
+    folder = os.path.dirname(ROLLUP_PATH)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = ROLLUP_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(tmp_path, ROLLUP_PATH)
+
+
+def _input_key(*parts):
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+# --- LEVEL 1: DAY DIGESTS (no LLM) ---
+def _fetch_day_rows(day):
+    start = f"{day}T00:00:00"
+    end = f"{(datetime.fromisoformat(day) + timedelta(days=1)).date().isoformat()}T00:00:00"
+    rows, offset = [], 0
+    while True:
+        response = supabase.table("sentiment_logs") \
+            .select("id, topic, specific_trigger, summary, impact_score") \
+            .gte("created_at", start) \
+            .lt("created_at", end) \
+            .order("created_at") \
+            .range(offset, offset + PAGE_SIZE - 1) \
+            .execute()
+        page = response.data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+
+    brief = supabase.table("narrative_briefs") \
+        .select("content, net_trust_score, created_at") \
+        .gte("created_at", start) \
+        .lt("created_at", end) \
+        .order("created_at", desc=True) \
+        .limit(1) \
+        .execute()
+    return rows, (brief.data[0] if brief.data else None)
+
+
+def build_day_digest(day, rows, brief):
+    """Fixed-size digest of one day: totals, the day's brief headline, one entry per topic."""
+    by_topic = defaultdict(list)
+    for r in rows:
+        by_topic[r.get("topic") or "Uncategorized"].append(r)
+
+    topics = []
+    for topic, topic_rows in sorted(by_topic.items(), key=lambda kv: -len(kv[1])):
+        impacts = [float(r.get("impact_score") or 0) for r in topic_rows]
+        triggers = defaultdict(float)
+        for r, impact in zip(topic_rows, impacts):
+            triggers[r.get("specific_trigger") or "General"] += impact
+        top_triggers = sorted(triggers.items(), key=lambda kv: -abs(kv[1]))[:TRIGGERS_PER_TOPIC]
+        worst = min(topic_rows, key=lambda r: float(r.get("impact_score") or 0))
+        best = max(topic_rows, key=lambda r: float(r.get("impact_score") or 0))
+        topics.append({
+            "topic": topic,
+            "count": len(topic_rows),
+            "net": round(sum(impacts), 2),
+            "avg": round(sum(impacts) / len(impacts), 3),
+            "triggers": [[name, round(value, 1)] for name, value in top_triggers],
+            "threat": worst.get("summary") if float(worst.get("impact_score") or 0) < 0 else None,
+            "win": best.get("summary") if float(best.get("impact_score") or 0) > 0 else None,
+        })
+
+    total_impact = sum(t["net"] for t in topics)
+    count = sum(t["count"] for t in topics)
+    content = (brief or {}).get("content") or {}
+    ids = [r["id"] for r in rows if isinstance(r.get("id"), int)]
+    return {
+        "day": day,
+        "count": count,
+        "max_id": max(ids) if ids else None,
+        "impact_sum": round(total_impact, 3),
+        "nts": round(total_impact / count, 3) if count else 0.0,
+        "headline": content.get("headline"),
+        "narrative": content.get("public_narrative") or content.get("dominant_narrative"),
+        "topics": topics,
+    }
+
+
+def encode_day(digest):
+    """Compact prompt lines for one day digest (~100-200 tokens whatever the row count)."""
+    lines = [f"{digest['day']} | n={digest['count']} | NTS {digest['nts']:+.2f}"
+             + (f" | brief: \"{digest['headline']}\" {digest['narrative'] or ''}" if digest.get('headline') else "")]
+    for t in digest["topics"]:
+        code = evidence_packer.TOPIC_CODES.get(t["topic"], t["topic"])
+        triggers = ", ".join(f"{name}({value:+.0f})" for name, value in t["triggers"])
+        line = f"  {code} n={t['count']} avg {t['avg']:+.2f} | {triggers}"
+        if t["threat"]:
+            line += f" | worst: {' '.join(t['threat'].split())}"
+        if t["win"]:
+            line += f" | best: {' '.join(t['win'].split())}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+@tracing.traced("rollup.stale_days", "net")
+def drop_stale_days(cache, days, today):
+    """
+    Remove cached digests of finished days that gained rows since they were built
+    (or predate the id watermark). Returns the dropped days.
+    """
+    dropped = sorted(d for d in days if d in cache["days"] and "max_id" not in cache["days"][d])
+    for day in dropped:
+        del cache["days"][day]
+    last_id = cache.get("last_id")
+    if last_id is None:
+        return dropped
+
+    newest = last_id
+    after = max(last_id - ID_LOOKBACK, 0)
+    while True:
+        rows = supabase.table("sentiment_logs") \
+            .select("id, created_at") \
+            .gt("id", after) \
+            .gte("created_at", f"{days[0]}T00:00:00") \
+            .lt("created_at", f"{today}T00:00:00") \
+            .order("id") \
+            .limit(PAGE_SIZE) \
+            .execute().data or []
+        for r in rows:
+            day = str(r["created_at"])[:10]
+            digest = cache["days"].get(day)
+            if digest is not None and (digest["max_id"] is None or r["id"] > digest["max_id"]):
+                del cache["days"][day]
+                dropped.append(day)
+        if rows:
+            after = rows[-1]["id"]
+            newest = max(newest, after)
+        if len(rows) < PAGE_SIZE:
+            break
+    cache["last_id"] = newest
+    return dropped
+
+
+@tracing.traced("rollup.days")
+def day_digests(cache, days, today):
+    """Digests for the given days; completed days are computed once and cached."""
+    digests = []
+    for day in days:
+        cached = cache["days"].get(day)
+        if cached is None or day >= today:
+            with tracing.span("supabase.select.day", "net", day=day):
+                rows, brief = _fetch_day_rows(day)
+            cached = build_day_digest(day, rows, brief)
+            if day < today:
+                cache["days"][day] = cached
+                if cached["max_id"] is not None:
+                    cache["last_id"] = max(cache.get("last_id") or 0, cached["max_id"])
+        digests.append(cached)
+    return digests
+
+
+# --- GEMINI REDUCE ---
+def _generate(prompt, expected_output=400):
+    response = gemini_quota.call(GEMINI_MODEL, evidence_packer.estimate_tokens(prompt) + expected_output, lambda: client.models.generate_content(
+        model=GEMINI_MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            temperature=0.3,
+            response_mime_type="application/json"
+        )
+    ), retries=3)
+    usage = getattr(response, "usage_metadata", None)
+    tokens = (getattr(usage, "prompt_token_count", 0) or 0) + (getattr(usage, "candidates_token_count", 0) or 0)
+    try:
+        result = json.loads(response.text.strip())
+    except ValueError:
+        result = json.loads(response.text.replace('```json', '').replace('```', ''))
+    if isinstance(result, list):
+        result = result[0]
+    return result, tokens
+
+
+def _score(digests):
+    count = sum(d["count"] for d in digests)
+    return sum(d["impact_sum"] for d in digests) / count if count else 0.0, count
+
+
+# --- LEVEL 2: WEEK SUMMARIES ---
+@tracing.traced("rollup.week", "net")
+def week_summary(cache, week_start, digests, stats):
+    key = _input_key("week", [d["day"] for d in digests], [d["impact_sum"] for d in digests], [d["headline"] for d in digests])
+    cached = cache["weeks"].get(week_start)
+    if cached and cached["input_key"] == key:
+        stats["cached"] += 1
+        return cached
+
+    nts, count = _score(digests)
+    prompt = f"""
+        You are the "Memory Guard" for Kacang Kantoi, auditing Malaysian political sentiment.
+        Below are DAILY DIGESTS for the week starting {week_start} (topic codes: {", ".join(f"{c}={t}" for t, c in evidence_packer.TOPIC_CODES.items())}).
+        Week Net Trust Score: {nts:+.2f} over {count} signals (scale -2.5 to +2.5).
+
+        {chr(10).join(encode_day(d) for d in digests)}
+
+        TASK: Reduce the week to what a reader must remember. Name what moved the score, when, and whether it faded or stuck.
+
+        OUTPUT JSON ONLY:
+        {{
+            "headline": "5 words max",
+            "summary": "3 sentences max",
+            "key_drivers": ["max 3 specific triggers"],
+            "turning_point": "the day and event that changed the week, or null"
+        }}
+        """
+    summary, tokens = _generate(prompt, 250)
+    stats["gemini_calls"] += 1
+    stats["tokens"] += tokens
+    cached = {"week_start": week_start, "input_key": key, "nts": round(nts, 3), "count": count, "impact_sum": round(sum(d["impact_sum"] for d in digests), 3), "summary": summary}
+    cache["weeks"][week_start] = cached
+    return cached
+
+
+def encode_week(week):
+    s = week["summary"]
+    drivers = ", ".join(s.get("key_drivers") or [])
+    return (f"WEEK OF {week['week_start']} | n={week['count']} | NTS {week['nts']:+.2f} | \"{s.get('headline', '')}\" "
+            f"{s.get('summary', '')} | drivers: {drivers} | turning point: {s.get('turning_point') or '-'}")
+
+
+# --- LEVEL 3: HORIZON BRIEFS ---
+def split_horizon(days):
+    """Cover the day list with whole calendar weeks (Mon-Sun) where possible, loose days elsewhere."""
+    weeks, loose = [], []
+    i = 0
+    while i < len(days):
+        day = datetime.fromisoformat(days[i]).date()
+        if day.weekday() == 0 and i + 7 <= len(days):
+            weeks.append(days[i:i + 7])
+            i += 7
+        else:
+            loose.append(days[i])
+            i += 1
+    return weeks, loose
+
+
+@tracing.traced("rollup.horizon", "net")
+def horizon_brief(cache, horizon, days, today, stats):
+    digests = {d["day"]: d for d in day_digests(cache, days, today)}
+    week_days, loose = split_horizon(days)
+    weeks = [week_summary(cache, w[0], [digests[d] for d in w], stats) for w in week_days]
+    loose_digests = [digests[d] for d in loose]
+
+    nts, count = _score(list(digests.values()))
+    if not count:
+        print(f"💤 {horizon}: no analyzed signals in {days[0]} to {days[-1]}.")
+        return None, False
+    key = _input_key("horizon", horizon, [w["input_key"] for w in weeks], [(d["day"], d["impact_sum"], d["headline"]) for d in loose_digests])
+    cached = cache["horizons"].get(horizon)
+    if cached and cached["input_key"] == key:
+        stats["cached"] += 1
+        return cached, False
+
+    # Chronological: weeks and loose days interleaved by date
+    blocks = [(w["week_start"], encode_week(w)) for w in weeks] + [(d["day"], encode_day(d)) for d in loose_digests]
+    evidence = "\n".join(text for _, text in sorted(blocks))
+    first, last = days[0], days[-1]
+    first_half, _ = _score([digests[d] for d in days[:len(days) // 2]])
+    second_half, _ = _score([digests[d] for d in days[len(days) // 2:]])
+
+    prompt = f"""
+        CONTEXT:
+        You are the "Memory Guard" for Kacang Kantoi.
+        Politicians rely on short memories; we rely on forensic data. Make it KACANG: Simple, Snackable, Undeniable.
+
+        THE AUDIT ({horizon}: {first} to {last}):
+        - Net Trust Score: {nts:+.2f} over {count} signals (Scale: -2.5 to +2.5)
+        - First half vs second half: {first_half:+.2f} -> {second_half:+.2f}
+
+        WEEKLY SUMMARIES AND DAILY DIGESTS (oldest first):
+        {evidence}
+
+        TASK:
+        Write the {horizon} "Memory Guard" brief. What story held for the whole period, what was a one-day spike
+        that the public already forgot, and what is quietly getting worse (or better)?
+
+        OUTPUT JSON ONLY:
+        {{
+            "headline": "5 words max",
+            "public_narrative": "3-4 sentences",
+            "private_memo": "1 sentence of brutal So-What advice",
+            "key_driver": "String",
+            "trend": "improving | worsening | flat"
+        }}
+        """
+    brief, tokens = _generate(prompt, 400)
+    stats["gemini_calls"] += 1
+    stats["tokens"] += tokens
+    cached = {"horizon": horizon, "input_key": key, "period_start": first, "period_end": last, "nts": round(nts, 4), "brief": brief}
+    cache["horizons"][horizon] = cached
+    return cached, True
+
+
+@tracing.traced("rollup.generate")
+def generate_horizon_briefs(horizons=None):
+    """Map-reduce every horizon over complete days ending yesterday (UTC); writes new briefs to horizon_briefs."""
+    horizons = horizons or list(HORIZONS)
+    print(f"🗓️ Rolling up horizon briefs: {', '.join(horizons)}...")
+    started = time.time()
+    today = datetime.now(timezone.utc).date()
+    stats = {"gemini_calls": 0, "tokens": 0, "cached": 0, "written": 0}
+    cache = _load()
+
+    try:
+        widest = max(HORIZONS[h] for h in horizons)
+        stale = drop_stale_days(cache, [(today - timedelta(days=n)).isoformat() for n in range(widest, 0, -1)], today.isoformat())
+        if stale:
+            print(f"🔁 {len(stale)} day digests rebuilt (rows landed after they were cached): {', '.join(sorted(stale)[-5:])}")
+        for horizon in horizons:
+            span = HORIZONS[horizon]
+            days = [(today - timedelta(days=n)).isoformat() for n in range(span, 0, -1)]
+            result, fresh = horizon_brief(cache, horizon, days, today.isoformat(), stats)
+            _save(cache)  # Keep finished levels even if a later horizon fails
+            if result is None:
+                continue
+            if not fresh:
+                print(f"♻️ {horizon}: inputs unchanged since the last rollup, nothing to write.")
+                continue
+            with tracing.span("supabase.insert.horizon_brief", "net"):
+                supabase.table("horizon_briefs").insert({
+                    "horizon": horizon,
+                    "period_start": result["period_start"],
+                    "period_end": result["period_end"],
+                    "content": result["brief"],
+                    "net_trust_score": result["nts"],
+                    "input_key": result["input_key"],
+                    "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                }).execute()
+            stats["written"] += 1
+            print(f"✅ {horizon} brief ({result['period_start']} to {result['period_end']}): {result['brief'].get('headline')}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    # Prune levels that no horizon can reach any more
+    floor = (today - timedelta(days=KEEP_DAYS)).isoformat()
+    cache["days"] = {k: v for k, v in cache["days"].items() if k >= floor}
+    cache["weeks"] = {k: v for k, v in cache["weeks"].items() if k >= floor}
+    _save(cache)
+
+    print(f"🗓️ Rollup done in {time.time() - started:.1f}s | {stats['gemini_calls']} Gemini calls ({stats['tokens']} tokens) | "
+          f"{stats['cached']} levels reused | {len(cache['days'])} day digests, {len(cache['weeks'])} week summaries cached")
+    return stats
+
+
+if __name__ == "__main__":
+    generate_horizon_briefs([h.upper() for h in sys.argv[1:]] or None)
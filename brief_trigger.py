@@ -0,0 +1,236 @@
+import os
+import json
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import trust_metrics
+
+# BRIEF TRIGGER (Online Change-Point Detection)
+# Decides whether a new brief is worth a Gemini call. Every completed hour is
+# streamed through an EWMA baseline + two-sided CUSUM, once for the overall
+# net trust score and once per topic. A brief fires when:
+#   1. a CUSUM alarm says the score (or a topic) has shifted,
+#   2. the 24H score crosses into the crisis band (immediately), or
+#   3. the last brief is older than MAX_BRIEF_AGE_HOURS (daily floor).
+# Otherwise the run is skipped and logged as a saved call.
+# Each brief writer keeps its own detector state (channel): narrative_v2 uses
+# STATE_PATH, narrative_gen uses state/brief_trigger.narrative_gen.json, so one
+# writer's brief never restarts the other's daily floor.
+
+STATE_PATH = os.getenv("BRIEF_TRIGGER_STATE", os.path.join("state", "brief_trigger.json"))
+DECISION_LOG_PATH = os.getenv("BRIEF_TRIGGER_LOG", os.path.join("state", "brief_decisions.jsonl"))
+
+CRISIS_THRESHOLD = -0.5       # Same band as the dashboard's red zone
+MAX_BRIEF_AGE_HOURS = 24      # Always refresh at least daily
+WARMUP_HOURS = 6              # Hours of baseline before alarms are trusted
+BOOTSTRAP_HOURS = 7 * 24      # History replayed on a cold start
+EWMA_ALPHA = 0.1
+CUSUM_K = 0.5                 # Slack, in standard deviations
+CUSUM_H = 4.0                 # Alarm threshold, in standard deviations
+NET_MIN_STD = 0.1             # Noise floors so a quiet baseline can't make one post an "alarm"
+TOPIC_MIN_STD = 1.0
+
+
+class Cusum:
+    """EWMA mean/variance baseline with a two-sided CUSUM on standardized residuals."""
+
+    def __init__(self, mean=0.0, var=0.25, pos=0.0, neg=0.0, n=0, min_std=NET_MIN_STD):
+        self.mean, self.var, self.pos, self.neg, self.n = mean, var, pos, neg, n
+        self.min_std = min_std
+
+    def update(self, x):
+        """Feed one hourly value. Returns 'up', 'down' or None."""
+        if self.n == 0:
+            self.mean = x
+        std = max(self.var ** 0.5, self.min_std)
+        z = (x - self.mean) / std
+        self.pos = max(0.0, self.pos + z - CUSUM_K)
+        self.neg = max(0.0, self.neg - z - CUSUM_K)
+
+        # Update the baseline after scoring, so a shift can't hide inside it
+        delta = x - self.mean
+        self.mean += EWMA_ALPHA * delta
+        self.var = (1 - EWMA_ALPHA) * (self.var + EWMA_ALPHA * delta * delta)
+        self.n += 1
+
+        if self.n <= WARMUP_HOURS:
+            self.pos = self.neg = 0.0
+            return None
+        if self.pos > CUSUM_H:
+            self.pos = self.neg = 0.0
+            return "up"
+        if self.neg > CUSUM_H:
+            self.pos = self.neg = 0.0
+            return "down"
+        return None
+
+    def to_dict(self):
+        return {"mean": self.mean, "var": self.var, "pos": self.pos, "neg": self.neg, "n": self.n, "min_std": self.min_std}
+
+
+def _state_path(channel=None):
+    if not channel:
+        return STATE_PATH
+    root, ext = os.path.splitext(STATE_PATH)
+    return f"{root}.{channel}{ext}"
+
+
+def _load_state(channel=None):
+    path = _state_path(channel)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return {"memo_hits": 0, "last_memo_hit_at": None, **json.load(f)}
+    return {
+        "last_hour": None,
+        "net": {},
+        "topics": {},
+        "in_crisis": False,
+        "pending_reasons": [],
+        "last_brief_at": None,
+        "skipped_since_brief": 0,
+        "calls_saved_total": 0,
+        "memo_hits": 0,
+        "last_memo_hit_at": None,
+    }
+
+
+def _save_state(state, channel=None):
+    path = _state_path(channel)
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _log_decision(entry):
+    folder = os.path.dirname(DECISION_LOG_PATH)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(DECISION_LOG_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def _fetch_hourly(supabase, from_hour, to_hour, page_size=1000):
+    """Hourly net score and per-topic impact sums for hours in [from_hour, to_hour)."""
+    start = datetime.fromtimestamp(from_hour * 3600, tz=timezone.utc).replace(tzinfo=None).isoformat()
+    end = datetime.fromtimestamp(to_hour * 3600, tz=timezone.utc).replace(tzinfo=None).isoformat()
+    net = defaultdict(lambda: [0.0, 0])
+    topics = defaultdict(lambda: defaultdict(float))
+    offset = 0
+    while True:
+        response = supabase.table("sentiment_logs") \
+            .select("created_at, topic, impact_score") \
+            .gte("created_at", start) \
+            .lt("created_at", end) \
+            .order("created_at") \
+            .range(offset, offset + page_size - 1) \
+            .execute()
+        rows = response.data or []
+        for r in rows:
+            hour = int(trust_metrics.to_epoch(r["created_at"]) // 3600)
+            impact = float(r.get("impact_score") or 0)
+            net[hour][0] += impact
+            net[hour][1] += 1
+            topics[hour][r.get("topic") or "Uncategorized"] += impact
+        if len(rows) < page_size:
+            break
+        offset += page_size
+    return net, topics
+
+
+def evaluate(supabase, metrics=None, now=None, channel=None):
+    """
+    Stream all newly completed hours through the detectors and decide.
+    Returns {"fire": bool, "reasons": [...], "score": float}.
+    """
+    now = now or time.time()
+    state = _load_state(channel)
+    current_hour = int(now // 3600)
+    from_hour = state["last_hour"] + 1 if state["last_hour"] is not None else current_hour - BOOTSTRAP_HOURS
+    reasons = list(state["pending_reasons"])
+
+    # 1. Change points over completed hours
+    if from_hour < current_hour:
+        net, topics = _fetch_hourly(supabase, from_hour, current_hour)
+        net_detector = Cusum(**state["net"])
+        topic_detectors = {t: Cusum(**d) for t, d in state["topics"].items()}
+        for t in {t for hour_topics in topics.values() for t in hour_topics}:
+            topic_detectors.setdefault(t, Cusum(min_std=TOPIC_MIN_STD))
+
+        for hour in range(from_hour, current_hour):
+            stamp = datetime.fromtimestamp(hour * 3600, tz=timezone.utc).strftime("%Y-%m-%d %H:00")
+            total, count = net.get(hour, (0.0, 0))
+            if count:
+                shift = net_detector.update(total / count)
+                if shift:
+                    reasons.append(f"net trust score shifted {shift} at {stamp}")
+            for topic, detector in topic_detectors.items():
+                shift = detector.update(topics.get(hour, {}).get(topic, 0.0))
+                if shift:
+                    reasons.append(f"{topic} impact shifted {shift} at {stamp}")
+
+        state["net"] = net_detector.to_dict()
+        state["topics"] = {t: d.to_dict() for t, d in topic_detectors.items()}
+        state["last_hour"] = current_hour - 1
+
+    # 2. Crisis band crossing (checked every run, not just on completed hours)
+    metrics = metrics or trust_metrics.load_or_rebuild(supabase)
+    score = metrics.window("24H", now)["avg_impact"]
+    in_crisis = score < CRISIS_THRESHOLD
+    if in_crisis and not state["in_crisis"]:
+        reasons.append(f"crisis: 24H score {score:.2f} crossed {CRISIS_THRESHOLD}")
+    state["in_crisis"] = in_crisis
+
+    # 3. Daily floor
+    if state["last_brief_at"] is None or now - state["last_brief_at"] > MAX_BRIEF_AGE_HOURS * 3600:
+        reasons.append(f"last brief older than {MAX_BRIEF_AGE_HOURS}h")
+
+    reasons = list(dict.fromkeys(reasons))  # A reason still pending from the last run is not re-added
+    fire = bool(reasons)
+    if fire:
+        state["pending_reasons"] = reasons  # Kept until a brief is actually saved
+    else:
+        state["skipped_since_brief"] += 1
+        state["calls_saved_total"] += 1
+    _save_state(state, channel)
+
+    decision = {"fire": fire, "reasons": reasons, "score": score}
+    _log_decision({
+        "at": datetime.fromtimestamp(now, tz=timezone.utc).isoformat(),
+        "channel": channel or "default",
+        "fire": fire,
+        "reasons": reasons,
+        "score": round(score, 4),
+        "calls_saved_total": state["calls_saved_total"],
+    })
+
+    if fire:
+        print(f"🚨 Brief warranted: {'; '.join(reasons)}")
+    else:
+        print(f"💤 No change detected (score {score:.2f}). Skipping Gemini. Calls saved so far: {state['calls_saved_total']}")
+    return decision
+
+
+def mark_generated(now=None, channel=None):
+    """Call after a brief is saved: clears pending reasons and restarts the daily floor."""
+    state = _load_state(channel)
+    state["pending_reasons"] = []
+    state["last_brief_at"] = now or time.time()
+    state["skipped_since_brief"] = 0
+    _save_state(state, channel)
+
+
+def mark_memo_hit(now=None, channel=None):
+    """
+    Call when the evidence matched the last brief and nothing was written: clears
+    pending reasons but leaves the daily floor alone (no new brief exists).
+    """
+    state = _load_state(channel)
+    state["pending_reasons"] = []
+    state["memo_hits"] += 1
+    state["last_memo_hit_at"] = now or time.time()
+    _save_state(state, channel)
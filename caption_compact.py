@@ -0,0 +1,107 @@
+import os
+import re
+import unicodedata
+from evidence_packer import estimate_tokens
+
+# CAPTION COMPACTION
+# TikTok captions carry a lot of text that costs tokens but no signal: URLs,
+# @mention chains, walls of #fyp hashtags, "hahahaha" / 😂😂😂😂 runs and
+# follow-me boilerplate. compact() strips that before a caption reaches a prompt
+# or the classification cache key, then caps it at a fixed token budget.
+# Nothing is lowercased, transliterated or translated: Malay, English and
+# Mandarin text goes through as written.
+
+CAPTION_TOKEN_CAP = int(os.getenv("CAPTION_TOKEN_CAP", "120"))
+MAX_HASHTAGS = 6       # Topical tags kept per caption (first occurrences win)
+MAX_MENTIONS = 2       # The first few @handles can name the target; the rest is tagging spam
+
+# Reach-bait tags that say nothing about the content
+BOILERPLATE_HASHTAGS = {
+    "fyp", "fypシ", "fypシ゚viral", "foryou", "foryoupage", "fy", "fypage", "viral", "viralvideo",
+    "trending", "trend", "xyzbca", "tiktok", "tiktokmalaysia", "malaysiatiktok", "masukberanda",
+    "berandatiktok", "capcut", "duet", "stitch", "4u", "4you", "推荐", "热门", "上热门",
+}
+BOILERPLATE_PHRASES = re.compile(
+    r"(link in bio|follow (me )?for more|like (and|&) share|jangan lupa (follow|like|share)[^.!?\n]*|tekan follow[^.!?\n]*|"
+    r"follow untuk [^.!?\n]*|关注我[^。！？\n]*)",
+    re.IGNORECASE,
+)
+
+_URL = re.compile(r"(https?://|www\.)\S+", re.IGNORECASE)
+_MENTION = re.compile(r"@[\w.]+")
+_HASHTAG = re.compile(r"#[^\s#@]+")
+# The same 1-2 character unit (letter, CJK char, emoji, punctuation; not digits) four or more times in a row
+_REPEAT = re.compile(r"((?:(?!\d)\S){1,2}?)\1{3,}")
+_REPEAT_WORD = re.compile(r"(?<!\S)(\S+)(?:\s+\1){2,}(?!\S)")  # Whole words only: "ana ana anak" stays
+_SPACE = re.compile(r"\s+")
+
+
+def _keep_first(pattern, text, keep):
+    """Drop matches of pattern beyond the first occurrences accepted by keep(token)."""
+    def replace(match):
+        return match.group(0) if keep(match.group(0)) else ""
+    return pattern.sub(replace, text)
+
+
+def compact(caption, max_tokens=CAPTION_TOKEN_CAP):
+    """Compacted caption for prompts and cache keys (deterministic: same input, same output)."""
+    if not caption:
+        return ""
+    # Full-width / "fancy font" letters folded to plain characters; CJK is untouched
+    text = unicodedata.normalize("NFKC", caption)
+    text = _URL.sub(" ", text)
+    text = BOILERPLATE_PHRASES.sub(" ", text)
+
+    mentions = []
+    def keep_mention(token):
+        if token.lower() in mentions or len(mentions) >= MAX_MENTIONS:
+            return False
+        mentions.append(token.lower())
+        return True
+    text = _keep_first(_MENTION, text, keep_mention)
+
+    tags = []
+    def keep_tag(token):
+        tag = token[1:].lower()
+        if tag in BOILERPLATE_HASHTAGS or tag in tags or len(tags) >= MAX_HASHTAGS:
+            return False
+        tags.append(tag)
+        return True
+    text = _keep_first(_HASHTAG, text, keep_tag)
+
+    # "hahahaha" -> "haha", "!!!!!!" -> "!!", "😂😂😂😂" -> "😂😂", "sama sama sama" -> "sama"
+    text = _REPEAT.sub(r"\1\1", text)
+    text = _REPEAT_WORD.sub(r"\1", text)
+    text = _SPACE.sub(" ", text).strip()
+
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # Over budget: hashtags go first (last one first), then the text is cut at a word boundary
+    while text and estimate_tokens(text) > max_tokens:
+        words = text.split(" ")
+        tail = next((i for i in range(len(words) - 1, -1, -1) if words[i].startswith("#")), None)
+        if tail is None or tail == 0:
+            break
+        del words[tail]
+        text = " ".join(words)
+    if estimate_tokens(text) > max_tokens:
+        cut = []
+        for word in text.split(" "):
+            if estimate_tokens(" ".join(cut + [word])) > max_tokens - 1:
+                break
+            cut.append(word)
+        # A single over-long word (e.g. an unbroken CJK run) is cut by characters
+        text = " ".join(cut) if cut else _cut_chars(text, max_tokens - 1)
+        text += "…"
+    return text
+
+
+def _cut_chars(text, max_tokens):
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
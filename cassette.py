@@ -0,0 +1,416 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import atexit
+import hashlib
+import tempfile
+import threading
+import datetime as _dt
+import subprocess
+from collections import defaultdict, deque
+from types import SimpleNamespace
+
+# RECORD / REPLAY CASSETTES
+# CASSETTE_MODE=record: every Apify run + dataset, Gemini response and Supabase
+#   response of a live run is written to CASSETTE_DIR/<script>.json (one file
+#   per pipeline script), together with a copy of state/ as it was before the run.
+# CASSETTE_MODE=replay: the same scripts run against those files with no
+#   network at all. Recorded latencies are slept scaled by CASSETTE_TIME_SCALE
+#   (0 = full speed, 1 = real time, 0.1 = 10x compressed).
+# Replay also replays the clock: every entry carries its offset from the start of
+# the recorded script, and while replaying, time.time / time.strftime /
+# datetime.now / utcnow / pd.Timestamp.now read a virtual clock that starts at
+# the recorded start and jumps to each entry's offset as it is played. Windows,
+# triage order (and so lease claims) and prompts match the recording instead of
+# drifting to the time of the replay.
+#
+# Replay a whole recorded hour in a scratch workspace:
+#   python cassette.py replay cassettes/<run_id> [--time-scale 0.1]
+
+CASSETTE_FORMAT = 1
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "").lower()
+CASSETTE_DIR = os.getenv("CASSETTE_DIR", "cassettes")
+CASSETTE_TIME_SCALE = float(os.getenv("CASSETTE_TIME_SCALE", "0"))
+RECORDING = CASSETTE_MODE == "record"
+REPLAYING = CASSETTE_MODE == "replay"
+
+PIPELINE = ["scraper_service.py", "sentiment_engine.py", "comment_engine.py", "narrative_v2.py", "brief_rollup.py"]
+
+# Timestamps in filters ("created_at >= now - 24h", lease expiry) differ on every
+# run; they are masked so a replayed query still matches its recording.
+_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:?\d{2})?")
+_WRITE_METHODS = {"insert", "upsert", "update", "delete"}
+
+if REPLAYING:
+    # Clients still get constructed at import time; they never connect.
+    os.environ.setdefault("SUPABASE_URL", "http://replay.invalid")
+    os.environ.setdefault("SUPABASE_KEY", "replay.replay.replay")
+    os.environ.setdefault("GEMINI_API_KEY", "replay")
+    os.environ.setdefault("APIFY_TOKEN", "replay")
+
+
+def _script_name():
+    return os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+
+
+def _key(*parts):
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(_TIMESTAMP.sub("<ts>", raw).encode("utf-8")).hexdigest()
+
+
+def _delay(latency):
+    if CASSETTE_TIME_SCALE > 0 and latency:
+        time.sleep(latency * CASSETTE_TIME_SCALE)
+
+
+class Cassette:
+    """One script's recorded interactions: {kind: {key: [entry, ...]}}, replayed in order per key."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.tapes = defaultdict(lambda: defaultdict(list))
+        self.queues = {}
+        self.meta = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path):
+        cassette = cls(path)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != CASSETTE_FORMAT:
+            raise ValueError(f"Cassette {path} is format {data.get('format')}, expected {CASSETTE_FORMAT}")
+        cassette.meta = data.get("meta", {})
+        for kind, tape in data["tapes"].items():
+            for key, entries in tape.items():
+                cassette.queues[(kind, key)] = deque(entries)
+        return cassette
+
+    def record(self, kind, key, entry):
+        entry["at"] = time.time() - self.meta["started_at"]
+        with self.lock:
+            self.tapes[kind][key].append(entry)
+
+    def play(self, kind, key):
+        with self.lock:
+            queue = self.queues.get((kind, key))
+            if queue:
+                self.hits += 1
+                entry = queue.popleft()
+                if _clock is not None and entry.get("at") is not None:
+                    _clock.advance(entry["at"])
+                return entry
+            self.misses += 1
+            return None
+
+    def save(self):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self.lock:
+            data = {
+                "format": CASSETTE_FORMAT,
+                "meta": dict(self.meta, script=_script_name(), recorded_at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())),
+                "tapes": self.tapes,
+            }
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, self.path)
+
+
+_cassette = None
+_clock = None
+
+
+# --- CLOCK ---
+_real_time = time.time
+_real_localtime = time.localtime
+_real_gmtime = time.gmtime
+_real_strftime = time.strftime
+
+
+class ReplayClock:
+    """Recorded start + the offset of the last entry played + real time elapsed since it was played."""
+
+    def __init__(self, origin):
+        self.origin = origin
+        self.offset = 0.0
+        self.anchor = time.monotonic()
+        self.lock = threading.Lock()
+
+    def time(self):
+        with self.lock:
+            return self.origin + self.offset + (time.monotonic() - self.anchor)
+
+    def advance(self, offset):
+        """Jump forward to a recorded offset (never backwards)."""
+        with self.lock:
+            if offset > self.offset + (time.monotonic() - self.anchor):
+                self.offset = offset
+                self.anchor = time.monotonic()
+
+
+def _install_clock(clock):
+    """Point the wall-clock readers the pipeline uses at the replay clock."""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    real_datetime = _dt.datetime
+
+    class ReplayDatetime(real_datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls.fromtimestamp(clock.time(), tz)
+
+        @classmethod
+        def utcnow(cls):
+            return cls.fromtimestamp(clock.time(), _dt.timezone.utc).replace(tzinfo=None)
+
+    time.time = clock.time
+    time.localtime = lambda secs=None: _real_localtime(clock.time() if secs is None else secs)
+    time.gmtime = lambda secs=None: _real_gmtime(clock.time() if secs is None else secs)
+    time.strftime = lambda fmt, t=None: _real_strftime(fmt, time.localtime() if t is None else t)
+    _dt.datetime = ReplayDatetime
+    # Repo modules imported before the cassette (from datetime import datetime) hold the real class
+    for name, module in list(sys.modules.items()):
+        in_repo = name == "__main__" or os.path.dirname(os.path.abspath(getattr(module, "__file__", None) or "")) == repo
+        if in_repo and getattr(module, "datetime", None) is real_datetime:
+            module.datetime = ReplayDatetime
+    pandas = sys.modules.get("pandas")
+    if pandas is not None:
+        pandas.Timestamp.now = classmethod(lambda cls, tz=None: cls.fromtimestamp(clock.time(), tz))
+
+
+def active():
+    """This process's cassette (created on first use), or None when not recording/replaying."""
+    global _cassette, _clock
+    if _cassette is None and (RECORDING or REPLAYING):
+        path = os.path.join(CASSETTE_DIR, f"{_script_name()}.json")
+        if RECORDING:
+            _cassette = Cassette(path)
+            _cassette.meta["started_at"] = time.time()
+            # State as it was before the hour started (first script of the run snapshots it)
+            if os.path.isdir("state") and not os.path.exists(os.path.join(CASSETTE_DIR, "state")):
+                shutil.copytree("state", os.path.join(CASSETTE_DIR, "state"))
+            atexit.register(_finish_recording)
+        else:
+            _cassette = Cassette.load(path)
+            atexit.register(_finish_replay)
+            if _cassette.meta.get("started_at") is not None:
+                _clock = ReplayClock(_cassette.meta["started_at"])
+                _install_clock(_clock)
+            else:
+                print(f"⚠️ {path} has no recorded start time: replaying against the current clock.")
+    return _cassette
+
+
+def _finish_recording():
+    # Lease claims carry the worker ID, so replay has to reuse it
+    lease = sys.modules.get("work_lease")
+    _cassette.meta["worker_id"] = lease.WORKER_ID if lease else os.getenv("WORKER_ID", "")
+    _cassette.save()
+    print(f"📼 Cassette recorded: {_cassette.path}")
+
+
+def _finish_replay():
+    print(f"📼 Cassette replay: {_cassette.hits} hits, {_cassette.misses} misses ({_cassette.path})")
+
+
+# --- SUPABASE ---
+class _SupabaseCall:
+    """Proxies a query-builder chain; intercepts execute()."""
+
+    def __init__(self, cassette, real, calls):
+        self._cassette = cassette
+        self._real = real
+        self._calls = calls
+
+    def __getattr__(self, name):
+        real = getattr(self._real, name) if self._real is not None else None
+        return _SupabaseCall(self._cassette, real, self._calls + [[name]])
+
+    def __call__(self, *args, **kwargs):
+        real = self._real(*args, **kwargs) if self._real is not None else None
+        name = self._calls[-1][0]
+        # Write payloads (row contents) are left out of the key; filters are kept
+        shown = [] if name in _WRITE_METHODS else [list(args), kwargs]
+        return _SupabaseCall(self._cassette, real, self._calls[:-1] + [[name] + shown])
+
+    def execute(self):
+        key = _key(self._calls)
+        if RECORDING:
+            started = time.perf_counter()
+            response = self._real.execute()
+            self._cassette.record("supabase", key, {
+                "calls": self._calls,
+                "data": getattr(response, "data", None),
+                "count": getattr(response, "count", None),
+                "latency": time.perf_counter() - started,
+            })
+            return response
+
+        entry = self._cassette.play("supabase", key)
+        if entry is None:
+            # Unrecorded write: pretend it succeeded. Unrecorded read: empty result.
+            return SimpleNamespace(data=[], count=None)
+        _delay(entry.get("latency"))
+        return SimpleNamespace(data=entry["data"], count=entry["count"])
+
+
+def wrap_supabase(client):
+    """Record or replay a Supabase client's responses (pass-through when off)."""
+    cassette = active()
+    if cassette is None:
+        return client
+    return _SupabaseCall(cassette, None if REPLAYING else client, [])
+
+
+# --- GEMINI ---
+class _GeminiModels:
+    def __init__(self, cassette, real):
+        self._cassette = cassette
+        self._real = real
+
+    def generate_content(self, model, contents, config=None, **kwargs):
+        key = _key(model, contents)
+        if RECORDING:
+            started = time.perf_counter()
+            response = self._real.generate_content(model=model, contents=contents, config=config, **kwargs)
+            usage = getattr(response, "usage_metadata", None)
+            self._cassette.record("gemini", key, {
+                "model": model,
+                "text": response.text,
+                "prompt_token_count": getattr(usage, "prompt_token_count", 0) or 0,
+                "candidates_token_count": getattr(usage, "candidates_token_count", 0) or 0,
+                "latency": time.perf_counter() - started,
+            })
+            return response
+
+        entry = self._cassette.play("gemini", key)
+        if entry is None:
+            raise RuntimeError("No recorded Gemini response for this prompt")
+        _delay(entry.get("latency"))
+        return SimpleNamespace(
+            text=entry["text"],
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=entry["prompt_token_count"],
+                candidates_token_count=entry["candidates_token_count"],
+            ),
+        )
+
+
+def wrap_gemini(client):
+    cassette = active()
+    if cassette is None:
+        return client
+    return SimpleNamespace(models=_GeminiModels(cassette, None if REPLAYING else client.models))
+
+
+# --- APIFY ---
+class _ApifyActor:
+    def __init__(self, cassette, real, actor_id):
+        self._cassette = cassette
+        self._real = real
+        self._actor_id = actor_id
+
+    def call(self, run_input=None):
+        key = _key(self._actor_id, run_input)
+        if RECORDING:
+            started = time.perf_counter()
+            run = self._real.call(run_input=run_input)
+            self._cassette.record("apify_run", key, {"run": run, "latency": time.perf_counter() - started})
+            return run
+        entry = self._cassette.play("apify_run", key)
+        if entry is None:
+            return None
+        _delay(entry.get("latency"))
+        return entry["run"]
+
+
+class _ApifyDataset:
+    def __init__(self, cassette, real, dataset_id):
+        self._cassette = cassette
+        self._real = real
+        self._dataset_id = dataset_id
+
+    def iterate_items(self):
+        if RECORDING:
+            items = list(self._real.iterate_items())
+            self._cassette.record("apify_dataset", self._dataset_id, {"items": items})
+            return iter(items)
+        entry = self._cassette.play("apify_dataset", self._dataset_id)
+        return iter(entry["items"] if entry else [])
+
+
+class _ApifyClient:
+    def __init__(self, cassette, real):
+        self._cassette = cassette
+        self._real = real
+
+    def actor(self, actor_id):
+        return _ApifyActor(self._cassette, self._real.actor(actor_id) if self._real else None, actor_id)
+
+    def dataset(self, dataset_id):
+        return _ApifyDataset(self._cassette, self._real.dataset(dataset_id) if self._real else None, dataset_id)
+
+
+def wrap_apify(client):
+    cassette = active()
+    if cassette is None:
+        return client
+    return _ApifyClient(cassette, None if REPLAYING else client)
+
+
+# --- REPLAY RUNNER ---
+def replay_pipeline(cassette_dir, time_scale=0.0, scripts=PIPELINE):
+    """
+    Replay a recorded hour in a scratch workspace: restore the recorded state/,
+    run each pipeline script against its cassette, report per-script wall time.
+    """
+    repo = os.path.dirname(os.path.abspath(__file__))
+    cassette_dir = os.path.abspath(cassette_dir)
+    workspace = tempfile.mkdtemp(prefix="kk-replay-")
+    if os.path.isdir(os.path.join(cassette_dir, "state")):
+        shutil.copytree(os.path.join(cassette_dir, "state"), os.path.join(workspace, "state"))
+
+    env = dict(
+        os.environ,
+        CASSETTE_MODE="replay",
+        CASSETTE_DIR=cassette_dir,
+        CASSETTE_TIME_SCALE=str(time_scale),
+        PROFILES_DIR=os.path.join(repo, "profiles"),
+        APIFY_CONFIG_PATH=os.path.join(repo, "apify_config.json"),
+    )
+    timings = {}
+    for script in scripts:
+        name = os.path.splitext(script)[0]
+        path = os.path.join(cassette_dir, f"{name}.json")
+        if not os.path.exists(path):
+            print(f"⏭️  No cassette for {script}, skipping.")
+            continue
+        with open(path, encoding="utf-8") as f:
+            worker_id = json.load(f).get("meta", {}).get("worker_id")
+        if worker_id:
+            env["WORKER_ID"] = worker_id  # Lease claims carry the worker ID
+
+        print(f"\n▶️  Replaying {script}...")
+        started = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(repo, script)], cwd=workspace, env=env, check=False)
+        timings[script] = time.perf_counter() - started
+
+    print(f"\n📼 REPLAY SUMMARY ({cassette_dir}, time scale {time_scale}, workspace {workspace})")
+    for script, seconds in timings.items():
+        print(f"   {script:<24}{seconds:>8.2f}s")
+    return timings
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "replay":
+        print("Usage: python cassette.py replay <cassette_dir> [--time-scale 0.1]")
+        sys.exit(1)
+    scale = float(sys.argv[sys.argv.index("--time-scale") + 1]) if "--time-scale" in sys.argv else 0.0
+    replay_pipeline(sys.argv[2], scale)
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+from collections import defaultdict
+from google.genai import types
+import evidence_packer
+import tracing
+import gemini_quota
+import caption_compact
+from sentiment_engine import client, supabase, calculate_impact_score, GEMINI_MODEL, GEMINI_PRICE_INPUT_PER_M, GEMINI_PRICE_OUTPUT_PER_M
+
+# COMMENT ENGINE (Batch-First)
+# Comments outnumber captions 5-50x, so they are never classified one per call.
+# Pending comments are grouped by parent video and packed into large prompts:
+# each video's caption is sent ONCE as shared context, followed by its numbered
+# comments. Gemini answers with one compact coded object per comment.
+# A comment whose batch fails, or that the model leaves out or answers with an
+# unusable code, counts one attempt (comments.attempts); after MAX_ATTEMPTS it
+# is no longer fetched, so one poison batch cannot be re-bought every hour.
+# Rate-limited batches do not count: that is the quota, not the comments.
+
+COMMENT_POOL = int(os.getenv("COMMENT_POOL", "1000"))                   # Pending comments fetched per run
+COMMENTS_PER_PROMPT = int(os.getenv("COMMENTS_PER_PROMPT", "80"))      # Comments packed into one Gemini call
+MAX_COMMENT_CHARS = 280                                                  # Long rants are truncated in the prompt
+MAX_CAPTION_TOKENS = 80                                                  # Caption context, compacted (see caption_compact.py)
+MAX_ATTEMPTS = int(os.getenv("COMMENT_MAX_ATTEMPTS", "3"))               # Failed tries before a comment is skipped for good
+
+TOPIC_BY_CODE = {c: t for t, c in evidence_packer.TOPIC_CODES.items()}
+ARCHETYPE_BY_CODE = {c: a for a, c in evidence_packer.ARCHETYPE_CODES.items()}
+
+
+@tracing.traced("comments.fetch_pending", "net")
+def fetch_pending(limit=COMMENT_POOL):
+    """Unanalyzed comments plus their parent captions, grouped by video (most-liked first)."""
+    comments = supabase.table("comments") \
+        .select("id, video_id, text, like_count, created_at, profile, attempts") \
+        .eq("is_analyzed", False) \
+        .or_(f"attempts.is.null,attempts.lt.{MAX_ATTEMPTS}") \
+        .order("like_count", desc=True) \
+        .limit(limit) \
+        .execute().data or []
+
+    video_ids = list({c["video_id"] for c in comments})
+    captions = {}
+    for i in range(0, len(video_ids), 200):
+        chunk = supabase.table("videos").select("id, caption").in_("id", video_ids[i:i + 200]).execute()
+        captions.update({v["id"]: v.get("caption") or "" for v in chunk.data or []})
+
+    groups = defaultdict(list)
+    for c in comments:
+        groups[c["video_id"]].append(c)
+    return [(vid, captions.get(vid, ""), rows) for vid, rows in groups.items()]
+
+
+def build_batches(groups, per_prompt=COMMENTS_PER_PROMPT):
+    """Pack video groups into prompts of at most per_prompt comments (big groups are split)."""
+    batches, current, size = [], [], 0
+    for video_id, caption, rows in groups:
+        for i in range(0, len(rows), per_prompt):
+            part = rows[i:i + per_prompt]
+            if size + len(part) > per_prompt and current:
+                batches.append(current)
+                current, size = [], 0
+            current.append((video_id, caption, part))
+            size += len(part)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_batch_prompt(batch):
+    """Returns (prompt, numbered comments) for one batch."""
+    numbered = []
+    blocks = []
+    for n, (video_id, caption, rows) in enumerate(batch, 1):
+        caption = caption_compact.compact(caption, MAX_CAPTION_TOKENS)
+        lines = [f'VIDEO {n} caption: "{caption}"']
+        for row in rows:
+            numbered.append(row)
+            text = " ".join(row["text"].split())[:MAX_COMMENT_CHARS]
+            lines.append(f"  [{len(numbered)}] {text}")
+        blocks.append("\n".join(lines))
+
+    topics = ", ".join(f"{c}={t}" for t, c in evidence_packer.TOPIC_CODES.items())
+    personas = ", ".join(f"{c}={a}" for a, c in evidence_packer.ARCHETYPE_CODES.items())
+    prompt = f"""
+        Analyze comments on Malaysian political TikTok videos about the government / Prime Minister.
+        Each VIDEO block gives the caption as context, followed by numbered comments.
+        Classify EVERY numbered comment:
+        - "d": domain code. {topics}
+        - "p": persona code. {personas}. IF UNCLEAR, USE "DC".
+        - "s": sentiment toward the government: -1, 0 or 1. If the comment is sarcastic, INVERT the literal sentiment.
+        - "r": true if it touches Race, Religion or Royalty (3R).
+
+        OUTPUT JSON ARRAY, one object per comment, no other text:
+        [{{"i": 1, "d": "EA", "p": "DC", "s": -1, "r": false}}]
+
+{chr(10).join(blocks)}
+        """
+    return prompt, numbered
+
+
+@tracing.traced("gemini.classify_comments", "net")
+def classify_batch(batch):
+    """One Gemini call for a whole batch. Returns (rows_to_write, prompt_tokens, output_tokens)."""
+    prompt, numbered = build_batch_prompt(batch)
+    # ~12 output tokens per coded comment
+    response = gemini_quota.call(GEMINI_MODEL, evidence_packer.estimate_tokens(prompt) + 12 * len(numbered), lambda: client.models.generate_content(
+        model=GEMINI_MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            temperature=0.2,
+            response_mime_type="application/json"
+        )
+    ), retries=2)
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+
+    try:
+        results = json.loads(response.text.strip())
+    except:
+        return [], prompt_tokens, output_tokens
+    if isinstance(results, dict):
+        results = [results]
+
+    rows, seen = [], set()
+    for res in results:
+        # A bad index or sentiment drops that one comment (it stays pending), never the batch
+        try:
+            i = int(res.get("i"))
+            if i < 1 or i in seen:
+                continue
+            comment = numbered[i - 1]
+            sentiment = max(-1, min(1, int(res.get("s", 0) or 0)))
+        except (AttributeError, TypeError, ValueError, IndexError):
+            continue
+        seen.add(i)
+        archetype = ARCHETYPE_BY_CODE.get(res.get("p"), "Digital Cynic")
+        is_3r = bool(res.get("r", False))
+        rows.append(dict(
+            comment,
+            topic=TOPIC_BY_CODE.get(res.get("d"), "Uncategorized"),
+            archetype=archetype,
+            sentiment=sentiment,
+            is_3r=is_3r,
+            impact_score=calculate_impact_score(sentiment, archetype, is_3r, 0),
+            is_analyzed=True,
+        ))
+    return rows, prompt_tokens, output_tokens
+
+
+def record_failures(comments):
+    """One more attempt on each comment. Returns how many just hit MAX_ATTEMPTS."""
+    by_attempts = defaultdict(list)
+    for c in comments:
+        by_attempts[(c.get("attempts") or 0) + 1].append(c["id"])
+    try:
+        for attempts, ids in by_attempts.items():
+            supabase.table("comments").update({"attempts": attempts}).in_("id", ids).execute()
+    except Exception as e:
+        print(f"⚠️ Could not record failed attempts: {e}")
+        return 0
+    return sum(len(ids) for attempts, ids in by_attempts.items() if attempts >= MAX_ATTEMPTS)
+
+
+def analyze_comments(limit=COMMENT_POOL):
+    print("🚀 Starting Comment Engine (Batch Mode)...")
+    stats = {"comments": 0, "classified": 0, "gave_up": 0, "gemini_calls": 0, "prompt_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+    started = time.time()
+
+    groups = fetch_pending(limit)
+    if not groups:
+        print("💤 No new comments to analyze.")
+        return stats
+    batches = build_batches(groups)
+    stats["comments"] = sum(len(rows) for _, _, rows in groups)
+    print(f"🎯 {stats['comments']} comments on {len(groups)} videos -> {len(batches)} Gemini calls.")
+
+    for n, batch in enumerate(batches, 1):
+        batch_comments = [c for _, _, rows in batch for c in rows]
+        try:
+            rows, prompt_tokens, output_tokens = classify_batch(batch)
+        except gemini_quota.RateLimited as e:
+            # Quota trouble: the comments stay pending without spending an attempt
+            print(f"⏳ Batch {n} rate-limited, comments stay pending: {e}")
+            continue
+        except Exception as e:
+            print(f"❌ Batch {n} failed: {e}")
+            stats["gave_up"] += record_failures(batch_comments)
+            continue
+        stats["gemini_calls"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["output_tokens"] += output_tokens
+
+        if rows:
+            with tracing.span("supabase.upsert.comments", "net", rows=len(rows)):
+                supabase.table("comments").upsert(rows).execute()
+            stats["classified"] += len(rows)
+        classified = {r["id"] for r in rows}
+        missed = [c for c in batch_comments if c["id"] not in classified]
+        if missed:
+            stats["gave_up"] += record_failures(missed)
+        if not rows:
+            print(f"⚠️ Batch {n}: unparseable response, {len(missed)} comments stay pending.")
+            continue
+        print(f"✅ Batch {n}/{len(batches)}: {len(rows)} comments ({prompt_tokens}+{output_tokens} tokens)"
+              + (f", {len(missed)} left out" if missed else ""))
+
+    stats["cost_usd"] = (stats["prompt_tokens"] * GEMINI_PRICE_INPUT_PER_M + stats["output_tokens"] * GEMINI_PRICE_OUTPUT_PER_M) / 1_000_000
+    per_comment = stats["cost_usd"] / stats["classified"] if stats["classified"] else 0.0
+    tokens_per_comment = (stats["prompt_tokens"] + stats["output_tokens"]) / stats["classified"] if stats["classified"] else 0.0
+    if stats["gave_up"]:
+        print(f"🪦 {stats['gave_up']} comments reached {MAX_ATTEMPTS} failed attempts and will not be retried.")
+    print(f"\n✅ Comments Complete: {stats['classified']}/{stats['comments']} in {time.time() - started:.1f}s | "
+          f"{stats['gemini_calls']} calls | {tokens_per_comment:.0f} tokens/comment | ${per_comment * 1000:.4f} per 1k comments (${stats['cost_usd']:.4f} total)")
+    gemini_quota.report(GEMINI_MODEL)
+    return stats
+
+
+if __name__ == "__main__":
+    analyze_comments()
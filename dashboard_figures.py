@@ -0,0 +1,243 @@
+from datetime import datetime
+import html
+import plotly.express as px
+import plotly.graph_objects as go
+import downsample
+import tracing
+
+# DASHBOARD BUILDING BLOCKS
+# Design system, hero copy, narrative box and chart payload shared by the live
+# Streamlit app (app.py) and the static snapshot export (static_export.py), so
+# both render the same page from the same rows.
+
+# Classes used by both renderers. Streamlit-only widget styling stays in app.py.
+DESIGN_CSS = """
+    /* IMPORT FONTS: Rubik (Headlines) & Inter (Body) */
+    @import url('https://fonts.googleapis.com/css2?family=Rubik:wght@400;500;700;900&family=Inter:wght@300;400;600;800&display=swap');
+
+    /* --- HERO CARD --- */
+    .hero-card {
+        background-color: #FFFFFF;
+        border: 1px solid #222;
+        border-left: 10px solid #FFC107; /* Brand Yellow */
+        padding: 3rem;
+        border-radius: 2px;
+        margin-bottom: 2rem;
+    }
+    .hero-label {
+        color: #FFC107; font-family: 'Rubik', sans-serif; font-weight: 700;
+        letter-spacing: 2px; font-size: 0.9rem; text-transform: uppercase; margin-bottom: 10px;
+    }
+    .hero-title {
+        font-family: 'Rubik', sans-serif; font-size: 4.5rem !important; font-weight: 900 !important;
+        color: #000000 !important; text-transform: uppercase; line-height: 0.9;
+    }
+    .hero-title-highlight { color: #FFC107 !important; }
+    .hero-copy {
+        font-family: 'Inter', sans-serif; font-size: 1.15rem; color: #222; font-weight: 500;
+        line-height: 1.6; margin-top: 1.5rem; max-width: 800px;
+        border-left: 4px solid #000; padding-left: 20px;
+    }
+
+    /* --- SIGNAL BOARD --- */
+    .signal-title {
+        font-family: 'Rubik', sans-serif; color: #FFF; font-size: 1rem; font-weight: 700;
+        text-transform: uppercase; margin-bottom: 10px; border-bottom: 2px solid #333; padding-bottom: 5px;
+    }
+    .signal-item {
+        font-family: 'Inter', sans-serif; font-size: 0.9rem; color: #CCC;
+        margin-bottom: 5px; display: flex; justify-content: space-between;
+    }
+    .signal-score-pos { color: #00E396; font-weight: 700; }
+    .signal-score-neg { color: #FF4560; font-weight: 700; }
+
+    /* --- NARRATIVE BOX --- */
+    .narrative-box {
+        background-color: #111;
+        border: 1px solid #333;
+        border-left: 4px solid #FFC107;
+        padding: 20px;
+        height: 100%;
+        margin-top: -15px;
+    }
+    .narrative-header {
+        font-family: 'Rubik', sans-serif; color: #FFF; font-weight: 900;
+        text-transform: uppercase; font-size: 1.3rem; margin-bottom: 5px; letter-spacing: 0.5px;
+    }
+    .narrative-sub {
+        font-family: 'Rubik', sans-serif; color: #FFC107; font-size: 0.75rem;
+        text-transform: uppercase; letter-spacing: 2px; margin-bottom: 10px; font-weight: 700;
+    }
+    .narrative-text {
+        font-family: 'Inter', sans-serif; color: #CCC; font-size: 1rem; line-height: 1.4; font-style: italic;
+    }
+
+    /* --- SPACER --- */
+    .spacer { margin-top: 40px; }
+
+    /* --- CHART HEADERS --- */
+    h3 {
+        font-family: 'Rubik', sans-serif; color: #FFF !important; text-transform: uppercase;
+        font-weight: 900 !important; font-size: 2rem !important; margin-top: 50px !important;
+        border-left: 6px solid #FFC107; padding-left: 15px;
+    }
+    .chart-caption {
+        font-family: 'Inter', sans-serif; color: #888; font-size: 0.95rem; margin-bottom: 25px; margin-left: 22px; max-width: 650px;
+    }
+
+    /* --- METHODOLOGY --- */
+    .methodology-header {
+        color: #FFC107; font-family: 'Rubik'; text-transform: uppercase; margin-bottom: 5px; font-size: 1rem; margin-top: 20px;
+    }
+    .methodology-text {
+        font-family: 'Inter'; color: #CCC; font-size: 0.95rem; line-height: 1.6; margin-bottom: 10px;
+    }
+"""
+
+HERO_HTML = """
+<div class="hero-card">
+    <div class="hero-label">OUR MISSION</div>
+    <div class="hero-title">BEYOND THE <br><span class="hero-title-highlight">WAYANG.</span></div>
+    <div class="hero-copy">
+        <b>Kacang Kantoi</b> exists because Malaysian politics is theater.
+        While politicians rely on 3R distractions and short memories, we rely on <b>receipts</b>.
+        <br><br>
+        We are the nation's <b>Memory Guard</b>. We track the gap between what they say in Parliament and what you feel on the street.
+        No jargon. No spin. Just the data.
+        <br><br>
+        <i>Simple. Snackable. Undeniable.</i>
+    </div>
+</div>
+"""
+
+ARCHETYPE_COLORS = {
+    "Digital Cynic": "#FFC107", "Urban Reformist": "#FFFFFF",
+    "Heartland Conservative": "#FFA500", "Economic Pragmatist": "#808080",
+    "Unknown": "#333333"
+}
+
+TREND_KEYS = ('fig_trend', 'fig_trend_topic', 'fig_trend_archetype')
+
+
+def narrative_html(brief):
+    """THE BOTTOM LINE box for the latest narrative_briefs row (None if there is no brief yet)."""
+    if not brief:
+        return None
+    content = brief['content']
+    headline = content.get('headline', 'System Stable')
+    narrative = content.get('public_narrative', content.get('dominant_narrative', 'Analyzing data streams...'))
+    return f"""
+            <div class="narrative-box">
+                <div class="narrative-sub">THE BOTTOM LINE</div>
+                <div class="narrative-header">{html.escape(str(headline))}</div>
+                <div class="narrative-text">"{html.escape(str(narrative))}"</div>
+            </div>
+            """
+
+
+def build_trend_figure(main, overlays=None, overlay_colors=None):
+    """Trust Score line plus optional thin overlay lines (one per topic / archetype)."""
+    fig_trend = go.Figure()
+    for name, (x, y) in (overlays or {}).items():
+        fig_trend.add_trace(go.Scatter(
+            x=x, y=y, mode='lines', name=name, opacity=0.6,
+            line=dict(width=1.5, color=(overlay_colors or {}).get(name))
+        ))
+    for name, (x, y) in main.items():
+        fig_trend.add_trace(go.Scatter(
+            x=x,
+            y=y,
+            mode='lines+markers',
+            line=dict(color='#FFC107', width=4),
+            marker=dict(size=6, color='#FFF', line=dict(width=2, color='#000')),
+            name=name
+        ))
+
+    # Zones
+    fig_trend.add_hrect(y0=-2.5, y1=-0.5, fillcolor="red", opacity=0.1, layer="below", line_width=0)
+    fig_trend.add_hrect(y0=0.5, y1=2.5, fillcolor="green", opacity=0.1, layer="below", line_width=0)
+
+    fig_trend.update_layout(
+        template="plotly_dark",
+        yaxis_title="Net Trust Score",
+        yaxis_range=[-3, 3],
+        xaxis_title=None,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(family="Rubik"),
+        hovermode="x unified",
+        showlegend=bool(overlays),
+        legend=dict(orientation="h", y=-0.2, font=dict(family="Rubik", size=11))
+    )
+    return fig_trend
+
+
+def build_payload(df, measure=tracing.TRACE_ENABLED):
+    """
+    Metrics, signal board and every chart for one window of rows (None if empty).
+    measure=True also serializes the trend figures once to record their size
+    (trend_bytes); off by default outside TRACE=1 runs.
+    """
+    if df.empty:
+        return None
+
+    payload = {"voices": len(df)}
+
+    # Metrics
+    total_abs_impact = df['impact_score'].abs().sum()
+    if total_abs_impact > 0:
+        resistance_vol = df[df['impact_score'] < 0]['impact_score'].abs().sum()
+        payload['resistance_pct'] = (resistance_vol / total_abs_impact) * 100
+        payload['consensus_pct'] = 100 - payload['resistance_pct']
+    else:
+        payload['resistance_pct'] = 0
+        payload['consensus_pct'] = 0
+
+    # Signal board
+    payload['threats'] = list(df[df['impact_score'] < 0].groupby('specific_trigger')['impact_score'].sum().sort_values().head(5).items())
+    payload['wins'] = list(df[df['impact_score'] > 0].groupby('specific_trigger')['impact_score'].sum().sort_values(ascending=False).head(5).items())
+    payload['viral'] = list(df['specific_trigger'].value_counts().head(5).items())
+
+    # Donut
+    voice_data = df['archetype'].value_counts().reset_index()
+    voice_data.columns = ['archetype', 'count']
+    fig_donut = px.pie(voice_data, values='count', names='archetype', hole=0.6, color='archetype', color_discrete_map=ARCHETYPE_COLORS)
+    fig_donut.update_layout(template="plotly_dark", showlegend=True, legend=dict(orientation="h", y=-0.2, font=dict(family="Rubik", size=11)), margin=dict(t=0, b=0, l=0, r=0), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+    fig_donut.update_traces(textinfo='percent', textfont=dict(family="Rubik", size=14))
+    payload['fig_donut'] = fig_donut
+
+    # Radar
+    radar_data = df.groupby('topic').agg(
+        volume=('topic', 'count'),
+        avg_sentiment=('impact_score', 'mean'),
+        trigger=('specific_trigger', lambda x: x.mode()[0] if not x.mode().empty else "Various")
+    ).reset_index()
+
+    fig_radar = px.scatter(
+        radar_data, x="volume", y="avg_sentiment", color="avg_sentiment",
+        size="volume", text="trigger", color_continuous_scale="RdYlGn",
+        range_color=[-2.5, 2.5], size_max=60
+    )
+    fig_radar.update_traces(textposition='top center', textfont=dict(family="Rubik", size=12, color="white"))
+    fig_radar.update_layout(template="plotly_dark", xaxis_title="How Loud Is It?", yaxis_title="How Angry Are They?", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', showlegend=False, font=dict(family="Rubik"))
+    fig_radar.add_hline(y=0, line_width=1, line_dash="dash", line_color="#555")
+    fig_radar.add_vline(x=radar_data['volume'].median(), line_width=1, line_dash="dash", line_color="#555")
+    payload['fig_radar'] = fig_radar
+
+    # Trend (fixed point budget per series, whatever the window)
+    main = downsample.trend_series(df)
+    payload['fig_trend'] = build_trend_figure(main)
+    payload['fig_trend_topic'] = build_trend_figure(main, downsample.trend_series(df, group_col='topic'))
+    payload['fig_trend_archetype'] = build_trend_figure(main, downsample.trend_series(df, group_col='archetype'), ARCHETYPE_COLORS)
+    payload['trend_points'] = {
+        key: sum(len(trace.x) for trace in payload[key].data)
+        for key in TREND_KEYS
+    }
+    if measure:
+        payload['trend_bytes'] = {
+            key: len(payload[key].to_json())
+            for key in TREND_KEYS
+        }
+
+    payload['built_at'] = datetime.utcnow().isoformat()
+    return payload
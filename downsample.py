@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+# CHART DOWNSAMPLING
+# Keeps every trend series to a fixed point budget, whatever the window:
+#   1. Pre-bin: rows are folded into at most MAX_BINS time bins (sum / count per
+#      bin via bincount), with a "nice" bin width picked from the window span.
+#   2. LTTB: if there are still more bins than the target, Largest-Triangle-
+#      Three-Buckets keeps the points that preserve the visual shape (spikes
+#      and dips survive, flat stretches collapse).
+# 24H and 3 Months therefore ship the same number of points to the browser.
+
+TREND_MAX_POINTS = 120      # Main "Trust Score" line
+OVERLAY_MAX_POINTS = 48     # Each per-topic / per-archetype overlay line
+MAX_BINS = 480              # Pre-binning resolution before LTTB
+
+BIN_WIDTHS = [900, 1800, 3600, 2 * 3600, 4 * 3600, 6 * 3600, 12 * 3600, 86400, 2 * 86400, 7 * 86400]
+
+
+def to_seconds(timestamps):
+    """Datetime Series (naive = UTC) -> float unix seconds."""
+    ts = pd.to_datetime(timestamps, utc=True)
+    return ((ts - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(seconds=1)).to_numpy(dtype=np.float64)
+
+
+def pick_bin_width(span_seconds, max_bins=MAX_BINS):
+    for width in BIN_WIDTHS:
+        if span_seconds / width <= max_bins:
+            return width
+    return BIN_WIDTHS[-1]
+
+
+def bin_means(t, y, max_bins=MAX_BINS):
+    """Mean of y per time bin; empty bins are dropped. Returns (bin_start_seconds, means)."""
+    if len(t) == 0:
+        return np.array([]), np.array([])
+    width = pick_bin_width(t.max() - t.min(), max_bins)
+    origin = (t.min() // width) * width
+    idx = ((t - origin) // width).astype(np.int64)
+    sums = np.bincount(idx, weights=y)
+    counts = np.bincount(idx)
+    keep = counts > 0
+    return origin + np.nonzero(keep)[0] * width, sums[keep] / counts[keep]
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets. Returns indices of the kept points (first and last always kept)."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)  # threshold-2 inner buckets
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        if i + 1 < threshold - 2:
+            n_start, n_end = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+            avg_x, avg_y = x[n_start:n_end].mean(), y[n_start:n_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        bx, by = x[start:end], y[start:end]
+        area = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def downsample(t, y, max_points):
+    """Pre-bin then LTTB. t in unix seconds. Returns (t, y) with len <= max_points."""
+    bt, by = bin_means(np.asarray(t, dtype=np.float64), np.asarray(y, dtype=np.float64))
+    keep = lttb(bt, by, max_points)
+    return bt[keep], by[keep]
+
+
+def trend_series(df, value_col="impact_score", time_col="created_at", group_col=None,
+                 max_points=TREND_MAX_POINTS, overlay_points=OVERLAY_MAX_POINTS):
+    """
+    {series_name: (datetimes, values)} with a bounded point count per series.
+    Without group_col: one "Trust Score" series. With it: one series per group value.
+    """
+    if df.empty:
+        return {}
+    t = to_seconds(df[time_col])
+    y = pd.to_numeric(df[value_col], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+
+    if group_col is None:
+        groups = {"Trust Score": np.ones(len(df), dtype=bool)}
+        budget = max_points
+    else:
+        labels = df[group_col].fillna("Unknown").to_numpy()
+        groups = {name: labels == name for name in pd.unique(labels)}
+        budget = overlay_points
+
+    series = {}
+    for name, mask in groups.items():
+        st, sy = downsample(t[mask], y[mask], budget)
+        series[name] = (pd.to_datetime(st, unit="s", utc=True), sy)
+    return series
@@ -0,0 +1,267 @@
+import re
+import time
+import bisect
+import threading
+from datetime import datetime, timezone
+from array import array
+import numpy as np
+import pandas as pd
+
+# EVIDENCE LOG SEARCH INDEX
+# In-memory inverted index over summary, specific_trigger and caption.
+# Trilingual tokenization: Latin-script words (English / Bahasa) are lowercased
+# whole words, Mandarin runs are split into overlapping CJK bigrams so
+# "安华" matches inside "拿督斯里安华". Rows are appended incrementally and
+# postings stay sorted by doc id, so intersections are plain merges.
+# Sync follows the sentiment_logs id, not created_at: a row written late with an
+# older timestamp (outbox replay, a second worker, another profile) still has a
+# new id, so it is picked up. Doc ids are then not always in time order; while
+# they are, "since" is a binary search, otherwise a cached time ordering is used.
+
+CJK_RUN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+WORD = re.compile(r"[^\W_]+")
+
+DISPLAY_FIELDS = ["created_at", "topic", "specific_trigger", "archetype", "impact_score", "summary"]
+# Ids are handed out at insert but become visible at commit, so a concurrent writer's
+# smaller id can land after a bigger one was read: each sync re-reads this many ids
+# below the watermark (already indexed rows are skipped).
+ID_LOOKBACK = 500
+
+
+def tokenize(text):
+    """Lowercased Latin words + CJK bigrams (single CJK chars kept as unigrams)."""
+    if not text:
+        return []
+    text = str(text).lower()
+    tokens = []
+    for run in CJK_RUN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    for word in WORD.findall(CJK_RUN.sub(" ", text)):
+        if len(word) > 1 or word.isdigit():
+            tokens.append(word)
+    return tokens
+
+
+def _facet(name, value):
+    return f"\x00{name}:{(value or '').lower()}"
+
+
+class EvidenceIndex:
+    def __init__(self):
+        self.postings = {}          # token -> array('I') of doc ids, ascending
+        self.timestamps = array("d")  # doc id -> unix seconds
+        self.rows = []              # doc id -> display tuple
+        self.ids = []               # doc id -> source row id
+        self.keys = set()           # source row ids already indexed
+        self.watermark = None       # highest sentiment_logs id seen
+        self.in_order = True        # doc ids ascending in time (the common case)
+        self._by_time = None        # doc ids sorted by time, built lazily when not in_order
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add_rows(self, rows):
+        """Index new rows. Each row: id, created_at (ISO), topic, specific_trigger, archetype, impact_score, summary, caption."""
+        fresh = [r for r in rows if r.get("id") not in self.keys]
+        fresh.sort(key=lambda r: r.get("created_at") or "")
+        with self.lock:
+            for r in fresh:
+                doc_id = len(self.rows)
+                ts = _to_epoch(r.get("created_at"))
+                if self.timestamps and ts < self.timestamps[-1]:
+                    self.in_order = False
+                self.rows.append(tuple(r.get(f) for f in DISPLAY_FIELDS))
+                self.timestamps.append(ts)
+                self.ids.append(r.get("id"))
+                self.keys.add(r.get("id"))
+
+                terms = set(tokenize(r.get("summary")))
+                terms.update(tokenize(r.get("specific_trigger")))
+                terms.update(tokenize(r.get("caption")))
+                terms.add(_facet("topic", r.get("topic")))
+                terms.add(_facet("archetype", r.get("archetype")))
+                for term in terms:
+                    posting = self.postings.get(term)
+                    if posting is None:
+                        posting = self.postings[term] = array("I")
+                    posting.append(doc_id)
+
+                row_id = r.get("id")
+                if isinstance(row_id, int) and (self.watermark is None or row_id > self.watermark):
+                    self.watermark = row_id
+            if fresh:
+                self._by_time = None
+        return fresh
+
+    def _time_order(self):
+        """(doc ids sorted by time, rank of each doc in that order). Caller holds the lock."""
+        if self._by_time is None:
+            order = np.argsort(np.frombuffer(self.timestamps, dtype=np.float64), kind="stable")
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+            self._by_time = (order, rank)
+        return self._by_time
+
+    def search(self, query="", topic=None, archetype=None, since=None, page=0, page_size=25):
+        """
+        Newest-first search. Returns (total_matches, rows_for_this_page).
+        Only the requested page is materialized.
+        """
+        with self.lock:
+            n = len(self.rows)
+            terms = set(tokenize(query))
+            if topic:
+                terms.add(_facet("topic", topic))
+            if archetype:
+                terms.add(_facet("archetype", archetype))
+
+            if not self.in_order:
+                return self._search_unordered(terms, since, page, page_size)
+
+            # Doc ids are appended in time order, so "since" is a binary search
+            first_doc = bisect.bisect_left(self.timestamps, since) if since else 0
+
+            if terms:
+                lists = []
+                for term in terms:
+                    posting = self.postings.get(term)
+                    if posting is None:
+                        return 0, []
+                    lists.append(np.frombuffer(posting, dtype=np.uint32))
+                lists.sort(key=len)
+                matches = lists[0]
+                for other in lists[1:]:
+                    matches = np.intersect1d(matches, other, assume_unique=True)
+                    if not len(matches):
+                        return 0, []
+                matches = matches[np.searchsorted(matches, first_doc):]
+                total = len(matches)
+                stop = total - page * page_size
+                doc_ids = matches[max(stop - page_size, 0):max(stop, 0)][::-1].tolist()
+            else:
+                total = n - first_doc
+                stop = n - page * page_size
+                doc_ids = list(range(max(stop, first_doc) - 1, max(stop - page_size, first_doc) - 1, -1))
+
+            return total, [dict(zip(DISPLAY_FIELDS, self.rows[d])) for d in doc_ids]
+
+    def _search_unordered(self, terms, since, page, page_size):
+        """search() when late rows broke time order: same results via the cached time ordering."""
+        order, rank = self._time_order()
+        ts = np.frombuffer(self.timestamps, dtype=np.float64)
+        if terms:
+            lists = []
+            for term in terms:
+                posting = self.postings.get(term)
+                if posting is None:
+                    return 0, []
+                lists.append(np.frombuffer(posting, dtype=np.uint32))
+            lists.sort(key=len)
+            matches = lists[0]
+            for other in lists[1:]:
+                matches = np.intersect1d(matches, other, assume_unique=True)
+            if since:
+                matches = matches[ts[matches] >= since]
+            matches = matches[np.argsort(rank[matches], kind="stable")]
+        else:
+            first = np.searchsorted(ts[order], since, side="left") if since else 0
+            matches = order[first:]
+        total = len(matches)
+        stop = total - page * page_size
+        doc_ids = matches[max(stop - page_size, 0):max(stop, 0)][::-1].tolist()
+        return total, [dict(zip(DISPLAY_FIELDS, self.rows[d])) for d in doc_ids]
+
+    def compact(self, since):
+        """Drop docs older than 'since' (rebuilds postings, forgets their ids). Call occasionally, not per query."""
+        with self.lock:
+            ts = np.frombuffer(self.timestamps, dtype=np.float64)
+            keep = ts >= since
+            dropped = int(len(keep) - keep.sum())
+            if not dropped:
+                return 0
+            new_ids = np.cumsum(keep) - 1
+            postings = {}
+            for term, posting in self.postings.items():
+                ids = np.frombuffer(posting, dtype=np.uint32)
+                ids = new_ids[ids[keep[ids]]]
+                if len(ids):
+                    postings[term] = array("I", ids.astype(np.uint32).tobytes())
+            kept = np.flatnonzero(keep).tolist()
+            self.keys.difference_update(self.ids[d] for d in np.flatnonzero(~keep).tolist())
+            self.rows = [self.rows[d] for d in kept]
+            self.ids = [self.ids[d] for d in kept]
+            self.timestamps = array("d", ts[keep].tobytes())
+            self.postings = postings
+            kept_ts = ts[keep]
+            self.in_order = bool(np.all(kept_ts[1:] >= kept_ts[:-1]))
+            self._by_time = None
+            return dropped
+
+
+def to_frame(index):
+    """Indexed rows as a DataFrame (created_at as UTC datetimes) for the chart builders."""
+    with index.lock:
+        df = pd.DataFrame(index.rows, columns=DISPLAY_FIELDS)
+        ts = np.frombuffer(index.timestamps, dtype=np.float64).copy()
+    df['created_at'] = pd.to_datetime(ts, unit='s', utc=True)
+    df['impact_score'] = pd.to_numeric(df['impact_score'], errors='coerce').fillna(0)
+    df['archetype'] = df['archetype'].fillna("Unknown")
+    return df
+
+
+def _to_epoch(value):
+    if not value:
+        return 0.0
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
+    except ValueError:
+        return 0.0
+
+
+def sync_from_supabase(index, supabase, since_iso, page_size=1000, on_rows=None):
+    """
+    Pull sentiment_logs rows inserted since the last sync (id above the watermark,
+    created_at within the window), plus their captions, and index them.
+    on_rows receives only rows that were not indexed before, so other incremental
+    aggregates can ride on the same scan.
+    """
+    last_id = max(index.watermark - ID_LOOKBACK, 0) if index.watermark is not None else None
+    started = time.time()
+    added = 0
+    while True:
+        query = supabase.table("sentiment_logs") \
+            .select("id, video_id, created_at, topic, specific_trigger, archetype, impact_score, summary") \
+            .gte("created_at", since_iso)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        response = query.order("id").limit(page_size).execute()
+        rows = response.data or []
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        video_ids = list({r["video_id"] for r in rows if r.get("video_id")})
+        captions = {}
+        for i in range(0, len(video_ids), 200):
+            chunk = supabase.table("videos").select("id, caption").in_("id", video_ids[i:i + 200]).execute()
+            captions.update({v["id"]: v.get("caption") for v in chunk.data or []})
+        for r in rows:
+            r["caption"] = captions.get(r.get("video_id"))
+
+        fresh = index.add_rows(rows)
+        added += len(fresh)
+        if on_rows and fresh:
+            on_rows(fresh)
+        if len(rows) < page_size:
+            break
+
+    if added:
+        print(f"🔎 Evidence index: +{added} rows ({len(index)} total) in {time.time() - started:.2f}s")
+    return added
@@ -0,0 +1,134 @@
+import re
+import heapq
+
+# EVIDENCE PACKER
+# Builds the evidence block for brief prompts:
+#   1. Top-k: strongest threats / wins via server-side ORDER BY + LIMIT (or a heap locally).
+#   2. Diversity: MMR-style greedy pick so five near-identical "Diesel Subsidy"
+#      rows don't crowd out the other stories.
+#   3. Budget: compact one-line encoding, packed until a fixed token budget is full.
+
+CANDIDATE_POOL = 40          # Candidates per side before diversity selection
+TOKEN_BUDGET = 900           # Evidence block budget (both sides together)
+MMR_LAMBDA = 0.7             # 1.0 = pure impact ranking, 0.0 = pure diversity
+DUPLICATE_SIMILARITY = 0.9   # Never pick two rows this similar
+
+EVIDENCE_FIELDS = "id, topic, specific_trigger, summary, archetype, sentiment, impact_score"
+
+TOPIC_CODES = {
+    "Economic Anxiety": "EA",
+    "Institutional Integrity": "II",
+    "Identity Politics": "IP",
+    "Public Competency": "PC",
+    "Political Maneuvering": "PM",
+}
+ARCHETYPE_CODES = {
+    "Heartland Conservative": "HC",
+    "Economic Pragmatist": "EP",
+    "Urban Reformist": "UR",
+    "Digital Cynic": "DC",
+}
+
+LEGEND = (
+    "FORMAT: impact|topic|trigger|voter|summary. "
+    "Topics: " + ", ".join(f"{c}={t}" for t, c in TOPIC_CODES.items()) + ". "
+    "Voters: " + ", ".join(f"{c}={a}" for a, c in ARCHETYPE_CODES.items()) + "."
+)
+
+_WORDS = re.compile(r"[^\W_]+")
+
+
+def estimate_tokens(text):
+    """Cheap token estimate: ~4 Latin chars per token, ~1 token per CJK/emoji char."""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def encode_row(row):
+    """One compact line per evidence row."""
+    impact = row.get("impact_score") or 0
+    topic = TOPIC_CODES.get(row.get("topic"), row.get("topic") or "?")
+    archetype = ARCHETYPE_CODES.get(row.get("archetype"), row.get("archetype") or "?")
+    summary = " ".join((row.get("summary") or "").split())
+    return f"{impact:+.1f}|{topic}|{row.get('specific_trigger') or 'General'}|{archetype}|{summary}"
+
+
+def top_k(rows, k, largest=True):
+    """Heap-based top-k by impact_score (no full sort)."""
+    pick = heapq.nlargest if largest else heapq.nsmallest
+    return pick(k, rows, key=lambda r: r.get("impact_score") or 0)
+
+
+def fetch_candidates(supabase, since_iso, k=CANDIDATE_POOL):
+    """Server-side ordering: the database returns only the k strongest rows per side."""
+    base = lambda: supabase.table("sentiment_logs").select(EVIDENCE_FIELDS).gte("created_at", since_iso)
+    threats = base().lt("impact_score", 0).order("impact_score").limit(k).execute().data or []
+    wins = base().gt("impact_score", 0).order("impact_score", desc=True).limit(k).execute().data or []
+    return threats, wins
+
+
+def _similarity(a, b):
+    score = 0.0
+    if a["topic"] == b["topic"]:
+        score += 0.4
+    if a["trigger"] == b["trigger"]:
+        score += 0.4
+    if a["words"] and b["words"]:
+        score += 0.2 * len(a["words"] & b["words"]) / len(a["words"] | b["words"])
+    return score
+
+
+def mmr_select(rows, budget_tokens, lam=MMR_LAMBDA):
+    """Greedy MMR under a token budget. Returns [(row, encoded_line)] in pick order."""
+    pool = []
+    for row in rows:
+        line = encode_row(row)
+        pool.append({
+            "row": row,
+            "line": line,
+            "cost": estimate_tokens(line) + 1,
+            "relevance": abs(row.get("impact_score") or 0),
+            "topic": row.get("topic"),
+            "trigger": (row.get("specific_trigger") or "").strip().lower(),
+            "words": set(_WORDS.findall((row.get("summary") or "").lower())),
+        })
+    top_relevance = max((c["relevance"] for c in pool), default=0) or 1.0
+
+    selected = []
+    remaining = budget_tokens
+    while pool:
+        best, best_score = None, None
+        for cand in pool:
+            if cand["cost"] > remaining:
+                continue
+            redundancy = max((_similarity(cand, s) for s in selected), default=0.0)
+            if redundancy >= DUPLICATE_SIMILARITY:
+                continue
+            score = lam * cand["relevance"] / top_relevance - (1 - lam) * redundancy
+            if best_score is None or score > best_score:
+                best, best_score = cand, score
+        if best is None:
+            break
+        selected.append(best)
+        remaining -= best["cost"]
+        pool.remove(best)
+    return [(c["row"], c["line"]) for c in selected]
+
+
+def pack(threats, wins, budget_tokens=TOKEN_BUDGET):
+    """
+    Diversity-select threats and wins into one compact evidence block.
+    Returns (text, selected_rows, estimated_tokens).
+    """
+    header = LEGEND
+    remaining = budget_tokens - estimate_tokens(header) - 8
+    picked_threats = mmr_select(threats, remaining // 2)
+    used = sum(estimate_tokens(line) + 1 for _, line in picked_threats)
+    picked_wins = mmr_select(wins, remaining - used)
+
+    lines = [header, "THREATS:"] + [line for _, line in picked_threats] + ["WINS:"] + [line for _, line in picked_wins]
+    text = "\n".join(lines)
+    rows = [r for r, _ in picked_threats] + [r for r, _ in picked_wins]
+    tokens = estimate_tokens(text)
+    print(f"📦 Evidence packed: {len(picked_threats)} threats + {len(picked_wins)} wins from {len(threats) + len(wins)} candidates (~{tokens}/{budget_tokens} tokens).")
+    return text, rows, tokens
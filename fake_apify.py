@@ -0,0 +1,76 @@
+import json
+import time
+import uuid
+import threading
+
+# LOCAL FAKE APIFY
+# Drop-in stand-in for ApifyClient's actor().call() / dataset().iterate_items()
+# so the scraper (and the sharded mode) can be exercised without a token or
+# network. Items are matched to a run via their 'searchQuery' field, the same
+# field clockworks/tiktok-scraper writes into its dataset.
+
+
+class _FakeDataset:
+    def __init__(self, items):
+        self._items = items
+
+    def iterate_items(self):
+        for item in self._items:
+            yield item
+
+
+class _FakeActor:
+    def __init__(self, client):
+        self._client = client
+
+    def call(self, run_input=None):
+        queries = (run_input or {}).get("searchQueries", [])
+        return self._client._start_run(queries)
+
+
+class FakeApifyClient:
+    """
+    items: list of Apify-shaped video dicts (optionally with 'searchQuery').
+    query_latency: seconds each query "takes", either a float or {query: seconds}.
+    """
+
+    def __init__(self, items, query_latency=0.0):
+        self.items = items
+        self.query_latency = query_latency
+        self.runs = []
+        self._datasets = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        # Either a bare item list or {"items": [...], "query_latency": ...}
+        if isinstance(data, list):
+            return cls(data)
+        return cls(data.get("items", []), data.get("query_latency", 0.0))
+
+    def _latency(self, query):
+        if isinstance(self.query_latency, dict):
+            return self.query_latency.get(query, 0.0)
+        return self.query_latency
+
+    def _start_run(self, queries):
+        # A run is as slow as its queries combined, like a real actor run
+        time.sleep(sum(self._latency(q) for q in queries))
+
+        wanted = set(queries)
+        items = [i for i in self.items if i.get("searchQuery") in wanted or "searchQuery" not in i]
+
+        dataset_id = uuid.uuid4().hex
+        with self._lock:
+            self._datasets[dataset_id] = items
+            self.runs.append(list(queries))
+        return {"id": dataset_id, "defaultDatasetId": dataset_id, "status": "SUCCEEDED"}
+
+    def actor(self, actor_id):
+        return _FakeActor(self)
+
+    def dataset(self, dataset_id):
+        with self._lock:
+            return _FakeDataset(self._datasets.get(dataset_id, []))
@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import fcntl
+import threading
+from contextlib import contextmanager
+
+# SHARED GEMINI QUOTA
+# Every Gemini caller (sentiment engine, comment engine, both narrative scripts,
+# every worker process on this host) draws from the same per-model budget,
+# kept in a small JSON file guarded by an exclusive file lock:
+#   - Token buckets for requests/minute and tokens/minute.
+#   - An AIMD concurrency limit: +1/limit per success, halved on a 429, with a
+#     short cooldown. Callers past the limit wait instead of piling on.
+# A rate-limited call raises RateLimited so the caller can requeue the item
+# rather than drop it.
+
+QUOTA_PATH = os.getenv("GEMINI_QUOTA_PATH", os.path.join("state", "gemini_quota.json"))
+
+DEFAULT_LIMITS = {
+    "rpm": int(os.getenv("GEMINI_RPM", "2000")),
+    "tpm": int(os.getenv("GEMINI_TPM", "4000000")),
+}
+MODEL_LIMITS = {}  # Per-model overrides, e.g. {"gemini-2.0-flash": {"rpm": 15, "tpm": 1000000}}
+
+MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+MIN_CONCURRENCY = 1
+COOLDOWN_SECONDS = 5         # After a 429, nobody starts a new call for this long
+STALE_SLOT_SECONDS = 180     # In-flight slots of crashed processes expire after this
+MAX_WAIT_SLICE = 0.5         # Waiters re-check the shared state at least this often
+
+
+# Wall clock and sleep used for every quota decision (tests swap in a fake clock)
+_clock = time.time
+_sleep = time.sleep
+
+
+class RateLimited(Exception):
+    """Gemini answered 429 / RESOURCE_EXHAUSTED. The item should be requeued."""
+
+
+def is_rate_limit(error):
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    text = str(error)
+    return "429" in text or "RESOURCE_EXHAUSTED" in text
+
+
+def limits_for(model):
+    return {**DEFAULT_LIMITS, **MODEL_LIMITS.get(model, {})}
+
+
+# Per-process counters for the throughput report
+_stats = {"started": time.time(), "requests": 0, "tokens": 0, "rate_limited": 0, "wait_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+@contextmanager
+def _locked_state():
+    folder = os.path.dirname(QUOTA_PATH)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(QUOTA_PATH + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            state = {}
+            if os.path.exists(QUOTA_PATH):
+                try:
+                    with open(QUOTA_PATH, encoding="utf-8") as f:
+                        state = json.load(f)
+                except ValueError:
+                    state = {}
+            yield state
+            tmp_path = QUOTA_PATH + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, QUOTA_PATH)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _model_state(state, model, now):
+    limits = limits_for(model)
+    m = state.setdefault(model, {
+        "req_tokens": limits["rpm"], "tok_tokens": limits["tpm"], "refilled_at": now,
+        "limit": float(min(4, MAX_CONCURRENCY)), "in_flight": {}, "cooldown_until": 0.0,
+    })
+    # Refill both buckets (capacity = one minute of quota)
+    elapsed = max(0.0, now - m["refilled_at"])
+    m["req_tokens"] = min(limits["rpm"], m["req_tokens"] + elapsed * limits["rpm"] / 60)
+    m["tok_tokens"] = min(limits["tpm"], m["tok_tokens"] + elapsed * limits["tpm"] / 60)
+    m["refilled_at"] = now
+    # Forget slots held by processes that died mid-call
+    m["in_flight"] = {k: t for k, t in m["in_flight"].items() if now - t < STALE_SLOT_SECONDS}
+    return m, limits
+
+
+def _try_acquire(model, est_tokens, slot_id):
+    """One attempt. Returns 0 on success, otherwise seconds to wait before retrying."""
+    now = _clock()
+    with _locked_state() as state:
+        m, limits = _model_state(state, model, now)
+        est_tokens = min(est_tokens, limits["tpm"])
+        if now < m["cooldown_until"]:
+            return m["cooldown_until"] - now
+        if len(m["in_flight"]) >= int(m["limit"]):
+            return MAX_WAIT_SLICE
+        if m["req_tokens"] < 1:
+            return (1 - m["req_tokens"]) * 60 / limits["rpm"]
+        if m["tok_tokens"] < est_tokens:
+            return (est_tokens - m["tok_tokens"]) * 60 / limits["tpm"]
+        m["req_tokens"] -= 1
+        m["tok_tokens"] -= est_tokens
+        m["in_flight"][slot_id] = now
+        return 0
+
+
+def _release(model, slot_id, est_tokens, actual_tokens, rate_limited):
+    with _locked_state() as state:
+        now = _clock()
+        m, limits = _model_state(state, model, now)
+        m["in_flight"].pop(slot_id, None)
+        if actual_tokens is not None:
+            # Settle the estimate against what the call really used
+            m["tok_tokens"] = min(limits["tpm"], m["tok_tokens"] + est_tokens - actual_tokens)
+        if rate_limited:
+            m["limit"] = max(MIN_CONCURRENCY, m["limit"] / 2)
+            m["cooldown_until"] = now + COOLDOWN_SECONDS
+        else:
+            m["limit"] = min(MAX_CONCURRENCY, m["limit"] + 1 / m["limit"])
+
+
+class _Slot:
+    def __init__(self):
+        self.actual_tokens = None
+
+    def record(self, response):
+        """Report real usage from a Gemini response's usage_metadata."""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self.actual_tokens = (getattr(usage, "prompt_token_count", 0) or 0) + (getattr(usage, "candidates_token_count", 0) or 0)
+
+
+@contextmanager
+def acquire(model, est_tokens=1000):
+    """
+    Block until the shared quota admits one call of ~est_tokens, then yield a slot.
+    A 429 raised inside the block is converted to RateLimited (after the AIMD cut).
+    """
+    slot_id = f"{os.getpid()}-{threading.get_ident()}-{time.monotonic_ns()}"
+    waited = 0.0
+    while True:
+        wait = _try_acquire(model, est_tokens, slot_id)
+        if not wait:
+            break
+        wait = min(wait, MAX_WAIT_SLICE)
+        _sleep(wait)
+        waited += wait
+
+    slot = _Slot()
+    rate_limited = False
+    try:
+        yield slot
+    except Exception as e:
+        if is_rate_limit(e):
+            rate_limited = True
+            raise RateLimited(str(e)) from e
+        raise
+    finally:
+        _release(model, slot_id, est_tokens, slot.actual_tokens, rate_limited)
+        with _stats_lock:
+            _stats["wait_seconds"] += waited
+            _stats["requests"] += 1
+            _stats["tokens"] += slot.actual_tokens if slot.actual_tokens is not None else est_tokens
+            _stats["rate_limited"] += rate_limited
+
+
+def call(model, est_tokens, fn, retries=0):
+    """Run fn() (one Gemini request) under the quota; retry rate-limited calls up to `retries` times."""
+    for attempt in range(retries + 1):
+        try:
+            with acquire(model, est_tokens) as slot:
+                response = fn()
+                slot.record(response)
+                return response
+        except RateLimited:
+            if attempt == retries:
+                raise
+            print(f"⏳ Gemini rate-limited, retrying ({attempt + 1}/{retries})...")
+
+
+def stats(model):
+    with _locked_state() as state:
+        m, limits = _model_state(state, model, _clock())
+        limit = m["limit"]
+    with _stats_lock:
+        s = dict(_stats)
+    minutes = max((time.time() - s["started"]) / 60, 1e-9)
+    return {
+        **s,
+        "rpm_achieved": s["requests"] / minutes,
+        "tpm_achieved": s["tokens"] / minutes,
+        "rpm_ceiling": limits["rpm"],
+        "tpm_ceiling": limits["tpm"],
+        "concurrency_limit": limit,
+    }
+
+
+def report(model):
+    s = stats(model)
+    print(f"🎟️ Gemini quota [{model}]: {s['rpm_achieved']:.1f}/{s['rpm_ceiling']} RPM "
+          f"({s['rpm_achieved'] / s['rpm_ceiling'] * 100:.1f}%), {s['tpm_achieved']:.0f}/{s['tpm_ceiling']} TPM "
+          f"({s['tpm_achieved'] / s['tpm_ceiling'] * 100:.1f}%) | 429s: {s['rate_limited']} | "
+          f"waited {s['wait_seconds']:.1f}s | concurrency limit {s['concurrency_limit']:.1f}")
+    return s
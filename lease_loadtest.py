@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import tempfile
+import multiprocessing as mp
+import numpy as np
+import storage
+import work_lease
+
+# LEASE LOAD TEST
+# Drains a synthetic videos backlog in an embedded SQLite store (storage.LocalStore)
+# with 1, 2, 4, ... worker processes running the analyzer's claim loop:
+# fetch the top unleased candidates, claim_ranked a batch, mark it analyzed.
+# Reports claims/s, races lost and wall time per worker count (the scaling
+# curve), and fails if any video was claimed by two workers.
+#
+# Usage: python lease_loadtest.py [videos] [max_workers] [work_ms_per_video]
+
+POOL_SIZE = 100   # Candidates fetched per batch (sentiment_engine's default pool)
+BATCH_SIZE = 20   # analyzeBatchSize
+
+
+def seed(path, videos):
+    store = storage.LocalStore(path)
+    rng = np.random.default_rng(7)
+    rows = [{"id": f"v{i}", "caption": "synthetic", "views": int(v), "is_analyzed": False, "claimed_by": None, "lease_expires_at": None}
+            for i, v in enumerate(rng.integers(0, 1_000_000, videos))]
+    for i in range(0, len(rows), 1000):
+        store.table("videos").insert(rows[i:i + 1000]).execute()
+
+
+def run_worker(path, worker, work_ms, results):
+    store = storage.LocalStore(path)
+    worker_id = f"bench-{worker}"
+    claimed, lost, claim_seconds = [], 0, 0.0
+    while True:
+        candidates = store.table("videos") \
+            .select("id, views") \
+            .eq("is_analyzed", False) \
+            .or_(work_lease.unclaimed_filter()) \
+            .order("views", desc=True) \
+            .limit(POOL_SIZE) \
+            .execute().data
+        if not candidates:
+            break
+        started = time.perf_counter()
+        batch, batch_lost = work_lease.claim_ranked(store, candidates, BATCH_SIZE, worker_id=worker_id)
+        claim_seconds += time.perf_counter() - started
+        lost += batch_lost
+        if not batch:
+            continue
+        if work_ms:
+            time.sleep(work_ms * len(batch) / 1000)
+        ids = [c["id"] for c in batch]
+        store.table("videos").update({"is_analyzed": True}).in_("id", ids).execute()
+        claimed.extend(ids)
+    results.put((claimed, lost, claim_seconds))
+
+
+def scenario(videos, workers, work_ms):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "lease.db")
+        seed(path, videos)
+        results = mp.Queue()
+        procs = [mp.Process(target=run_worker, args=(path, w, work_ms, results)) for w in range(workers)]
+        started = time.time()
+        for p in procs:
+            p.start()
+        outcomes = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+        elapsed = time.time() - started
+
+    ids = [i for claimed, _, _ in outcomes for i in claimed]
+    lost = sum(o[1] for o in outcomes)
+    claim_seconds = sum(o[2] for o in outcomes)
+    duplicates = len(ids) - len(set(ids))
+    print(f"   {workers:>3} workers {len(ids):>8} claimed {len(ids) / elapsed:>9.0f} videos/s "
+          f"{claim_seconds / max(len(ids), 1) * 1000:>8.2f} ms claiming/video {lost:>7} lost {elapsed:>7.2f}s"
+          + (f"  ❌ {duplicates} double claims" if duplicates else ""))
+    return duplicates == 0 and len(set(ids)) == videos
+
+
+if __name__ == "__main__":
+    videos = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    work_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    print(f"🔥 Lease load test: {videos} videos, batches of {BATCH_SIZE} from a pool of {POOL_SIZE}, {work_ms:g}ms work per video ({os.cpu_count()} CPUs)")
+    workers, ok = 1, True
+    while workers <= max_workers:
+        ok = scenario(videos, workers, work_ms) and ok
+        workers *= 2
+    if not ok:
+        sys.exit("❌ Lease exclusivity violated (or backlog not fully drained).")
+    print("✅ Every video claimed exactly once.")
@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import tracking_profiles
+import scraper_service
+import sentiment_engine
+import trust_metrics
+
+# MULTI-TARGET PIPELINE
+# Runs scrape -> classify for every tracking profile at once.
+# - One shared Apify client, Supabase client, Gemini client and classification cache.
+# - Scrape shards from all profiles share one pool of actor slots, handed out
+#   round-robin with a per-profile cap, so a profile with many queries can't
+#   starve the others.
+# - Classification runs one batch per profile concurrently; each profile only
+#   draws from its own partition, with its own batch size.
+#
+# Usage: python multi_target.py [profile_name ...]
+
+MAX_CONCURRENT_RUNS = int(os.getenv("MULTI_TARGET_MAX_RUNS", "4"))
+MAX_CONCURRENT_PROFILES = int(os.getenv("MULTI_TARGET_MAX_PROFILES", "4"))
+
+
+def scrape_all(profiles, client=None, max_concurrent=MAX_CONCURRENT_RUNS):
+    """Fair-share scrape across profiles. Returns per-profile scrape stats."""
+    client = client or scraper_service.get_apify_client()
+    queues = {p["name"]: deque(scraper_service.shard_queries(p)) for p in profiles}
+    by_name = {p["name"]: p for p in profiles}
+    in_flight = {name: 0 for name in queues}
+    seen_ids = {name: set() for name in queues}
+    stats = {name: {"shards": len(q), "items": 0, "unique": 0, "saved": 0, "apify_usd": 0.0, "seconds": 0.0} for name, q in queues.items()}
+    rotation = deque(queues)
+    started = time.time()
+
+    def next_shard():
+        # Round-robin: first profile in rotation with work left and a free per-profile slot
+        for _ in range(len(rotation)):
+            name = rotation[0]
+            rotation.rotate(-1)
+            if queues[name] and in_flight[name] < by_name[name]["maxConcurrentRuns"]:
+                return name, queues[name].popleft()
+        return None
+
+    with ThreadPoolExecutor(max_workers=max_concurrent) as pool:
+        futures = {}
+        while True:
+            while len(futures) < max_concurrent:
+                picked = next_shard()
+                if not picked:
+                    break
+                name, queries = picked
+                in_flight[name] += 1
+                futures[pool.submit(scraper_service.run_shard, client, by_name[name], queries)] = name
+            if not futures:
+                break
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures.pop(future)
+                in_flight[name] -= 1
+                try:
+                    queries, items, cost = future.result()
+                except Exception as e:
+                    print(f"  ⚠️ [{name}] Shard failed: {e}")
+                    continue
+
+                fresh = scraper_service.dedupe_items(items, seen_ids[name])
+                stats[name]["items"] += len(items)
+                stats[name]["unique"] += len(fresh)
+                stats[name]["apify_usd"] += cost
+                stats[name]["seconds"] = time.time() - started
+                print(f"  📦 [{name}] Shard {json.dumps(queries, ensure_ascii=False)}: {len(items)} items, {len(fresh)} new.")
+
+                # Stream into ingest as each shard lands (main thread, shared Supabase client)
+                if fresh:
+                    stats[name]["saved"] += scraper_service.save_results(fresh, by_name[name])
+
+    return stats
+
+
+def classify_all(profiles, max_concurrent=MAX_CONCURRENT_PROFILES):
+    """One classification batch per profile, concurrently, sharing one metrics engine."""
+    metrics = trust_metrics.load_or_rebuild(sentiment_engine.supabase)
+    with ThreadPoolExecutor(max_workers=max_concurrent) as pool:
+        futures = {p["name"]: pool.submit(sentiment_engine.analyze_videos, p, metrics) for p in profiles}
+        stats = {}
+        for name, future in futures.items():
+            try:
+                stats[name] = future.result()
+            except Exception as e:
+                print(f"❌ [{name}] Classification failed: {e}")
+                stats[name] = {}
+    metrics.save()
+    return stats
+
+
+def report(profiles, scrape_stats, classify_stats, elapsed):
+    print("\n📊 PER-PROFILE REPORT")
+    print(f"{'profile':<22}{'scraped':>9}{'saved':>7}{'avoided':>9}{'scrape s':>10}{'classified':>12}{'gemini':>8}{'cache':>7}{'tokens':>9}{'vid/min':>9}{'cost $':>10}")
+    for p in profiles:
+        name = p["name"]
+        s = scrape_stats.get(name, {})
+        c = classify_stats.get(name, {})
+        tokens = c.get("prompt_tokens", 0) + c.get("output_tokens", 0)
+        cost = s.get("apify_usd", 0.0) + c.get("cost_usd", 0.0)
+        rate = c.get("processed", 0) / (c["seconds"] / 60) if c.get("seconds") else 0.0
+        print(f"{name:<22}{s.get('unique', 0):>9}{s.get('saved', 0):>7}{scraper_service.ingest_stats[name]['avoided']:>9}{s.get('seconds', 0):>10.1f}{c.get('processed', 0):>12}"
+              f"{c.get('gemini_calls', 0):>8}{c.get('cache_hits', 0):>7}{tokens:>9}{rate:>9.1f}{cost:>10.4f}")
+    print(f"⏱️ Total wall time: {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    try:
+        started = time.time()
+        profiles = tracking_profiles.load_profiles(sys.argv[1:] or None)
+        print(f"🎯 Tracking {len(profiles)} profiles: {', '.join(p['name'] for p in profiles)}")
+
+        scrape_stats = scrape_all(profiles)
+        classify_stats = classify_all(profiles)
+        report(profiles, scrape_stats, classify_stats, time.time() - started)
+
+    except Exception as e:
+        print(f"\033[91m❌ Critical Error: {e}\033[0m")
@@ -3,34 +3,50 @@ import json
 import time
 from google import genai
 from google.genai import types
-from supabase import create_client, Client
 from dotenv import load_dotenv
+import brief_trigger
+import evidence_packer
+import tracing
+import cassette
+import storage
+import gemini_quota
 
 load_dotenv()
 
 # --- CONFIGURATION ---
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-if not GEMINI_API_KEY or not SUPABASE_URL or not SUPABASE_KEY:
+if not GEMINI_API_KEY:
     raise ValueError("❌ Missing API Keys in .env")
 
 # Initialize Clients (Using the NEW Google SDK)
-client = genai.Client(api_key=GEMINI_API_KEY)
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+client = cassette.wrap_gemini(genai.Client(api_key=GEMINI_API_KEY))
+supabase = cassette.wrap_supabase(storage.connect())
 
+# Set FORCE_BRIEF=1 to bypass the change-point gate (manual runs)
+FORCE_BRIEF = os.getenv("FORCE_BRIEF") == "1"
+# Own change-point state: narrative_v2 keeps the default one
+TRIGGER_CHANNEL = "narrative_gen"
+
+@tracing.traced("brief.generate")
 def generate_daily_brief():
     print("🗞️ Generating Strategic Intelligence Brief...")
 
     try:
+        # 0. Only spend a Gemini call if something actually moved
+        with tracing.span("brief.gate"):
+            decision = brief_trigger.evaluate(supabase, channel=TRIGGER_CHANNEL)
+        if not decision["fire"] and not FORCE_BRIEF:
+            return
+
         # 1. Fetch analyzed logs from the last 24h
         # FIXED: We select 'topic', NOT 'domain' to match your database
-        response = supabase.table("sentiment_logs") \
-            .select("topic, summary, archetype, sentiment, impact_score") \
-            .order("created_at", desc=True) \
-            .limit(300) \
-            .execute()
+        with tracing.span("supabase.select.evidence", "net"):
+            response = supabase.table("sentiment_logs") \
+                .select("id, topic, specific_trigger, summary, archetype, sentiment, impact_score") \
+                .order("created_at", desc=True) \
+                .limit(300) \
+                .execute()
         
         data = response.data
         if not data:
@@ -40,6 +56,12 @@ def generate_daily_brief():
         # 2. Calculate "Pulse" Metrics
         # Avoid division by zero if data is empty
         avg_score = sum(d['impact_score'] for d in data) / len(data) if len(data) > 0 else 0
+
+        # Heap top-k per side, then diversity-pack into a fixed token budget
+        threats = evidence_packer.top_k([d for d in data if (d['impact_score'] or 0) < 0], evidence_packer.CANDIDATE_POOL, largest=False)
+        wins = evidence_packer.top_k([d for d in data if (d['impact_score'] or 0) > 0], evidence_packer.CANDIDATE_POOL)
+        with tracing.span("brief.pack_evidence", "local"):
+            evidence_text, _, _ = evidence_packer.pack(threats, wins)
         
         # 3. The "War Room" Prompt
         prompt = f"""
@@ -47,8 +69,8 @@ def generate_daily_brief():
         You are the Chief Strategy Officer for a Malaysian political party.
         Current Net Trust Score: {avg_score:.2f} (Scale: -2.5 to +2.5).
         
-        RAW INTEL LOGS (Last 50 interactions):
-        {json.dumps(data[:50])}
+        INTEL LOGS (Strongest signals):
+        {evidence_text}
 
         TASK:
         Generate the "Daily Situation Report" for the dashboard.
@@ -69,15 +91,16 @@ def generate_daily_brief():
         }}
         """
 
-        # Call Gemini 2.0 Flash
-        response = client.models.generate_content(
-            model='gemini-2.0-flash',
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.4,
-                response_mime_type="application/json"
-            )
-        )
+        # Call Gemini 2.0 Flash (shared quota with the engines; retried on 429)
+        with tracing.span("gemini.brief", "net"):
+            response = gemini_quota.call('gemini-2.0-flash', evidence_packer.estimate_tokens(prompt) + 400, lambda: client.models.generate_content(
+                model='gemini-2.0-flash',
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    temperature=0.4,
+                    response_mime_type="application/json"
+                )
+            ), retries=3)
 
         brief = json.loads(response.text.strip())
 
@@ -88,7 +111,9 @@ def generate_daily_brief():
             "created_at": time.strftime('%Y-%m-%dT%H:%M:%S')
         }
         
-        supabase.table("narrative_briefs").insert(payload).execute()
+        with tracing.span("supabase.insert.brief", "net"):
+            supabase.table("narrative_briefs").insert(payload).execute()
+        brief_trigger.mark_generated(channel=TRIGGER_CHANNEL)
 
         print("✅ Strategic Brief Generated:")
         print(f"   Headline: {brief['headline']}")
@@ -4,66 +4,81 @@ import time
 from datetime import datetime, timedelta
 from google import genai
 from google.genai import types
-from supabase import create_client, Client
 from dotenv import load_dotenv
+import trust_metrics
+import brief_trigger
+import brief_memo
+import evidence_packer
+import tracing
+import cassette
+import storage
+import gemini_quota
 
 # Load environment variables
 load_dotenv()
 
 # --- CONFIGURATION ---
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-if not GEMINI_API_KEY or not SUPABASE_URL or not SUPABASE_KEY:
+if not GEMINI_API_KEY:
     raise ValueError("❌ Missing API Keys. Check your .env file.")
 
-client = genai.Client(api_key=GEMINI_API_KEY)
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+client = cassette.wrap_gemini(genai.Client(api_key=GEMINI_API_KEY))
+supabase = cassette.wrap_supabase(storage.connect())
 
-def get_average_score(start_time, end_time):
-    """Calculates average impact score for a specific time window."""
-    try:
-        response = supabase.table("sentiment_logs") \
-            .select("impact_score") \
-            .gte("created_at", start_time) \
-            .lt("created_at", end_time) \
-            .execute()
-        
-        scores = [d['impact_score'] for d in response.data if d.get('impact_score') is not None]
-        return sum(scores) / len(scores) if scores else 0.0
-    except:
-        return 0.0
+# Set FORCE_BRIEF=1 to bypass the change-point gate (manual runs)
+FORCE_BRIEF = os.getenv("FORCE_BRIEF") == "1"
+
+# Evidence is drawn from the same 24H window as the current score
+EVIDENCE_WINDOW_HOURS = 24
 
+@tracing.traced("brief.generate")
 def generate_daily_brief():
     print("🗞️ Generating 'Memory Guard' Intelligence Audit...")
 
     try:
         # 1. TIME TRAVEL (The Unblinking Record)
-        now = datetime.utcnow()
-        one_day_ago = (now - timedelta(days=1)).isoformat()
-        two_days_ago = (now - timedelta(days=2)).isoformat()
-        seven_days_ago = (now - timedelta(days=7)).isoformat()
-        
-        # Calculate The Reality Gap (Trends)
-        current_score = get_average_score(one_day_ago, now.isoformat())
-        yesterday_score = get_average_score(two_days_ago, one_day_ago)
-        last_week_score = get_average_score((now - timedelta(days=8)).isoformat(), seven_days_ago)
+        # Calculate The Reality Gap (Trends) from the sliding-window engine (constant time)
+        with tracing.span("brief.load_metrics"):
+            metrics = trust_metrics.load_or_rebuild(supabase)
 
-        # 2. FILTERING THE "WAYANG" (Polarity Protocol)
-        response = supabase.table("sentiment_logs") \
-            .select("topic, specific_trigger, summary, archetype, sentiment, impact_score") \
-            .order("created_at", desc=True) \
-            .limit(1000) \
-            .execute()
-        
-        data = response.data
-        if not data: return
+        # Only spend a Gemini call if something actually moved
+        with tracing.span("brief.gate"):
+            decision = brief_trigger.evaluate(supabase, metrics)
+        if not decision["fire"] and not FORCE_BRIEF:
+            return
+
+        current_score = metrics.window("24H")["avg_impact"]
+        yesterday_score = metrics.between("24H", "48H")["avg_impact"]
+        last_week_score = metrics.between("7D", "8D")["avg_impact"]
 
-        # Extract "Signals" from "Noise"
-        top_threats = sorted(data, key=lambda x: x['impact_score'] or 0)[:8]
-        top_wins = sorted(data, key=lambda x: x['impact_score'] or 0, reverse=True)[:8]
-        briefing_packet = top_threats + top_wins
+        # 2. FILTERING THE "WAYANG" (Polarity Protocol)
+        # The database returns only the strongest candidates per side; the packer
+        # then picks a diverse set that fits a fixed token budget.
+        since = (datetime.utcnow() - timedelta(hours=EVIDENCE_WINDOW_HOURS)).isoformat()
+        with tracing.span("supabase.select.evidence", "net"):
+            threats, wins = evidence_packer.fetch_candidates(supabase, since)
+        if not threats and not wins: return
+
+        with tracing.span("brief.pack_evidence", "local"):
+            evidence_text, evidence_rows, _ = evidence_packer.pack(threats, wins)
+        evidence_ids = [d['id'] for d in evidence_rows]
+
+        # Same evidence + scores within tolerance = same story. Reuse it, skip Gemini.
+        packet_scores = {
+            "current": round(current_score, 4),
+            "gap_yesterday": round(current_score - yesterday_score, 4),
+            "gap_last_week": round(current_score - last_week_score, 4),
+        }
+        memo_hit = brief_memo.lookup(packet_scores, evidence_ids)
+        if memo_hit and memo_hit["live"]:
+            brief_trigger.mark_memo_hit()
+            print("✅ Evidence unchanged since the last brief. No new brief written.")
+            return
+        if memo_hit:
+            # Evidence went back to an earlier story: publish that brief again, no Gemini call
+            publish_brief(memo_hit["brief"], current_score, packet_scores, evidence_ids)
+            return
 
         # 3. THE "MEMORY GUARD" PROMPT
         prompt = f"""
@@ -81,7 +96,7 @@ def generate_daily_brief():
         - Gap vs Last Week: {current_score - last_week_score:.2f}
         
         EVIDENCE LOGS (Top Signals):
-        {json.dumps(briefing_packet)}
+        {evidence_text}
 
         TASK:
         Write the "Daily Situation Report" that exposes the "So What."
@@ -106,15 +121,16 @@ def generate_daily_brief():
         }}
         """
 
-        # Call Gemini
-        response = client.models.generate_content(
-            model='gemini-2.0-flash',
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.45, # Higher creativity for that "Copywriter" flair
-                response_mime_type="application/json"
-            )
-        )
+        # Call Gemini (shared quota with the engines; retried on 429)
+        with tracing.span("gemini.brief", "net"):
+            response = gemini_quota.call('gemini-2.0-flash', evidence_packer.estimate_tokens(prompt) + 400, lambda: client.models.generate_content(
+                model='gemini-2.0-flash',
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    temperature=0.45, # Higher creativity for that "Copywriter" flair
+                    response_mime_type="application/json"
+                )
+            ), retries=3)
 
         try:
             brief = json.loads(response.text.strip())
@@ -123,20 +139,26 @@ def generate_daily_brief():
             brief = json.loads(clean_text)
 
         # 4. Save to Database
-        payload = {
-            "content": brief,
-            "net_trust_score": current_score,
-            "created_at": time.strftime('%Y-%m-%dT%H:%M:%S')
-        }
-        
-        supabase.table("narrative_briefs").insert(payload).execute()
-
-        print("✅ Memory Guard Audit Complete.")
-        print(f"   Headline: {brief['headline']}")
-        print(f"   Reality Check: {brief['public_narrative']}")
+        publish_brief(brief, current_score, packet_scores, evidence_ids)
 
     except Exception as e:
         print(f"❌ Error: {e}")
 
+def publish_brief(brief, current_score, packet_scores, evidence_ids):
+    payload = {
+        "content": brief,
+        "net_trust_score": current_score,
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+    with tracing.span("supabase.insert.brief", "net"):
+        supabase.table("narrative_briefs").insert(payload).execute()
+    brief_trigger.mark_generated()
+    brief_memo.store(packet_scores, evidence_ids, brief)
+
+    print("✅ Memory Guard Audit Complete.")
+    print(f"   Headline: {brief['headline']}")
+    print(f"   Reality Check: {brief['public_narrative']}")
+
 if __name__ == "__main__":
     generate_daily_brief()
\ No newline at end of file
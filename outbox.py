@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+import tracing
+
+# LOCAL WRITE-AHEAD OUTBOX
+# Every Gemini classification lands here FIRST (embedded SQLite in WAL mode).
+# A flusher drains it to Supabase in bulk. If Supabase is slow or down, the
+# result stays on disk and is replayed on the next run instead of re-buying
+# the tokens from Gemini.
+# Flushed rows are deleted after FLUSHED_TTL_DAYS. "Already classified" answers
+# come from the classified table (one idempotency key per row, bounded by
+# CLASSIFIED_TTL_DAYS and MAX_CLASSIFIED), which outlives the outbox rows.
+
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", os.path.join("state", "outbox.db"))
+FLUSH_BATCH_SIZE = 50
+FLUSH_INTERVAL_SECONDS = 5
+FLUSHED_TTL_DAYS = float(os.getenv("OUTBOX_FLUSHED_TTL_DAYS", "7"))          # Flushed rows kept this long, then deleted
+CLASSIFIED_TTL_DAYS = float(os.getenv("OUTBOX_CLASSIFIED_TTL_DAYS", "30"))   # classified / classification_cache entries
+MAX_CLASSIFIED = int(os.getenv("OUTBOX_MAX_CLASSIFIED", "100000"))           # Hard cap on either table
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    idempotency_key TEXT PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    flushed_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox (flushed_at, enqueued_at);
+CREATE INDEX IF NOT EXISTS idx_outbox_video ON outbox (video_id);
+CREATE TABLE IF NOT EXISTS classification_cache (
+    caption_hash TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    cached_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_age ON classification_cache (cached_at);
+CREATE TABLE IF NOT EXISTS classified (
+    idempotency_key TEXT PRIMARY KEY,
+    classified_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_classified_age ON classified (classified_at);
+-- Outbox files from before the classified table: carry their keys over once
+INSERT OR IGNORE INTO classified (idempotency_key, classified_at) SELECT idempotency_key, enqueued_at FROM outbox;
+"""
+
+_stats = {"last_flush_at": None, "last_flush_rows": 0, "flush_errors": 0}
+_stats_lock = threading.Lock()  # The Flusher thread and the caller both update _stats
+_ready = set()                  # Outbox files whose schema exists (this process)
+_ready_lock = threading.Lock()
+
+
+@contextmanager
+def _connect():
+    with _ready_lock:
+        if OUTBOX_PATH not in _ready:
+            folder = os.path.dirname(OUTBOX_PATH)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with sqlite3.connect(OUTBOX_PATH, timeout=30) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")  # Persistent: stored in the file
+                conn.executescript(_SCHEMA)
+            conn.close()
+            _ready.add(OUTBOX_PATH)
+    conn = sqlite3.connect(OUTBOX_PATH, timeout=30)
+    try:
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:  # Commit / roll back the block, then always close (the Flusher runs for hours)
+            yield conn
+    finally:
+        conn.close()
+
+
+def make_key(video_id, caption):
+    """Idempotency key: one classification per (video, caption text)."""
+    raw = f"{video_id}|{caption or ''}".encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()
+
+
+def enqueue(video_id, caption, payload):
+    """Durably store a classification before anything touches the network."""
+    key = make_key(video_id, caption)
+    row = dict(payload, idempotency_key=key)
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO outbox (idempotency_key, video_id, payload, enqueued_at) VALUES (?, ?, ?, ?)",
+            (key, str(video_id), json.dumps(row, ensure_ascii=False), now)
+        )
+        conn.execute("INSERT OR IGNORE INTO classified (idempotency_key, classified_at) VALUES (?, ?)", (key, now))
+    return key
+
+
+def has_result(video_id, caption):
+    """True if this exact caption was already classified (flushed or not, within CLASSIFIED_TTL_DAYS)."""
+    with _connect() as conn:
+        hit = conn.execute(
+            "SELECT 1 FROM classified WHERE idempotency_key = ?",
+            (make_key(video_id, caption),)
+        ).fetchone()
+    return hit is not None
+
+
+def caption_hash(caption):
+    return hashlib.sha1((caption or "").encode("utf-8")).hexdigest()
+
+
+def cached_classification(caption):
+    """Raw Gemini result for an identical caption (any video, any profile), or None."""
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT result FROM classification_cache WHERE caption_hash = ?",
+            (caption_hash(caption),)
+        ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def cache_classification(caption, result):
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO classification_cache (caption_hash, result, cached_at) VALUES (?, ?, ?)",
+            (caption_hash(caption), json.dumps(result, ensure_ascii=False), time.time())
+        )
+
+
+@tracing.traced("persist.outbox_flush")
+def flush(supabase, batch_size=FLUSH_BATCH_SIZE):
+    """Drain pending rows to Supabase in bulk. Returns number of rows flushed."""
+    flushed = 0
+    while True:
+        with _connect() as conn:
+            pending = conn.execute(
+                "SELECT idempotency_key, video_id, payload FROM outbox WHERE flushed_at IS NULL ORDER BY enqueued_at LIMIT ?",
+                (batch_size,)
+            ).fetchall()
+        if not pending:
+            break
+
+        keys = [p[0] for p in pending]
+        video_ids = list({p[1] for p in pending})
+        rows = [json.loads(p[2]) for p in pending]
+
+        try:
+            # Upsert on the idempotency key: a retried flush can never double-insert
+            with tracing.span("supabase.upsert.sentiment_logs", "net", rows=len(rows)):
+                supabase.table("sentiment_logs").upsert(rows, on_conflict="idempotency_key").execute()
+            with tracing.span("supabase.update.videos", "net", rows=len(video_ids)):
+                supabase.table("videos").update({"is_analyzed": True}).in_("id", video_ids).execute()
+        except Exception as e:
+            with _stats_lock:
+                _stats["flush_errors"] += 1
+            print(f"⚠️ Outbox flush failed ({len(rows)} rows kept on disk): {e}")
+            break
+
+        with _connect() as conn:
+            conn.executemany(
+                "UPDATE outbox SET flushed_at = ? WHERE idempotency_key = ?",
+                [(time.time(), k) for k in keys]
+            )
+        flushed += len(rows)
+        with _stats_lock:
+            _stats["last_flush_at"] = time.time()
+            _stats["last_flush_rows"] = len(rows)
+
+    if flushed:
+        prune()
+    return flushed
+
+
+def prune(now=None):
+    """Delete flushed rows past FLUSHED_TTL_DAYS and expire / cap the lookup tables. Returns rows deleted."""
+    now = now or time.time()
+    with _connect() as conn:
+        deleted = conn.execute(
+            "DELETE FROM outbox WHERE flushed_at IS NOT NULL AND flushed_at < ?",
+            (now - FLUSHED_TTL_DAYS * 86400,)
+        ).rowcount
+        for table, column in (("classified", "classified_at"), ("classification_cache", "cached_at")):
+            deleted += conn.execute(f"DELETE FROM {table} WHERE {column} < ?", (now - CLASSIFIED_TTL_DAYS * 86400,)).rowcount
+            deleted += conn.execute(
+                f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} ORDER BY {column} DESC LIMIT -1 OFFSET ?)",
+                (MAX_CLASSIFIED,)
+            ).rowcount
+    return deleted
+
+
+def stats():
+    """Outbox depth (unflushed rows) and flush lag (age of oldest unflushed row)."""
+    with _connect() as conn:
+        depth, oldest = conn.execute(
+            "SELECT COUNT(*), MIN(enqueued_at) FROM outbox WHERE flushed_at IS NULL"
+        ).fetchone()
+    with _stats_lock:
+        flush_errors, last_flush_rows = _stats["flush_errors"], _stats["last_flush_rows"]
+    return {
+        "depth": depth,
+        "flush_lag_seconds": (time.time() - oldest) if oldest else 0.0,
+        "flush_errors": flush_errors,
+        "last_flush_rows": last_flush_rows,
+    }
+
+
+def report():
+    s = stats()
+    print(f"📮 Outbox: {s['depth']} pending | Lag: {s['flush_lag_seconds']:.1f}s | Flush errors: {s['flush_errors']}")
+    return s
+
+
+class Flusher:
+    """Background thread that drains the outbox every few seconds."""
+
+    def __init__(self, supabase, interval=FLUSH_INTERVAL_SECONDS):
+        self.supabase = supabase
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            flush(self.supabase)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the thread and do one final synchronous drain."""
+        self._stop.set()
+        self._thread.join()
+        return flush(self.supabase)
@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+import scoring
+import tracing
+
+# WHAT-IF SCENARIOS (Monte Carlo over real rows)
+# "What happens to the Trust Score if Economic Anxiety volume doubles?"
+# Each trial bootstraps a window of the real sentiment_logs rows, applies the
+# scenario's shocks, rescores with the versioned formula from scoring.py and
+# takes the mean impact (= Net Trust Score). Many trials -> a confidence band.
+# Shocks (any combination, all optional):
+#   volume         {"topic": {name: x}, "archetype": {name: x}}   relative share of rows
+#   flip           {"topic": {name: p}, "archetype": {name: p}}   chance a row's sentiment flips sign
+#   r3_share       {"all": s, "topic": {name: s}}                 target share of 3R content
+# Rows are grouped into cells and each trial is a multinomial / binomial draw
+# over cells (same distribution as resampling rows, O(cells) per trial), pure
+# NumPy over trials x cells, split across a process pool.
+# Read-only: results go to state/scenarios.json and stdout, never to Supabase.
+# app.py shows the latest results file in its "What-if scenarios" panel.
+#
+# Usage: python scenario_engine.py [scenarios.json]
+#   (a JSON list of {"name": ..., <shocks>}; defaults to DEFAULT_SCENARIOS)
+
+RESULTS_PATH = os.getenv("SCENARIO_RESULTS_PATH", os.path.join("state", "scenarios.json"))
+WINDOW_DAYS = int(os.getenv("SCENARIO_WINDOW_DAYS", "7"))
+TRIALS = int(os.getenv("SCENARIO_TRIALS", "100000"))
+WORKERS = int(os.getenv("SCENARIO_WORKERS", str(os.cpu_count() or 1)))
+SEED = int(os.getenv("SCENARIO_SEED", "42"))
+CHUNK_CELLS = 2_000_000   # Trials x cells per NumPy batch (~100 MB of temporaries)
+PERCENTILES = (5, 25, 50, 75, 95)
+PAGE_SIZE = 1000
+
+DEFAULT_SCENARIOS = [
+    {"name": "Economic Anxiety volume x2", "volume": {"topic": {"Economic Anxiety": 2.0}}},
+    {"name": "Heartland Conservative flips", "flip": {"archetype": {"Heartland Conservative": 1.0}}},
+    {"name": "3R share to 25%", "r3_share": {"all": 0.25}},
+]
+
+
+# --- BASELINE ---
+def fetch_rows(supabase, days=WINDOW_DAYS):
+    """Raw scoring factors for the last `days` of sentiment_logs (one paged read)."""
+    cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    rows, offset = [], 0
+    with tracing.span("supabase.select.scenario_rows", "net"):
+        while True:
+            response = supabase.table("sentiment_logs") \
+                .select("sentiment, archetype, topic, is_3r, velocity_score, impact_score, score_version") \
+                .gte("created_at", cutoff) \
+                .order("created_at") \
+                .range(offset, offset + PAGE_SIZE - 1) \
+                .execute()
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                break
+            offset += PAGE_SIZE
+    return rows
+
+
+def build_baseline(rows, config=scoring.SCORING):
+    """
+    Rows collapsed into distinct cells (topic, archetype, sentiment, 3R, weight x viral bonus)
+    with a row count each. Resampling rows = a multinomial draw over cells, so a trial costs
+    O(cells), not O(rows). base = archetype weight x viral bonus: impact = sentiment x base x risk.
+    """
+    archetypes = np.array([r.get("archetype") for r in rows], dtype=object)
+    base = scoring.impact_scores(np.ones(len(rows)), archetypes, np.zeros(len(rows), dtype=bool), scoring.viral_flags(rows, config), config)
+    cells = {}
+    for r, b in zip(rows, base.tolist()):
+        key = (r.get("topic") or "Unknown", r.get("archetype"), float(r.get("sentiment") or 0), bool(r.get("is_3r")), b)
+        cells[key] = cells.get(key, 0) + 1
+    keys = list(cells)
+    return {
+        "topic": np.array([k[0] for k in keys], dtype=object),
+        "archetype": np.array([k[1] for k in keys], dtype=object),
+        "sentiment": np.array([k[2] for k in keys]),
+        "is_3r": np.array([k[3] for k in keys], dtype=bool),
+        "base": np.array([k[4] for k in keys]),
+        "count": np.array([cells[k] for k in keys], dtype=np.float64),
+        "risk_multiplier": config["risk_multiplier"],
+    }
+
+
+def observed_nts(baseline):
+    impact = baseline["sentiment"] * baseline["base"] * np.where(baseline["is_3r"], baseline["risk_multiplier"], 1.0)
+    return float((impact * baseline["count"]).sum() / baseline["count"].sum())
+
+
+def _per_cell(baseline, spec, default):
+    """Per-cell factor from a {"topic": {...}, "archetype": {...}} spec. Multipliers compound, probabilities take the max."""
+    factor = np.full(len(baseline["count"]), default, dtype=np.float64)
+    for column in ("topic", "archetype"):
+        for name, value in (spec or {}).get(column, {}).items():
+            hit = baseline[column] == name
+            factor[hit] = np.maximum(factor[hit], value) if default == 0 else factor[hit] * value
+    return factor
+
+
+def compile_scenario(baseline, scenario):
+    """Scenario -> per-cell arrays: resampling probabilities, flip probability, 3R switch probability."""
+    n = len(baseline["count"])
+    weight = baseline["count"] * _per_cell(baseline, scenario.get("volume"), 1.0)
+    flip = np.clip(_per_cell(baseline, scenario.get("flip"), 0.0), 0, 1)
+
+    # 3R share: promote non-3R rows (or demote 3R rows) inside each group until the expected share hits the target
+    switch = np.zeros(n)
+    r3 = scenario.get("r3_share") or {}
+    groups = [(np.ones(n, dtype=bool), r3["all"])] if "all" in r3 else []
+    groups += [(baseline["topic"] == name, share) for name, share in r3.get("topic", {}).items()]
+    for mask, target in groups:
+        w = weight * mask
+        if w.sum() <= 0:
+            continue
+        current = (w * baseline["is_3r"]).sum() / w.sum()
+        switch[mask] = 0
+        if target > current:
+            switch[mask & ~baseline["is_3r"]] = (target - current) / (1 - current)
+        elif target < current:
+            switch[mask & baseline["is_3r"]] = (current - target) / current
+
+    return {
+        "p": weight / weight.sum() if weight.sum() > 0 else np.full(n, 1 / n),
+        "size": max(int(round(weight.sum())), 1),
+        "flip": flip,
+        "switch": np.clip(switch, 0, 1),
+    }
+
+
+# --- TRIALS ---
+def run_trials(baseline, compiled, trials, seed):
+    """NTS and resistance % for `trials` bootstrap resamples (vectorized over trials x cells)."""
+    rng = np.random.default_rng(seed)
+    cells = len(compiled["p"])
+    batch = max(CHUNK_CELLS // cells, 1)
+    risk = baseline["risk_multiplier"]
+    kept_risk = np.where(baseline["is_3r"], risk, 1.0)      # Rows whose 3R flag is untouched
+    switched_risk = np.where(baseline["is_3r"], 1.0, risk)  # Rows promoted to / demoted from 3R
+    unit = baseline["sentiment"] * baseline["base"]
+    has_flip, has_switch = compiled["flip"].any(), compiled["switch"].any()
+    nts, resistance = np.empty(trials), np.empty(trials)
+    for start in range(0, trials, batch):
+        b = min(batch, trials - start)
+        counts = rng.multinomial(compiled["size"], compiled["p"], size=b)
+        # Flip and 3R switch are independent per row: split each cell four ways
+        # (draws skipped when the scenario has no such shock)
+        flipped = rng.binomial(counts, compiled["flip"]) if has_flip else np.zeros_like(counts)
+        switched_kept = rng.binomial(counts - flipped, compiled["switch"]) if has_switch else np.zeros_like(counts)
+        switched_flipped = rng.binomial(flipped, compiled["switch"]) if has_flip and has_switch else np.zeros_like(counts)
+        kept = unit * ((counts - flipped - switched_kept) * kept_risk + switched_kept * switched_risk)
+        flips = -unit * ((flipped - switched_flipped) * kept_risk + switched_flipped * switched_risk)
+        nts[start:start + b] = (kept + flips).sum(axis=1) / compiled["size"]
+        neg = -(np.minimum(kept, 0) + np.minimum(flips, 0)).sum(axis=1)
+        total = (np.abs(kept) + np.abs(flips)).sum(axis=1)
+        resistance[start:start + b] = np.divide(neg, total, out=np.zeros(b), where=total > 1e-9) * 100
+    return nts, resistance
+
+
+def _run_chunk(args):
+    baseline, compiled, trials, seed = args
+    return run_trials(baseline, compiled, trials, seed)
+
+
+def simulate(baseline, scenario, trials=TRIALS, workers=WORKERS, seed=SEED, pool=None):
+    """Trials for one scenario, split across the process pool. Returns (nts, resistance) arrays."""
+    compiled = compile_scenario(baseline, scenario)
+    chunks = max(min(workers, trials), 1)
+    sizes = [trials // chunks + (1 if i < trials % chunks else 0) for i in range(chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(chunks)
+    tasks = [(baseline, compiled, size, s) for size, s in zip(sizes, seeds)]
+    results = list(pool.map(_run_chunk, tasks)) if pool else [_run_chunk(t) for t in tasks]
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+
+def summarize(nts, resistance, reference):
+    bands = np.percentile(nts, PERCENTILES)
+    return {
+        "nts_mean": float(nts.mean()),
+        "nts_bands": {f"p{p}": float(v) for p, v in zip(PERCENTILES, bands)},
+        "delta_p50": float(bands[PERCENTILES.index(50)] - reference),
+        "p_below_baseline": float((nts < reference).mean()),
+        "resistance_pct_p50": float(np.median(resistance)),
+    }
+
+
+def run_scenarios(rows, scenarios, trials=TRIALS, workers=WORKERS, seed=SEED):
+    """Baseline bootstrap plus every scenario, each with the same trial count and seed."""
+    baseline = build_baseline(rows)
+    observed = observed_nts(baseline)
+    results = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "window_days": WINDOW_DAYS,
+        "rows": len(rows),
+        "cells": len(baseline["count"]),
+        "trials": trials,
+        "score_version": scoring.SCORE_VERSION,
+        "observed_nts": observed,
+        "scenarios": [],
+    }
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for scenario in [{"name": "Baseline"}] + list(scenarios):
+            started = time.time()
+            with tracing.span("scenario.simulate", "cpu", scenario=scenario["name"], trials=trials):
+                nts, resistance = simulate(baseline, scenario, trials, workers, seed, pool)
+            summary = summarize(nts, resistance, observed)
+            results["scenarios"].append({"scenario": scenario, **summary, "seconds": round(time.time() - started, 2)})
+    return results
+
+
+def save_results(results, path=RESULTS_PATH):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_results(path=RESULTS_PATH):
+    """Latest saved results, or None if no scenario run has happened on this host."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def summary_rows(results):
+    """One flat row per scenario (the report table, for the dashboard)."""
+    return [{
+        "Scenario": r["scenario"]["name"],
+        "NTS p5": r["nts_bands"]["p5"],
+        "NTS p50": r["nts_bands"]["p50"],
+        "NTS p95": r["nts_bands"]["p95"],
+        "Δ p50": r["delta_p50"],
+        "P(below now)": r["p_below_baseline"],
+        "Resistance %": r["resistance_pct_p50"],
+    } for r in results["scenarios"]]
+
+
+def report(results):
+    print(f"\n🎲 {results['trials']:,} trials per scenario over {results['rows']} rows "
+          f"(last {results['window_days']} days). Observed NTS: {results['observed_nts']:+.3f}")
+    print(f"   {'Scenario':<34}{'p5':>8}{'p50':>8}{'p95':>8}{'Δp50':>8}{'P(<now)':>9}{'Resist%':>9}")
+    for r in results["scenarios"]:
+        b = r["nts_bands"]
+        print(f"   {r['scenario']['name'][:33]:<34}{b['p5']:>+8.3f}{b['p50']:>+8.3f}{b['p95']:>+8.3f}"
+              f"{r['delta_p50']:>+8.3f}{r['p_below_baseline']:>9.0%}{r['resistance_pct_p50']:>8.1f}%")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    import storage
+
+    load_dotenv()
+
+    scenarios = DEFAULT_SCENARIOS
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="utf-8") as f:
+            scenarios = json.load(f)
+
+    print(f"🎲 Loading the last {WINDOW_DAYS} days of sentiment_logs...")
+    rows = fetch_rows(storage.connect())
+    if not rows:
+        print("💤 No rows in the window. Nothing to simulate.")
+        sys.exit(0)
+    started = time.time()
+    results = run_scenarios(rows, scenarios)
+    save_results(results)
+    report(results)
+    print(f"\n✅ {len(results['scenarios'])} scenarios in {time.time() - started:.1f}s -> {RESULTS_PATH}")
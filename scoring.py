@@ -0,0 +1,163 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+
+# IMPACT SCORING (Versioned)
+# The one place the Political Impact Score formula lives:
+#   impact = sentiment * archetype_weight * risk_multiplier * velocity_bonus
+# Every sentiment_logs row stores its raw factors (sentiment, archetype, is_3r,
+# velocity_score) plus the score_version that produced impact_score. Retuning
+# = add a new entry to SCORING_VERSIONS, bump SCORE_VERSION, then
+#   python scoring.py            (rescore rows on older versions)
+#   python scoring.py --all      (rescore the whole history)
+# Rescoring is pure vectorized math over stored factors. It never calls Gemini.
+
+SCORING_VERSIONS = {
+    1: {
+        "archetype_weights": {
+            "Heartland Conservative": 2.5,
+            "Economic Pragmatist": 1.5,
+            "Urban Reformist": 1.0,
+            "Digital Cynic": 0.5
+        },
+        "default_weight": 0.5,    # Unknown archetype = Cynic
+        "risk_multiplier": 1.5,   # 3R content
+        "viral_threshold": 500,   # Views/hour that count as "Breaking News"
+        "viral_bonus": 1.2,
+    },
+}
+SCORE_VERSION = int(os.getenv("SCORE_VERSION", max(SCORING_VERSIONS)))
+SCORING = SCORING_VERSIONS[SCORE_VERSION]
+ARCHETYPE_WEIGHTS = SCORING["archetype_weights"]
+
+RESCORE_PAGE_SIZE = 1000
+# brief_rollup's cache (not imported from there: that module builds a Gemini client at import)
+ROLLUP_PATH = os.getenv("BRIEF_ROLLUP_PATH", os.path.join("state", "brief_rollup.json"))
+RESCORE_FIELDS = "id, video_id, created_at, sentiment, archetype, is_3r, velocity_score, impact_score, score_version"
+
+
+def impact_score(sentiment_val, archetype, is_3r, velocity_score, config=SCORING):
+    """Scalar impact for one row (used at classification time)."""
+    weight = config["archetype_weights"].get(archetype, config["default_weight"])
+    risk_multiplier = config["risk_multiplier"] if is_3r else 1.0
+    velocity_bonus = config["viral_bonus"] if (velocity_score or 0) > config["viral_threshold"] else 1.0
+    return sentiment_val * weight * risk_multiplier * velocity_bonus
+
+
+def impact_scores(sentiment, archetype, is_3r, is_viral, config=SCORING):
+    """Vectorized impact over whole columns (numpy arrays)."""
+    names = np.array(list(config["archetype_weights"]), dtype=object)
+    values = np.array(list(config["archetype_weights"].values()), dtype=np.float64)
+    weight = np.full(len(archetype), config["default_weight"], dtype=np.float64)
+    for name, value in zip(names, values):
+        weight[archetype == name] = value
+    risk = np.where(is_3r, config["risk_multiplier"], 1.0)
+    bonus = np.where(is_viral, config["viral_bonus"], 1.0)
+    return sentiment * weight * risk * bonus
+
+
+def viral_flags(rows, config=SCORING):
+    """
+    Per-row 'was it above the viral threshold' flag. Rows scored before
+    velocity_score was stored have no velocity: for those, the bonus is read
+    back out of the stored impact under the version that produced it.
+    """
+    velocity = np.array([np.nan if r.get("velocity_score") is None else float(r["velocity_score"]) for r in rows])
+    viral = velocity > config["viral_threshold"]
+
+    legacy = np.isnan(velocity)
+    versions = np.array([r.get("score_version") or 1 for r in rows])
+    for version in np.unique(versions[legacy]):
+        mask = legacy & (versions == version)
+        legacy_rows = [r for r, hit in zip(rows, mask) if hit]
+        old = SCORING_VERSIONS[int(version)]
+        base = impact_scores(
+            np.array([float(r.get("sentiment") or 0) for r in legacy_rows]),
+            np.array([r.get("archetype") for r in legacy_rows], dtype=object),
+            np.array([bool(r.get("is_3r")) for r in legacy_rows]),
+            np.zeros(len(legacy_rows), dtype=bool),
+            old,
+        )
+        stored = np.array([float(r.get("impact_score") or 0) for r in legacy_rows])
+        viral[mask] = np.abs(stored) > np.abs(base) * (1 + old["viral_bonus"]) / 2
+    return viral
+
+
+def rescore_rows(rows, config=SCORING, version=SCORE_VERSION):
+    """New impact for a page of rows. Returns the rows (with impact_score / score_version replaced)."""
+    impacts = impact_scores(
+        np.array([float(r.get("sentiment") or 0) for r in rows]),
+        np.array([r.get("archetype") for r in rows], dtype=object),
+        np.array([bool(r.get("is_3r")) for r in rows]),
+        viral_flags(rows, config),
+        config,
+    )
+    return [dict(r, impact_score=float(i), score_version=version) for r, i in zip(rows, impacts)]
+
+
+def rescore(supabase, full=False, page_size=RESCORE_PAGE_SIZE, version=None):
+    """
+    Recompute impact_score for every row not on the target version (SCORE_VERSION
+    by default) or all rows, paging by id. Only rows whose score or version
+    actually changed are written back. Returns (rows_rescored, rows_changed).
+    """
+    version = version or SCORE_VERSION
+    config = SCORING_VERSIONS[version]
+    started = time.time()
+    total = changed = 0
+    last_id = None
+    while True:
+        query = supabase.table("sentiment_logs").select(RESCORE_FIELDS)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.order("id").limit(page_size).execute().data or []
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        todo = rows if full else [r for r in rows if r.get("score_version") != version]
+        if todo:
+            updated = rescore_rows(todo, config, version)
+            moved = [abs((old.get("impact_score") or 0) - new["impact_score"]) > 1e-9 for old, new in zip(todo, updated)]
+            dirty = [new for old, new, m in zip(todo, updated, moved) if m or old.get("score_version") != version]
+            if dirty:
+                supabase.table("sentiment_logs").upsert(dirty).execute()
+            total += len(dirty)
+            changed += sum(moved)
+        print(f"  ♻️ Scanned to id {last_id}: {total} rescored so far ({time.time() - started:.1f}s)")
+
+    print(f"✅ Rescore v{version} complete: {total} rows rescored, {changed} changed, in {time.time() - started:.1f}s.")
+    if changed:
+        invalidate_rollup()
+    return total, changed
+
+
+def invalidate_rollup(path=ROLLUP_PATH):
+    """Drop brief_rollup's cached day digests: their impact sums came from the old scores."""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        cache = json.load(f)
+    cache["days"] = {}
+    cache.pop("last_id", None)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    print("♻️ Brief rollup day digests invalidated (rebuilt on the next rollup).")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    import storage
+    import trust_metrics
+
+    load_dotenv()
+    supabase = storage.connect()
+
+    total, changed = rescore(supabase, full="--all" in sys.argv)
+    if changed:
+        # Window totals were built from the old scores
+        trust_metrics.rebuild_from_supabase(supabase).save()
@@ -1,49 +1,50 @@
 import os
 import json
+import time
 import datetime
+from collections import defaultdict, Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from apify_client import ApifyClient
-from supabase import create_client, Client
+import velocity_store
+import storage
+import outbox
+import author_index
+import tracking_profiles
+import tracing
+import cassette
 
 # 1. Setup & Config
 load_dotenv()
 
 # Initialize clients
 apify_token = os.getenv("APIFY_TOKEN")
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
 
 if not apify_token:
     raise ValueError("Missing APIFY_TOKEN in environment variables")
-if not supabase_url or not supabase_key:
-    raise ValueError("Missing SUPABASE_URL or SUPABASE_KEY in environment variables")
-
-supabase: Client = create_client(supabase_url, supabase_key)
-
-# Configuration: STRICTLY DEFINED TRILINGUAL QUERIES
-SEARCH_CONFIG = {
-    "searchQueries": [
-        # English / International Mix
-        "Anwar Ibrahim Prime Minister Malaysia",
-        "DSAI Anwar Ibrahim Malaysia",
-        "PMX Malaysia",
-
-        # Bahasa Malaysia
-        "Perdana Menteri Anwar Ibrahim",
-        "DSAI",           
-        "Perdana Menteri Anwar",    
-
-        # Mandarin (Chinese)
-        "安华依布拉罕 马来西亚首相",
-        "拿督斯里安华",
-        "安华",                
-        "马来西亚首相"           
-    ],
-    "resultsPerPage": 50,
-    "maxItems": 50,
-    # REVISED: Changed to 1 to prioritize "Freshness" (Recency) over Relevance
-    "sortType": 1,  
-}
+supabase = cassette.wrap_supabase(storage.connect())
+
+# Configuration: queries and sampling live in tracking profiles (profiles/*.json),
+# shared actor settings in apify_config.json. See tracking_profiles.py.
+ACTOR_ID = "clockworks/tiktok-scraper"
+
+# Sharded mode: "language" = one actor run per language group, "query" = one per query
+SCRAPER_MODE = os.getenv("SCRAPER_MODE", "single")
+SHARD_MODE = os.getenv("SCRAPER_SHARD_MODE", "language")
+MAX_CONCURRENT_RUNS = int(os.getenv("SCRAPER_MAX_CONCURRENT_RUNS", "3"))
+
+# Change-detecting ingest: a re-scraped video goes back to the analysis queue
+# only when its caption changed. Metric-only refreshes (views, likes, shares)
+# leave is_analyzed alone. Needs videos.caption_hash (TEXT);
+# SCRAPER_CHANGE_DETECTION=0 restores the old always-requeue upsert.
+CHANGE_DETECTION = os.getenv("SCRAPER_CHANGE_DETECTION", "1") == "1"
+
+# Linked comment datasets are fetched in parallel, at most this many per actor run
+COMMENT_FETCH_WORKERS = int(os.getenv("SCRAPER_COMMENT_FETCH_WORKERS", "8"))
+MAX_COMMENT_DATASETS = int(os.getenv("SCRAPER_MAX_COMMENT_DATASETS", "100"))
+
+# Per-partition ingest counters for this process: new, changed, unchanged, avoided
+ingest_stats = defaultdict(Counter)
 
 def safe_int(value):
     """Safely converts 10K, 1.2M, or strings to integers."""
@@ -67,21 +68,111 @@ def safe_int(value):
     s = ''.join(filter(str.isdigit, s))
     return int(s) if s else 0
 
-def run_scraper():
+def get_apify_client():
+    """Real Apify client, or a local fake when SCRAPER_FAKE_DATASET points at a JSON file."""
+    fake_dataset = os.getenv("SCRAPER_FAKE_DATASET")
+    if fake_dataset:
+        from fake_apify import FakeApifyClient
+        return FakeApifyClient.from_file(fake_dataset)
+    return cassette.wrap_apify(ApifyClient(apify_token))
+
+def attach_comments(client, items):
+    """
+    clockworks/tiktok-scraper writes comments to a separate dataset and links it
+    via 'commentsDatasetUrl'. Pull those into item['comments'] (items that
+    already carry inline comments are left alone), COMMENT_FETCH_WORKERS at a
+    time and at most MAX_COMMENT_DATASETS per run.
+    """
+    pending = [item for item in items if item.get('commentsDatasetUrl') and not item.get('comments')]
+    if len(pending) > MAX_COMMENT_DATASETS:
+        print(f"  ✂️ {len(pending) - MAX_COMMENT_DATASETS} comment datasets skipped (cap {MAX_COMMENT_DATASETS} per run).")
+        pending = pending[:MAX_COMMENT_DATASETS]
+    if not pending:
+        return items
+
+    def fetch(item):
+        dataset_id = item['commentsDatasetUrl'].rstrip('/').split('/datasets/')[-1].split('/')[0]
+        with tracing.span("apify.comments", "net"):
+            return list(client.dataset(dataset_id).iterate_items())
+
+    with ThreadPoolExecutor(max_workers=COMMENT_FETCH_WORKERS) as pool:
+        futures = {pool.submit(fetch, item): item for item in pending}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                item['comments'] = future.result()
+            except Exception as e:
+                print(f"  ⚠️ Could not fetch comments for {item.get('id', 'unknown')}: {e}")
+    return items
+
+def extract_comments(item, video_id, partition):
+    """Map the Apify comments on one video to compact rows for the comments table."""
+    rows = []
+    for c in item.get('comments') or []:
+        comment_id = c.get('cid') or c.get('id')
+        text = (c.get('text') or '').strip()
+        if not comment_id or not text:
+            continue
+        ts = c.get('createTime')
+        rows.append({
+            "id": str(comment_id),
+            "video_id": str(video_id),
+            "text": text,
+            "like_count": safe_int(c.get('diggCount', 0)),
+            "author_handle": c.get('uniqueId') or 'unknown',
+            "created_at": c.get('createTimeISO') or (datetime.datetime.fromtimestamp(ts).isoformat() if ts else datetime.datetime.now().isoformat()),
+            "profile": partition,
+            "is_analyzed": False,
+        })
+    return rows
+
+@tracing.traced("persist.stored_captions", "net")
+def fetch_stored_captions(video_ids):
+    """{video_id: (caption_hash, is_analyzed)} for videos already in the table."""
+    stored = {}
+    legacy = {}
+    for i in range(0, len(video_ids), 200):
+        chunk = supabase.table('videos').select("id, caption_hash, is_analyzed").in_("id", video_ids[i:i + 200]).execute()
+        for v in chunk.data or []:
+            if v.get("caption_hash"):
+                stored[v["id"]] = (v["caption_hash"], bool(v.get("is_analyzed")))
+            else:
+                legacy[v["id"]] = bool(v.get("is_analyzed"))
+
+    # Rows written before caption_hash existed: hash the stored caption instead
+    legacy_ids = list(legacy)
+    for i in range(0, len(legacy_ids), 200):
+        chunk = supabase.table('videos').select("id, caption").in_("id", legacy_ids[i:i + 200]).execute()
+        for v in chunk.data or []:
+            stored[v["id"]] = (outbox.caption_hash(v.get("caption") or ""), legacy[v["id"]])
+    return stored
+
+def author_targets(profile):
+    """The profile's highest-reach authors as "@handle" queries (author-level scrape jobs)."""
+    top_n = profile["sampling"].get("topAuthors", 0)
+    if not top_n:
+        return []
+    try:
+        return ["@" + handle for handle in author_index.AuthorIndex.load().top_authors(top_n, profile["name"])]
+    except Exception as e:
+        print(f"  ⚠️ Could not read author index: {e}")
+        return []
+
+@tracing.traced("scrape.run_scraper")
+def run_scraper(client=None, profile=None):
     """Run the TikTok scraper using Apify and return the results."""
-    client = ApifyClient(apify_token)
+    client = client or get_apify_client()
+    profile = profile or tracking_profiles.load_profile()
 
-    run_input = {
-        "resultsPerPage": SEARCH_CONFIG["resultsPerPage"],
-        "searchQueries": SEARCH_CONFIG["searchQueries"],
-        "maxItems": SEARCH_CONFIG["maxItems"],
-        "sortType": SEARCH_CONFIG["sortType"]
-    }
+    queries = tracking_profiles.all_queries(profile) + author_targets(profile)
+    run_input = tracking_profiles.build_run_input(profile, queries)
 
-    print(f"🚀 Starting TikTok scraper for queries: {json.dumps(SEARCH_CONFIG['searchQueries'], ensure_ascii=False, indent=2)}...")
-    print(f"⚙️  Sort Mode: {'Recency (Fresh)' if SEARCH_CONFIG['sortType'] == 1 else 'Relevance'}")
+    print(f"🚀 Starting TikTok scraper [{profile['name']}] for queries: {json.dumps(queries, ensure_ascii=False, indent=2)}...")
+    print(f"⚙️  Sort Mode: {'Recency (Fresh)' if run_input['sortType'] == 1 else 'Relevance'}")
+    print(f"⚙️  {tracking_profiles.describe_billing(run_input)}")
     
-    run = client.actor("clockworks/tiktok-scraper").call(run_input=run_input)
+    with tracing.span("apify.actor.call", "net", queries=len(queries)):
+        run = client.actor(ACTOR_ID).call(run_input=run_input)
 
     if not run:
         print("❌ Scraper run failed to initialize.")
@@ -91,23 +182,114 @@ def run_scraper():
 
     items = []
     # Fetch items from the dataset
-    for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-        items.append(item)
+    with tracing.span("apify.dataset.items", "net"):
+        for item in client.dataset(run["defaultDatasetId"]).iterate_items():
+            items.append(item)
+    attach_comments(client, items)
 
     print(f"📦 Collected {len(items)} raw items from Apify.")
     return items
 
 
-def save_results(items):
-    """Save scraped TikTok videos to Supabase."""
+def shard_queries(profile, shard_mode=SHARD_MODE):
+    """Split a profile's search queries into independent actor runs (plus one author-level run)."""
+    if shard_mode == "query":
+        shards = [[q] for q in tracking_profiles.all_queries(profile)]
+    else:
+        shards = [queries for queries in profile["queries"].values() if queries]
+    authors = author_targets(profile)
+    if authors:
+        shards.append(authors)
+    return shards
+
+@tracing.traced("scrape.shard")
+def run_shard(client, profile, queries):
+    """One actor run for a subset of a profile's queries. Returns (queries, items, cost_usd)."""
+    run_input = tracking_profiles.build_run_input(profile, queries)
+    with tracing.span("apify.actor.call", "net", queries=len(queries)):
+        run = client.actor(ACTOR_ID).call(run_input=run_input)
+    if not run:
+        raise RuntimeError("actor run failed to initialize")
+    with tracing.span("apify.dataset.items", "net"):
+        items = list(client.dataset(run["defaultDatasetId"]).iterate_items())
+    items = attach_comments(client, items)
+    return queries, items, float(run.get("usageTotalUsd") or 0)
+
+def dedupe_items(items, seen_ids):
+    """Drop items without an ID or already in seen_ids (which is updated in place)."""
+    fresh = []
+    for item in items:
+        video_id = item.get('id') or item.get('video_id')
+        if not video_id or str(video_id) in seen_ids:
+            continue
+        seen_ids.add(str(video_id))
+        fresh.append(item)
+    return fresh
+
+@tracing.traced("scrape.run_sharded")
+def run_scraper_sharded(on_items=None, profile=None, shard_mode=SHARD_MODE, max_concurrent=MAX_CONCURRENT_RUNS, client=None):
+    """
+    Run one actor per shard concurrently (capped at max_concurrent).
+    Each finished dataset is deduped by video ID against earlier shards and
+    streamed straight into on_items, so fast shards don't wait on slow ones.
+    """
+    client = client or get_apify_client()
+    profile = profile or tracking_profiles.load_profile()
+    shards = shard_queries(profile, shard_mode)
+
+    print(f"🚀 Starting sharded TikTok scraper [{profile['name']}]: {len(shards)} shards ({shard_mode}), max {max_concurrent} concurrent runs...")
+
+    seen_ids = set()
+    merged = []
+    started = time.time()
+
+    with ThreadPoolExecutor(max_workers=max_concurrent) as pool:
+        futures = [pool.submit(run_shard, client, profile, queries) for queries in shards]
+
+        for future in as_completed(futures):
+            try:
+                queries, items, _ = future.result()
+            except Exception as e:
+                print(f"  ⚠️ Shard failed: {e}")
+                continue
+
+            fresh = dedupe_items(items, seen_ids)
+            print(f"  📦 Shard {json.dumps(queries, ensure_ascii=False)} done at {time.time() - started:.1f}s: {len(items)} items, {len(fresh)} new.")
+            merged.extend(fresh)
+
+            # Stream into the ingest path as soon as this shard lands
+            if on_items and fresh:
+                on_items(fresh)
+
+    print(f"✅ Sharded scrape finished: {len(merged)} unique videos in {time.time() - started:.1f}s.")
+    return merged
+
+
+@tracing.traced("persist.save_results")
+def save_results(items, profile=None):
+    """Save scraped TikTok videos to Supabase, tagged with the profile's partition."""
     if not items:
         print("⚠️ No items to save.")
         return 0
 
-    print("💾 Saving to Supabase...")
+    partition = profile["name"] if profile else tracking_profiles.DEFAULT_PROFILE
+    print(f"💾 Saving to Supabase [{partition}]...")
     
     videos_saved = 0
     errors = 0
+    snapshot_ids = []
+    snapshot_views = []
+    comment_rows = []
+    saved_rows = []
+    counts = Counter()
+
+    stored = None
+    if CHANGE_DETECTION:
+        video_ids = list({str(item.get('id') or item.get('video_id')) for item in items if item.get('id') or item.get('video_id')})
+        try:
+            stored = fetch_stored_captions(video_ids)
+        except Exception as e:
+            print(f"  ⚠️ Could not read stored captions, re-queuing every video: {e}")
 
     for item in items:
         try:
@@ -128,9 +310,10 @@ def save_results(items):
                      created_at = datetime.datetime.now().isoformat()
 
             # 2. Map Apify Data to Supabase Schema
+            caption = item.get('text', '') or item.get('desc', '')
             video_data = {
                 "id": str(video_id),
-                "caption": item.get('text', '') or item.get('desc', ''), 
+                "caption": caption,
                 "views": safe_int(item.get('playCount', 0)),
                 "share_count": safe_int(item.get('shareCount', 0)),
                 "like_count": safe_int(item.get('diggCount', 0)),
@@ -138,24 +321,76 @@ def save_results(items):
                 "created_at": created_at,
                 "thumbnail_url": item.get('videoMeta', {}).get('coverUrl') or "",
                 "author_handle": item.get('authorMeta', {}).get('name', 'unknown'),
+                "profile": partition,
                 # Ensure new videos are marked as 'not analyzed' so the engine picks them up
                 "is_analyzed": False 
             }
+            if CHANGE_DETECTION:
+                # Only written when on, so SCRAPER_CHANGE_DETECTION=0 also works without the column
+                video_data["caption_hash"] = outbox.caption_hash(caption)
 
-            # 3. Upsert into Supabase
-            supabase.table('videos').upsert(video_data).execute()
+            # 3. Change detection: only a new or edited caption (re)queues analysis
+            status = "new"
+            if stored is not None and video_data["id"] in stored:
+                stored_hash, was_analyzed = stored[video_data["id"]]
+                if stored_hash == video_data["caption_hash"]:
+                    # Metric-only refresh: columns left out of the upsert keep their stored values
+                    del video_data["is_analyzed"]
+                    status = "avoided" if was_analyzed else "unchanged"
+                else:
+                    status = "changed"
+
+            # 4. Upsert into Supabase
+            with tracing.span("supabase.upsert.videos", "net"):
+                supabase.table('videos').upsert(video_data).execute()
             videos_saved += 1
+            counts[status] += 1
+            saved_rows.append(video_data)
+            snapshot_ids.append(video_data["id"])
+            snapshot_views.append(video_data["views"])
+            comment_rows.extend(extract_comments(item, video_data["id"], partition))
 
         except Exception as e:
             if errors < 5: 
                 print(f"  ⚠️ Error saving video {item.get('id', 'unknown')}: {e}")
             errors += 1
 
+    # 5. Comments: bulk insert, never overwrite (keeps existing classifications)
+    comments_saved = 0
+    for i in range(0, len(comment_rows), 500):
+        chunk = comment_rows[i:i + 500]
+        try:
+            with tracing.span("supabase.upsert.comments", "net", rows=len(chunk)):
+                supabase.table('comments').upsert(chunk, ignore_duplicates=True).execute()
+            comments_saved += len(chunk)
+        except Exception as e:
+            print(f"  ⚠️ Error saving {len(chunk)} comments: {e}")
+
+    # 6. Snapshot view counts so the engine can measure velocity between scrapes
+    try:
+        with tracing.span("velocity_store.record", "local"):
+            velocity_store.record_scrape(snapshot_ids, snapshot_views)
+    except Exception as e:
+        print(f"  ⚠️ Could not update velocity store: {e}")
+
+    # 7. Fold the batch into the per-author reach index (only these authors are touched)
+    try:
+        with tracing.span("author_index.record", "local"):
+            author_index.record_videos(saved_rows)
+    except Exception as e:
+        print(f"  ⚠️ Could not update author index: {e}")
+
     print(f"\n📊 Summary:")
     print(f"   - Processed: {len(items)}")
     print(f"   - Saved/Updated: {videos_saved}")
+    print(f"   - Comments: {comments_saved}")
+    if stored is not None:
+        print(f"   - New: {counts['new']} | Caption changed (re-queued): {counts['changed']} | Metrics only: {counts['unchanged'] + counts['avoided']}")
+        print(f"   - Reclassifications avoided: {counts['avoided']}")
     print(f"   - Errors: {errors}")
     
+    ingest_stats[partition].update(counts)
+
     if videos_saved > 0:
         print(f"\033[92m✅ Successfully synced {videos_saved} videos to database.\033[0m")
     
@@ -164,8 +399,15 @@ def save_results(items):
 
 if __name__ == "__main__":
     try:
-        items = run_scraper()
-        save_results(items)
+        if SCRAPER_MODE == "sharded":
+            run_scraper_sharded(on_items=save_results)
+            # Shards are saved one by one; this is the whole run
+            for partition, counts in ingest_stats.items():
+                print(f"♻️ [{partition}] Reclassifications avoided this run: {counts['avoided']} "
+                      f"({counts['changed']} re-queued for a caption change, {counts['new']} new)")
+        else:
+            items = run_scraper()
+            save_results(items)
         
     except Exception as e:
         print(f"\033[91m❌ Critical Error: {e}\033[0m")
\ No newline at end of file
@@ -1,11 +1,26 @@
 import os
+import sys
 import json
 import time
-import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import pandas as pd
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
-from supabase import create_client, Client
+import outbox
+import storage
+import velocity_store
+import trust_metrics
+import tracking_profiles
+import work_lease
+import author_index
+import scoring
+import tracing
+import cassette
+import gemini_quota
+import caption_compact
+from evidence_packer import estimate_tokens
 
 # 1. Setup & Config
 load_dotenv()
@@ -15,112 +30,42 @@ gemini_api_key = os.getenv("GEMINI_API_KEY")
 if not gemini_api_key:
     raise ValueError("Missing GEMINI_API_KEY in environment variables")
 
-client = genai.Client(api_key=gemini_api_key)
+client = cassette.wrap_gemini(genai.Client(api_key=gemini_api_key))
 
-# Initialize Supabase
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
-
-if not supabase_url or not supabase_key:
-    raise ValueError("Missing SUPABASE_URL or SUPABASE_KEY in environment variables")
-
-supabase: Client = create_client(supabase_url, supabase_key)
+# Initialize storage (Supabase, or the local SQLite store with STORAGE_BACKEND=sqlite)
+supabase = cassette.wrap_supabase(storage.connect())
 
 # 2. STRICT Archetype Definitions & Weights
 # The engine will FORCE any unknown label into "Digital Cynic"
-ARCHETYPE_WEIGHTS = {
-    "Heartland Conservative": 2.5,
-    "Economic Pragmatist": 1.5,
-    "Urban Reformist": 1.0,
-    "Digital Cynic": 0.5
-}
+# Weights live in scoring.py (versioned, so stored scores can be recomputed)
+ARCHETYPE_WEIGHTS = scoring.ARCHETYPE_WEIGHTS
 
-def calculate_impact_score(sentiment_val, archetype, is_3r, velocity_score):
-    """
-    Calculates Political Impact Score (NTS).
-    Formula: Sentiment * Archetype * Risk * VelocityBonus
-    """
-    # 1. Base Weight
-    weight = ARCHETYPE_WEIGHTS.get(archetype, 0.5) # Default to 0.5 (Cynic) if unknown
-    
-    # 2. Risk Multiplier (3R)
-    risk_multiplier = 1.5 if is_3r else 1.0
-    
-    # 3. Velocity Multiplier (Viral Bonus)
-    # If video is getting >500 views/hour, it is "Breaking News". Boost impact by 20%.
-    velocity_bonus = 1.2 if velocity_score > 500 else 1.0
-    
-    return sentiment_val * weight * risk_multiplier * velocity_bonus
-
-def analyze_videos():
-    print("🚀 Starting Sentiment Engine (Smart Velocity Protocol)...")
-    
-    try:
-        # STEP 1: FETCH CANDIDATES (Smart Triage)
-        # We fetch 100 unprocessed videos to sort them locally by velocity
-        response = supabase.table("videos") \
-            .select("id, caption, views, created_at") \
-            .eq("is_analyzed", False) \
-            .order("created_at", desc=True) \
-            .limit(100) \
-            .execute()
-            
-        candidates = response.data
-        if not candidates:
-            print("💤 No new videos to analyze.")
-            return
+GEMINI_MODEL = 'gemini-2.0-flash'
 
-        # STEP 2: CALCULATE VIRAL VELOCITY (Views per Hour)
-        # This solves the "Old Viral Video" problem.
-        now = datetime.datetime.utcnow()
-        scored_candidates = []
-        
-        for v in candidates:
-            # Parse timestamp (Handle format variations)
-            try:
-                # Remove 'Z' for UTC parsing compatibility if needed
-                ts_str = v['created_at'].replace('Z', '+00:00')
-                upload_time = datetime.datetime.fromisoformat(ts_str)
-            except ValueError:
-                upload_time = datetime.datetime.utcnow() # Fallback
-
-            # Calculate Age in Hours (Min 0.5h to avoid divide-by-zero)
-            age_seconds = (now - upload_time.replace(tzinfo=None)).total_seconds()
-            age_hours = max(age_seconds / 3600, 0.5)
-            
-            # Velocity = Views / Hours
-            velocity = v['views'] / age_hours
-            
-            v['velocity_score'] = velocity
-            scored_candidates.append(v)
+# USD per 1M tokens, for cost reporting only
+GEMINI_PRICE_INPUT_PER_M = 0.10
+GEMINI_PRICE_OUTPUT_PER_M = 0.40
 
-        # Sort by Velocity (Fastest Moving First) & Pick Top 20
-        scored_candidates.sort(key=lambda x: x['velocity_score'], reverse=True)
-        videos_to_analyze = scored_candidates[:20]
-        
-        print(f"🎯 Selected Top {len(videos_to_analyze)} High-Velocity Videos.")
+# A rate-limited video goes back on the queue this many times before it is left for the next run
+MAX_REQUEUES = 5
 
-    except Exception as e:
-        print(f"❌ Error fetching videos: {e}")
-        return
-
-    processed_count = 0
+# Triage ranks by projected velocity: current views/hr plus this many hours of acceleration
+ACCEL_LOOKAHEAD_HOURS = 2
 
-    # STEP 3: ANALYSIS LOOP
-    for video in videos_to_analyze:
-        video_id = video['id']
-        caption = video.get('caption', '')
-        velocity_score = video.get('velocity_score', 0)
-        
-        if not caption or len(caption.strip()) < 3:
-            # Skip empty but mark as done
-            supabase.table("videos").update({"is_analyzed": True}).eq("id", video_id).execute()
-            continue
+# ...boosted by up to this fraction for the highest-reach authors (author_index score 0..1)
+AUTHOR_PRIORITY_WEIGHT = float(os.getenv("AUTHOR_PRIORITY_WEIGHT", "0.5"))
 
-        print(f"\n🧠 Processing {video_id} (Vel: {int(velocity_score)}/hr)...")
+def calculate_impact_score(sentiment_val, archetype, is_3r, velocity_score):
+    """
+    Calculates Political Impact Score (NTS).
+    Formula: Sentiment * Archetype * Risk * VelocityBonus
+    (constants for the current SCORE_VERSION in scoring.py)
+    """
+    return scoring.impact_score(sentiment_val, archetype, is_3r, velocity_score)
 
-        # STEP 4: THE PROMPT (With Conceptual Definitions & Sarcasm)
-        prompt = f"""
+def build_prompt(caption):
+    # THE PROMPT (With Conceptual Definitions & Sarcasm)
+    return f"""
         Analyze this Malaysian political TikTok caption.
         Caption: "{caption}"
 
@@ -181,66 +126,325 @@ def analyze_videos():
         }}
         """
 
-        try:
-            # Call Gemini
-            response = client.models.generate_content(
-                model='gemini-2.0-flash',
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=0.2, # Low temp for strict adherence to definitions
-                    response_mime_type="application/json"
-                )
-            )
-            
-            # Parse Logic
-            try:
-                result = json.loads(response.text.strip())
-            except:
-                print(f"⚠️ JSON Parse Error for {video_id}, skipping...")
-                continue
-            
-            if isinstance(result, list): result = result[0]
-
-            # STRICT BUCKETING ENFORCER
-            # This fixes "Hallucinated Categories" by forcing unknowns to "Digital Cynic"
-            raw_archetype = result.get("persona", "Digital Cynic")
-            if raw_archetype not in ARCHETYPE_WEIGHTS:
-                archetype = "Digital Cynic"
-            else:
-                archetype = raw_archetype
-
-            # Calculate Scores
-            sent_score = int(result.get("sentiment_score", 0))
-            is_3r = bool(result.get("is_3r", False))
-            
-            impact = calculate_impact_score(sent_score, archetype, is_3r, velocity_score)
-
-            # Save to DB
-            db_payload = {
-                "video_id": video_id,
-                "sentiment": sent_score,
-                "archetype": archetype,
-                "topic": result.get("domain", "Uncategorized"),
-                "specific_trigger": result.get("specific_trigger", "General"),
-                "is_3r": is_3r,
-                "summary": result.get("summary", ""),
-                "impact_score": impact,
-                "created_at": time.strftime('%Y-%m-%dT%H:%M:%S')
-            }
-            
-            supabase.table("sentiment_logs").insert(db_payload).execute()
-            supabase.table("videos").update({"is_analyzed": True}).eq("id", video_id).execute()
-            
-            print(f"✅ Saved: {archetype} ({db_payload['topic']}) | Score: {impact:.2f}")
-            processed_count += 1
+@tracing.traced("gemini.classify", "net")
+def classify_caption(caption):
+    """
+    One Gemini call (under the shared quota). Returns (result, prompt_tokens, output_tokens);
+    result is None if the response isn't valid JSON. Raises gemini_quota.RateLimited on a 429.
+    """
+    prompt = build_prompt(caption)
+    response = gemini_quota.call(GEMINI_MODEL, estimate_tokens(prompt) + 200, lambda: client.models.generate_content(
+        model=GEMINI_MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            temperature=0.2, # Low temp for strict adherence to definitions
+            response_mime_type="application/json"
+        )
+    ))
+
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+
+    # Parse Logic
+    try:
+        result = json.loads(response.text.strip())
+    except:
+        return None, prompt_tokens, output_tokens
+
+    if isinstance(result, list): result = result[0]
+    return result, prompt_tokens, output_tokens
+
+def classify_video(video):
+    """
+    Shared cache first, Gemini only for unseen captions. Returns (result, prompt_tokens, output_tokens, cached).
+    Cache key and prompt both use the compacted caption.
+    """
+    caption = video.get('compact_caption') or caption_compact.compact(video['caption'])
+    result = outbox.cached_classification(caption)
+    if result is None and caption != video['caption']:
+        # Entries cached before compaction are keyed on the raw caption
+        result = outbox.cached_classification(video['caption'])
+    if result is not None:
+        return result, 0, 0, True
+    result, prompt_tokens, output_tokens = classify_caption(caption)
+    if result is not None:
+        outbox.cache_classification(caption, result)
+    return result, prompt_tokens, output_tokens, False
+
+@tracing.traced("classify.analyze_videos")
+def analyze_videos(profile=None, metrics=None):
+    """
+    Classify one batch of unanalyzed videos. With a profile, only that profile's
+    partition is drawn from (batch sizes come from its sampling settings).
+    Pass a shared metrics engine when running several profiles concurrently.
+    Returns per-run stats (counts, tokens, estimated cost).
+    """
+    sampling = profile["sampling"] if profile else tracking_profiles.DEFAULT_SAMPLING
+    partition = profile["name"] if profile else None
+    stats = {
+        "profile": partition or "all",
+        "processed": 0,
+        "gemini_calls": 0,
+        "cache_hits": 0,
+        "prompt_tokens": 0,
+        "output_tokens": 0,
+        "cost_usd": 0.0,
+        "seconds": 0.0,
+        "claimed": 0,
+        "lost_races": 0,
+        "requeued": 0,
+        "captions": 0,
+        "caption_tokens_raw": 0,
+        "caption_tokens_compact": 0,
+    }
+    started = time.time()
+
+    print(f"🚀 Starting Sentiment Engine (Smart Velocity Protocol){f' [{partition}]' if partition else ''} as worker {work_lease.WORKER_ID}...")
+
+    # STEP 0: REPLAY THE OUTBOX
+    # Results classified on a previous run but never written to Supabase are
+    # flushed now, so those videos drop out of the candidate list below.
+    replayed = outbox.flush(supabase)
+    if replayed:
+        print(f"📮 Replayed {replayed} unflushed results from the local outbox.")
+
+    try:
+        # STEP 1: FETCH CANDIDATES (Smart Triage)
+        # We fetch a pool of unprocessed, unleased videos (100 by default) to sort them locally by velocity
+        query = supabase.table("videos") \
+            .select("id, caption, views, created_at, profile, author_handle") \
+            .eq("is_analyzed", False) \
+            .or_(work_lease.unclaimed_filter())
+        if partition:
+            query = query.eq("profile", partition)
+        with tracing.span("supabase.select.candidates", "net"):
+            response = query \
+                .order("created_at", desc=True) \
+                .limit(sampling["candidatePool"]) \
+                .execute()
             
-        except Exception as e:
-            print(f"❌ Error: {e}")
-            # Mark as analyzed anyway to prevent infinite loops on bad data
+        candidates = response.data
+        if not candidates:
+            print("💤 No new videos to analyze.")
+            return stats
+
+        # STEP 2: CALCULATE VIRAL VELOCITY (Views per Hour)
+        # Instantaneous velocity = views gained over the last few hours, read from
+        # the snapshot store in one vectorized pass. Videos seen in fewer than two
+        # scrapes fall back to lifetime velocity (views / age).
+        now = pd.Timestamp.now(tz='UTC')
+        views = np.array([v.get('views') or 0 for v in candidates], dtype=np.float64)
+        upload_times = pd.to_datetime([v['created_at'] for v in candidates], utc=True, errors='coerce', format='ISO8601')
+
+        # Age in Hours (Min 0.5h to avoid divide-by-zero; unparseable timestamps count as brand new)
+        age_hours = np.maximum(((now - upload_times).total_seconds() / 3600).to_numpy(na_value=0.0), 0.5)
+        lifetime_velocity = views / age_hours
+
+        with tracing.span("classify.velocity_triage", "local", candidates=len(candidates)):
+            store = velocity_store.SnapshotStore.load()
+            recent_velocity, acceleration = store.velocity([v['id'] for v in candidates])
+        velocity = np.where(np.isfinite(recent_velocity), recent_velocity, lifetime_velocity)
+        acceleration = np.nan_to_num(acceleration)
+        priority = velocity + ACCEL_LOOKAHEAD_HOURS * np.maximum(acceleration, 0)
+
+        # Known high-reach authors go first among videos moving at similar speed
+        with tracing.span("classify.author_scores", "local"):
+            author_scores = author_index.AuthorIndex.load().scores([v.get('author_handle') for v in candidates])
+        priority = priority * (1 + AUTHOR_PRIORITY_WEIGHT * author_scores)
+
+        scored_candidates = []
+        for v, vel, acc, prio, author in zip(candidates, velocity, acceleration, priority, author_scores):
+            v['velocity_score'] = float(vel)
+            v['acceleration'] = float(acc)
+            v['author_score'] = float(author)
+            v['priority'] = float(prio)
+            scored_candidates.append(v)
+
+        # Sort by Projected Velocity (Fastest Moving / Accelerating First) & Lease the Top N (20 by default)
+        # Other workers may be draining the same backlog; rows they win are replaced by the next-best.
+        scored_candidates.sort(key=lambda x: x['priority'], reverse=True)
+        with tracing.span("supabase.claim", "net"):
+            videos_to_analyze, lost = work_lease.claim_ranked(supabase, scored_candidates, sampling["analyzeBatchSize"])
+        stats["claimed"] = len(videos_to_analyze)
+        stats["lost_races"] = lost
+
+        print(f"🎯 Leased Top {len(videos_to_analyze)} High-Velocity Videos ({lost} already taken by other workers).")
+        if not videos_to_analyze:
+            return stats
+
+    except Exception as e:
+        print(f"❌ Error fetching videos: {e}")
+        return stats
+
+    owns_metrics = metrics is None
+    if owns_metrics:
+        metrics = trust_metrics.load_or_rebuild(supabase)
+    flusher = outbox.Flusher(supabase).start()
+
+    # STEP 3: ANALYSIS LOOP
+    # Classification runs on a thread pool whose real concurrency is set by the
+    # shared Gemini quota (AIMD); scoring and the outbox write stay on this thread.
+    queue = []
+    for video in videos_to_analyze:
+        video_id = video['id']
+        caption = video.get('caption', '')
+        
+        if not caption or len(caption.strip()) < 3:
+            # Skip empty but mark as done
             supabase.table("videos").update({"is_analyzed": True}).eq("id", video_id).execute()
-            time.sleep(1)
+            continue
 
-    print(f"\n✅ Batch Complete: {processed_count} videos.")
+        # Already paid for: the result is sitting in the outbox waiting to flush
+        if outbox.has_result(video_id, caption):
+            print(f"📮 {video_id} already classified locally, skipping Gemini.")
+            continue
+
+        # Hashtag walls, URLs, mention chains and repeats never reach the prompt
+        video['compact_caption'] = caption_compact.compact(caption)
+        stats["captions"] += 1
+        stats["caption_tokens_raw"] += estimate_tokens(caption)
+        stats["caption_tokens_compact"] += estimate_tokens(video['compact_caption'])
+        if not video['compact_caption']:
+            # Nothing but tags / links / boilerplate: nothing to classify
+            supabase.table("videos").update({"is_analyzed": True}).eq("id", video_id).execute()
+            continue
+        queue.append(video)
+
+    if stats["captions"]:
+        raw_avg = stats["caption_tokens_raw"] / stats["captions"]
+        compact_avg = stats["caption_tokens_compact"] / stats["captions"]
+        saved_pct = (1 - compact_avg / raw_avg) * 100 if raw_avg else 0.0
+        print(f"✂️ Caption compaction: ~{raw_avg:.0f} -> ~{compact_avg:.0f} tokens per caption ({saved_pct:.0f}% smaller, {stats['captions']} captions).")
+
+    requeues = {}
+    author_impacts = []
+    with ThreadPoolExecutor(max_workers=gemini_quota.MAX_CONCURRENCY) as pool:
+        futures = {pool.submit(classify_video, v): v for v in queue}
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                video = futures.pop(future)
+                video_id = video['id']
+                caption = video['caption']
+                velocity_score = video.get('velocity_score', 0)
+
+                # STEP 4: CLASSIFY (shared cache first, Gemini only for unseen captions)
+                try:
+                    result, prompt_tokens, output_tokens, cached = future.result()
+                except gemini_quota.RateLimited:
+                    # Quota already backed off; put the video back instead of dropping it
+                    requeues[video_id] = requeues.get(video_id, 0) + 1
+                    if requeues[video_id] > MAX_REQUEUES:
+                        print(f"⏳ {video_id} still rate-limited after {MAX_REQUEUES} requeues, leaving it for the next run.")
+                        work_lease.release(supabase, [video_id])
+                        continue
+                    stats["requeued"] += 1
+                    futures[pool.submit(classify_video, video)] = video
+                    continue
+                except Exception as e:
+                    print(f"❌ Error: {e}")
+                    # Mark as analyzed anyway to prevent infinite loops on bad data
+                    supabase.table("videos").update({"is_analyzed": True}).eq("id", video_id).execute()
+                    continue
+
+                print(f"\n🧠 Processing {video_id} (Vel: {int(velocity_score)}/hr, Accel: {video.get('acceleration', 0):+.0f}/hr², Author: {video.get('author_score', 0):.2f})...")
+                if cached:
+                    stats["cache_hits"] += 1
+                    print("♻️  Identical caption already classified, reusing result.")
+                else:
+                    stats["gemini_calls"] += 1
+                    stats["prompt_tokens"] += prompt_tokens
+                    stats["output_tokens"] += output_tokens
+                if result is None:
+                    print(f"⚠️ JSON Parse Error for {video_id}, skipping...")
+                    work_lease.release(supabase, [video_id])
+                    continue
+
+                try:
+                    # STRICT BUCKETING ENFORCER
+                    # This fixes "Hallucinated Categories" by forcing unknowns to "Digital Cynic"
+                    raw_archetype = result.get("persona", "Digital Cynic")
+                    if raw_archetype not in ARCHETYPE_WEIGHTS:
+                        archetype = "Digital Cynic"
+                    else:
+                        archetype = raw_archetype
+
+                    # Calculate Scores
+                    sent_score = int(result.get("sentiment_score", 0))
+                    is_3r = bool(result.get("is_3r", False))
+                    
+                    impact = calculate_impact_score(sent_score, archetype, is_3r, velocity_score)
+
+                    # Save to the local outbox first; the flusher bulk-writes it to Supabase
+                    db_payload = {
+                        "video_id": video_id,
+                        "sentiment": sent_score,
+                        "archetype": archetype,
+                        "topic": result.get("domain", "Uncategorized"),
+                        "specific_trigger": result.get("specific_trigger", "General"),
+                        "is_3r": is_3r,
+                        "summary": result.get("summary", ""),
+                        "impact_score": impact,
+                        # Raw factors, so impact can be recomputed without Gemini when the formula changes
+                        "velocity_score": float(velocity_score),
+                        "score_version": scoring.SCORE_VERSION,
+                        "profile": video.get("profile") or tracking_profiles.DEFAULT_PROFILE,
+                        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S')
+                    }
+                    
+                    with tracing.span("outbox.enqueue", "local"):
+                        key = outbox.enqueue(video_id, caption, db_payload)
+                    metrics.add(db_payload["created_at"], impact, key=key)
+                    author_impacts.append((video.get("author_handle"), impact))
+                    
+                    print(f"✅ Saved: {archetype} ({db_payload['topic']}) | Score: {impact:.2f}")
+                    stats["processed"] += 1
+                    
+                except Exception as e:
+                    print(f"❌ Error: {e}")
+                    # Mark as analyzed anyway to prevent infinite loops on bad data
+                    supabase.table("videos").update({"is_analyzed": True}).eq("id", video_id).execute()
+
+    with tracing.span("persist.final_flush"):
+        flusher.stop()
+    try:
+        author_index.record_impacts(author_impacts)
+    except Exception as err:
+        print(f"⚠️ Could not update author index: {err}")
+    if owns_metrics:
+        metrics.save()
+
+    stats["seconds"] = time.time() - started
+    stats["cost_usd"] = (stats["prompt_tokens"] * GEMINI_PRICE_INPUT_PER_M + stats["output_tokens"] * GEMINI_PRICE_OUTPUT_PER_M) / 1_000_000
+    print(f"\n✅ Batch Complete: {stats['processed']} videos. Gemini calls: {stats['gemini_calls']} | Cache hits: {stats['cache_hits']} | Requeued (429): {stats['requeued']} | Est. cost: ${stats['cost_usd']:.4f}")
+    outbox.report()
+    gemini_quota.report(GEMINI_MODEL)
+    return stats
+
+def drain(profile=None):
+    """Keep leasing and classifying batches until no claimable videos are left."""
+    totals = {}
+    while True:
+        stats = analyze_videos(profile)
+        for key, value in stats.items():
+            if isinstance(value, (int, float)):
+                totals[key] = totals.get(key, 0) + value
+        # Nothing left to lease, or a batch that made no progress (retry next run)
+        if not stats["claimed"] or not stats["processed"]:
+            break
+    print(f"🏁 Worker {work_lease.WORKER_ID} drained: {totals.get('processed', 0)} videos in {totals.get('seconds', 0):.0f}s.")
+    return totals
 
 if __name__ == "__main__":
-    analyze_videos()
\ No newline at end of file
+    # ANALYZER_DRAIN=1: loop until the backlog is empty (run one per worker process/host)
+    if os.getenv("ANALYZER_DRAIN") == "1":
+        drain()
+    else:
+        analyze_videos()
+    # Paid-for results still on local disk only survive if this host's state does:
+    # fail the step so it is noticed instead of trusting the cache to carry them
+    pending = outbox.stats()["depth"]
+    if pending:
+        print(f"❌ {pending} classified results could not be flushed to Supabase (kept in {outbox.OUTBOX_PATH}).")
+        sys.exit(1)
\ No newline at end of file
@@ -3,37 +3,18 @@ import random
 import time
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from supabase import create_client, Client
+import storage
 
 # 1. Setup & Config
 load_dotenv()
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_KEY")
-
-if not url or not key:
+try:
+    supabase = storage.connect()
+except ValueError:
     print("❌ Error: .env file missing. Cannot connect to Supabase.")
     exit()
 
-supabase: Client = create_client(url, key)
-
-# 2. SHARED LOGIC (Copied from sentiment_engine.py for consistency)
-ARCHETYPE_WEIGHTS = {
-    "Heartland Conservative": 2.5,
-    "Economic Pragmatist": 1.5,
-    "Urban Reformist": 1.0,
-    "Digital Cynic": 0.5
-}
-
-def calculate_impact_score(sentiment_val, archetype, is_3r, velocity_score):
-    """
-    Calculates Political Impact Score (NTS).
-    Formula: Sentiment * Archetype * Risk * VelocityBonus
-    """
-    weight = ARCHETYPE_WEIGHTS.get(archetype, 0.5)
-    risk_multiplier = 1.5 if is_3r else 1.0
-    velocity_bonus = 1.2 if velocity_score > 500 else 1.0
-    
-    return sentiment_val * weight * risk_multiplier * velocity_bonus
+# 2. SHARED LOGIC (Same versioned formula as sentiment_engine.py)
+from scoring import SCORE_VERSION, impact_score as calculate_impact_score
 
 # 3. HIGH-FIDELITY TEMPLATES (The "Script")
 print("🚀 Initializing Kacang Kantoi Simulation (v2.0 - Velocity Enabled)...")
@@ -154,9 +135,9 @@ for i in range(50):
         "is_3r": t["is_3r"],
         "summary": t["summary"],
         "impact_score": impact,
+        "velocity_score": velocity_score,
+        "score_version": SCORE_VERSION,
         "created_at": fake_time
-        # Note: We don't save 'velocity' or 'views' here because sentiment_logs 
-        # usually doesn't store raw video stats, but the impact_score reflects it.
     }
 
     try:
@@ -0,0 +1,336 @@
+import os
+import sys
+import json
+import html
+import time
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+import evidence_index
+import trust_metrics
+import dashboard_figures
+import tracing
+
+# STATIC SNAPSHOT EXPORT
+# Runs after every pipeline run and renders the public dashboard (hero, metrics,
+# narrative box, signal board, charts, newest Evidence Log receipts) for every
+# time window as plain HTML + JSON. Any static file host can serve the folder,
+# so a viral brief costs nothing per view; Streamlit stays for interactive use
+# (search, filters, paging).
+#
+#   snapshot/index.html     24H page        snapshot/<window>.html   other windows
+#   snapshot/<window>.json  same data       snapshot/snapshot.json   manifest
+#
+# snapshot is a symlink to the latest complete build (snapshot.build-XXXX/).
+# Each export writes a new build, then atomically repoints the link; the
+# previous build is kept one more run for readers still holding it.
+#
+# Usage: python static_export.py [output_dir]
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshot")
+HISTORY_DAYS = 90
+EVIDENCE_TOP_N = 25  # Newest receipts per window (the live app pages through the rest)
+
+# (label, slug, days, trust_metrics window); the first one is index.html
+SNAPSHOT_WINDOWS = [
+    ("24H", "24h", 1, "24H"),
+    ("3 Days", "3d", 3, "3D"),
+    ("7 Days", "7d", 7, "7D"),
+    ("30 Days", "30d", 30, "30D"),
+    ("3 Months", "90d", 90, "90D"),
+]
+
+# Everything a static page needs beyond the shared design system
+PAGE_CSS = """
+    body { background-color: #050505; font-family: 'Inter', sans-serif; margin: 0; }
+    .page { max-width: 1200px; margin: 0 auto; padding: 2rem 1.5rem 5rem; }
+    .toggle-bar { display: flex; flex-wrap: wrap; gap: 8px; margin-left: 22px; margin-bottom: 10px; }
+    .toggle-bar a, .toggle-bar button {
+        background-color: #111; border: 1px solid #333; border-radius: 4px; padding: 6px 16px;
+        font-family: 'Rubik', sans-serif; font-size: 0.85rem; font-weight: 600; color: #CCC;
+        text-transform: uppercase; letter-spacing: 1px; text-decoration: none; cursor: pointer;
+    }
+    .toggle-bar a:hover, .toggle-bar button:hover { border-color: #FFC107; }
+    .toggle-bar .active { color: #FFC107; border-color: #FFC107; }
+    .metrics { display: grid; grid-template-columns: repeat(4, 1fr); gap: 1.5rem; align-items: start; }
+    .metric-label {
+        font-family: 'Rubik', sans-serif; color: #888; font-size: 0.8rem;
+        text-transform: uppercase; letter-spacing: 1px; font-weight: 500;
+    }
+    .metric-value { font-family: 'Rubik', sans-serif; color: #FFF; font-size: 2.5rem; font-weight: 700; }
+    .metric-delta { font-family: 'Inter', sans-serif; font-size: 0.85rem; color: #00E396; }
+    .metric-delta.inverse { color: #FF4560; }
+    details.drivers { border: 1px solid #333; padding: 10px 15px; color: #CCC; font-family: 'Rubik', sans-serif; }
+    details.drivers summary { cursor: pointer; }
+    .signal-board { display: grid; grid-template-columns: repeat(3, 1fr); gap: 1.5rem; margin-top: 15px; }
+    .chart-row { display: grid; grid-template-columns: 1fr 2fr; gap: 1.5rem; }
+    .trend-view { display: none; }
+    .trend-view.active { display: block; }
+    table.evidence { width: 100%; border-collapse: collapse; font-family: 'Inter', sans-serif; font-size: 0.85rem; color: #CCC; }
+    table.evidence th { text-align: left; color: #888; border-bottom: 1px solid #333; padding: 6px; font-weight: 600; }
+    table.evidence td { border-bottom: 1px solid #1a1a1a; padding: 6px; vertical-align: top; }
+    .footer { font-family: 'Inter', sans-serif; color: #555; font-size: 0.8rem; margin-top: 40px; }
+    @media (max-width: 800px) { .metrics, .signal-board, .chart-row { grid-template-columns: 1fr; } .hero-title { font-size: 2.8rem !important; } }
+"""
+
+TREND_SCRIPT = """
+<script>
+function showTrend(key) {
+    document.querySelectorAll('.trend-view').forEach(el => el.classList.toggle('active', el.id === key));
+    document.querySelectorAll('.trend-toggle button').forEach(el => el.classList.toggle('active', el.dataset.key === key));
+    const plot = document.querySelector('#' + key + ' .plotly-graph-div');
+    if (plot && window.Plotly) Plotly.Plots.resize(plot);
+}
+</script>
+"""
+
+TREND_VIEWS = [("fig_trend", "Trust Score"), ("fig_trend_topic", "By Topic"), ("fig_trend_archetype", "By Voter")]
+
+
+def page_name(slug):
+    return "index.html" if slug == SNAPSHOT_WINDOWS[0][1] else f"{slug}.html"
+
+
+def public_brief(brief):
+    """The parts of a brief the dashboard shows publicly (never the private memo)."""
+    if not brief:
+        return None
+    content = brief.get("content") or {}
+    return {
+        "headline": content.get("headline"),
+        "public_narrative": content.get("public_narrative", content.get("dominant_narrative")),
+        "net_trust_score": brief.get("net_trust_score"),
+        "created_at": brief.get("created_at"),
+    }
+
+
+def window_snapshot(df, index, metrics, days, metrics_window, now):
+    """Payload, headline metrics and newest receipts for one window."""
+    window_df = df[df['created_at'] >= pd.Timestamp(now, unit='s', tz='UTC') - pd.Timedelta(days=days)] if not df.empty else df
+    payload = dashboard_figures.build_payload(window_df)
+
+    # Same precedence as the live app: sliding-window engine, then the chart payload
+    stats = metrics.window(metrics_window, now)
+    if stats['count']:
+        headline = {"voices": stats['count'], "consensus_pct": stats['consensus_pct'], "resistance_pct": stats['resistance_pct']}
+    elif payload:
+        headline = {"voices": payload['voices'], "consensus_pct": payload['consensus_pct'], "resistance_pct": payload['resistance_pct']}
+    else:
+        headline = None
+
+    total, receipts = index.search("", since=now - days * 86400, page_size=EVIDENCE_TOP_N)
+    return payload, headline, total, receipts
+
+
+def _figure_html(fig, include_plotlyjs):
+    return fig.to_html(full_html=False, include_plotlyjs='cdn' if include_plotlyjs else False, config={"displayModeBar": False, "responsive": True})
+
+
+def render_page(label, slug, payload, headline, brief, total, receipts, built_at):
+    esc = html.escape
+    parts = [f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>KACANG KANTOI | The Memory Guard ({esc(label)})</title>
+<link rel="icon" href="data:image/svg+xml,<svg xmlns=%22http://www.w3.org/2000/svg%22 viewBox=%220 0 100 100%22><text y=%22.9em%22 font-size=%2290%22>🥜</text></svg>">
+<style>{dashboard_figures.DESIGN_CSS}{PAGE_CSS}</style>
+{TREND_SCRIPT}
+</head>
+<body>
+<div class="page">
+{dashboard_figures.HERO_HTML}
+<h3>THE REALITY CHECK</h3>
+<div class="toggle-bar">"""]
+    for other_label, other_slug, _, _ in SNAPSHOT_WINDOWS:
+        active = ' class="active"' if other_slug == slug else ''
+        parts.append(f'<a href="{page_name(other_slug)}"{active}>{esc(other_label)}</a>')
+    parts.append(f"""</div>
+<div class='chart-caption'>Audit of digital conversations over the last <b>{esc(label)}</b>.</div>""")
+
+    if not payload or not headline:
+        parts.append("<div class='chart-caption'>Waiting for data stream...</div>")
+    else:
+        narrative = dashboard_figures.narrative_html(brief) or "<div class='chart-caption'>Initializing Analyst...</div>"
+        parts.append(f"""
+<div class="metrics">
+    <div><div class="metric-label">Voices Scanned</div><div class="metric-value">{headline['voices']}</div><div class="metric-delta">Sample Size</div></div>
+    <div><div class="metric-label">Approval Score</div><div class="metric-value">{headline['consensus_pct']:.1f}%</div><div class="metric-delta">Support</div></div>
+    <div><div class="metric-label">Anger Level</div><div class="metric-value">{headline['resistance_pct']:.1f}%</div><div class="metric-delta inverse">Friction</div></div>
+    <div>{narrative}</div>
+</div>
+<div class='spacer'></div>
+<details class="drivers">
+<summary>🔻 TAP TO SEE DRIVERS (LAST {esc(label)})</summary>
+<div class="signal-board">
+<div><div class="signal-title" style="color:#FF4560;">🔥 WHAT'S BURNING (Issues)</div>""")
+        for trigger, score in payload['threats']:
+            parts.append(f'<div class="signal-item"><span>{esc(str(trigger))}</span><span class="signal-score-neg">{score:.1f}</span></div>')
+        parts.append("""</div>
+<div><div class="signal-title" style="color:#00E396;">🛡️ WHAT'S WORKING (Wins)</div>""")
+        for trigger, score in payload['wins']:
+            parts.append(f'<div class="signal-item"><span>{esc(str(trigger))}</span><span class="signal-score-pos">+{score:.1f}</span></div>')
+        parts.append("""</div>
+<div><div class="signal-title" style="color:#FFC107;">⚡ GOING VIRAL (Trending)</div>""")
+        for trigger, count in payload['viral']:
+            parts.append(f'<div class="signal-item"><span>{esc(str(trigger))}</span><span style="color:#FFF;">{count} posts</span></div>')
+        parts.append(f"""</div>
+</div>
+</details>
+
+<div class="chart-row">
+<div>
+<h3>WHO IS TALKING?</h3>
+<div class='chart-caption'><b>The Share of Voice.</b> Demographic split for the selected timeframe.</div>
+{_figure_html(payload['fig_donut'], include_plotlyjs=True)}
+</div>
+<div>
+<h3>THE HEATMAP</h3>
+<div class='chart-caption'>
+    <b>Risk Radar.</b> Mapping volume vs sentiment.
+    <br>🔴 <b>TOP LEFT:</b> High Volume + Anger (Danger).
+    <br>🟢 <b>TOP RIGHT:</b> High Volume + Support (Safety).
+</div>
+{_figure_html(payload['fig_radar'], include_plotlyjs=False)}
+</div>
+</div>
+
+<h3>TRAJECTORY OF TRUST</h3>
+<div class='chart-caption'><b>Trend over the last {esc(label)}.</b> <span style='color:#FF4560'>Red Band</span> = Crisis. <span style='color:#00E396'>Green Band</span> = Safe.</div>
+<div class="toggle-bar trend-toggle">""")
+        for n, (key, name) in enumerate(TREND_VIEWS):
+            active = ' class="active"' if n == 0 else ''
+            parts.append(f'<button type="button" data-key="{key}" onclick="showTrend(\'{key}\')"{active}>{name}</button>')
+        parts.append("</div>")
+        for n, (key, _) in enumerate(TREND_VIEWS):
+            active = " active" if n == 0 else ""
+            parts.append(f'<div class="trend-view{active}" id="{key}">{_figure_html(payload[key], include_plotlyjs=False)}</div>')
+
+    parts.append("""
+<h3>THE EVIDENCE LOG</h3>
+<div class='chart-caption'>The receipts. This is the raw, unfiltered feed of what people are actually saying, verified by our system.</div>""")
+    if receipts:
+        parts.append('<table class="evidence"><thead><tr><th>Timestamp</th><th>Topic</th><th>Trigger</th><th>Voice</th><th>Impact</th><th>Summary</th></tr></thead><tbody>')
+        for r in receipts:
+            ts = pd.to_datetime(r['created_at'], utc=True)
+            when = f"{ts.day} {ts.strftime('%b, %H:%M')}"  # No '%-d': glibc-only
+            impact = pd.to_numeric(r['impact_score'], errors='coerce')
+            parts.append(
+                f"<tr><td>{when}</td><td>{esc(str(r['topic'] or ''))}</td><td>{esc(str(r['specific_trigger'] or ''))}</td>"
+                f"<td>{esc(str(r['archetype'] or ''))}</td><td>{0 if pd.isna(impact) else impact:.2f}</td><td>{esc(str(r['summary'] or ''))}</td></tr>"
+            )
+        parts.append("</tbody></table>")
+    else:
+        parts.append("<div class='chart-caption'>No receipts in this window yet.</div>")
+    parts.append(f"""<div class='chart-caption'>Newest {len(receipts)} of {total:,} receipts. Search and filter the full log on the live dashboard.</div>
+<div class="footer">Snapshot built {esc(built_at)}</div>
+</div>
+</body>
+</html>
+""")
+    return "\n".join(parts)
+
+
+def window_json(label, slug, payload, headline, brief, total, receipts, built_at):
+    data = {
+        "window": label,
+        "slug": slug,
+        "built_at": built_at,
+        "metrics": headline,
+        "brief": public_brief(brief),
+        "signals": None,
+        "evidence": {"total": total, "newest": receipts},
+    }
+    if payload:
+        data["signals"] = {
+            "threats": [{"trigger": k, "impact": round(float(v), 3)} for k, v in payload['threats']],
+            "wins": [{"trigger": k, "impact": round(float(v), 3)} for k, v in payload['wins']],
+            "viral": [{"trigger": k, "count": int(v)} for k, v in payload['viral']],
+        }
+        data["charts"] = {key: json.loads(payload[key].to_json()) for key in ('fig_donut', 'fig_radar') + dashboard_figures.TREND_KEYS}
+    return data
+
+
+def export(df, index, metrics, brief, out_dir=SNAPSHOT_DIR, now=None):
+    """
+    Render every window into a new build folder next to out_dir, then repoint the
+    out_dir symlink at it (one rename), so a host serving out_dir never sees a
+    half-written or missing snapshot.
+    """
+    now = now or time.time()
+    built_at = datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    out_dir = out_dir.rstrip("/")
+    parent = os.path.dirname(out_dir) or "."
+    prefix = os.path.basename(out_dir) + ".build-"
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=prefix, dir=parent)
+    os.chmod(tmp_dir, 0o755)
+
+    manifest = {"built_at": built_at, "rows": int(len(df)), "brief": public_brief(brief), "windows": []}
+    total_bytes = 0
+    for label, slug, days, metrics_window in SNAPSHOT_WINDOWS:
+        with tracing.span("snapshot.window", "local", window=slug):
+            payload, headline, total, receipts = window_snapshot(df, index, metrics, days, metrics_window, now)
+            page = render_page(label, slug, payload, headline, brief, total, receipts, built_at)
+            data = window_json(label, slug, payload, headline, brief, total, receipts, built_at)
+
+        files = {page_name(slug): page, f"{slug}.json": json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)}
+        for name, text in files.items():
+            with open(os.path.join(tmp_dir, name), "w", encoding="utf-8") as f:
+                f.write(text)
+            total_bytes += len(text.encode("utf-8"))
+        manifest["windows"].append({"window": label, "slug": slug, "page": page_name(slug), "data": f"{slug}.json", "voices": headline['voices'] if headline else 0})
+
+    with open(os.path.join(tmp_dir, "snapshot.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, default=str)
+
+    # Swap: build a link to the new folder beside out_dir and rename it over out_dir
+    previous = os.readlink(out_dir) if os.path.islink(out_dir) else None
+    link_tmp = out_dir + ".link"
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    os.symlink(os.path.basename(tmp_dir), link_tmp)
+    if os.path.isdir(out_dir) and not os.path.islink(out_dir):
+        shutil.rmtree(out_dir)  # Snapshot from before the symlink layout: replaced once, not atomically
+    os.replace(link_tmp, out_dir)
+
+    # Keep the live build and the one before it
+    keep = {os.path.basename(tmp_dir), os.path.basename(previous or "")}
+    for name in os.listdir(parent):
+        if name.startswith(prefix) and name not in keep:
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+    return manifest, total_bytes
+
+
+def load_sources(supabase):
+    """Last HISTORY_DAYS of rows (index + sliding-window metrics) and the latest brief."""
+    index = evidence_index.EvidenceIndex()
+    metrics = trust_metrics.TrustMetrics()
+    cutoff = datetime.utcnow() - timedelta(days=HISTORY_DAYS)
+    with tracing.span("supabase.select.snapshot_rows", "net"):
+        evidence_index.sync_from_supabase(index, supabase, cutoff.isoformat(), on_rows=metrics.add_rows)
+    with tracing.span("supabase.select.brief", "net"):
+        response = supabase.table("narrative_briefs") \
+            .select("content, net_trust_score, created_at") \
+            .order("created_at", desc=True) \
+            .limit(1) \
+            .execute()
+    brief = response.data[0] if response.data else None
+    return evidence_index.to_frame(index), index, metrics, brief
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    import storage
+
+    load_dotenv()
+
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_DIR
+    print("🖼️ Exporting static dashboard snapshot...")
+    started = time.time()
+    df, index, metrics, brief = load_sources(storage.connect())
+    manifest, total_bytes = export(df, index, metrics, brief, out_dir)
+    print(f"✅ Snapshot written to {out_dir}/: {len(manifest['windows'])} windows, {len(df)} rows, "
+          f"{total_bytes / 1024:.0f} KB in {time.time() - started:.1f}s")
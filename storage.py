@@ -0,0 +1,445 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+# STORAGE BACKENDS
+# Every module reads and writes through a Supabase-style query builder:
+#   db.table("videos").select("id, caption").eq("is_analyzed", False).order("created_at", desc=True).limit(100).execute()
+# connect() returns the backend chosen by STORAGE_BACKEND:
+#   supabase (default)  hosted Postgres via PostgREST (SUPABASE_URL / SUPABASE_KEY)
+#   sqlite              LocalStore: an embedded SQLite file (LOCAL_DB_PATH, WAL
+#                       mode, indexed on created_at / is_analyzed), so the whole
+#                       pipeline runs and benchmarks offline.
+# LocalStore implements exactly the builder surface the code uses (the repository
+# interface): select / eq / gt / gte / lt / lte / in_ / or_ / order / range /
+# limit and insert / upsert / update, over videos, sentiment_logs,
+# narrative_briefs, comments and horizon_briefs.
+# Columns missing from the schema below are added on first write, so new
+# payload fields need no migration.
+#
+# As an analytics cache: pull the last N days from Supabase, then point any
+# read-only tool (static_export, scenario_engine, api_server) at it:
+#   python storage.py pull [days]
+#   STORAGE_BACKEND=sqlite python scenario_engine.py
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
+LOCAL_DB_PATH = os.getenv("LOCAL_DB_PATH", os.path.join("state", "local.db"))
+PULL_DAYS = 90
+PULL_PAGE_SIZE = 1000
+
+# Declared types drive conversion: BOOLEAN -> bool, JSON -> dict/list, TIMESTAMP -> normalized UTC ISO text
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id TEXT PRIMARY KEY,
+    caption TEXT,
+    caption_hash TEXT,
+    views INTEGER,
+    share_count INTEGER,
+    like_count INTEGER,
+    comment_count INTEGER,
+    created_at TIMESTAMP,
+    thumbnail_url TEXT,
+    author_handle TEXT,
+    profile TEXT,
+    is_analyzed BOOLEAN DEFAULT 0,
+    claimed_by TEXT,
+    lease_expires_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_videos_queue ON videos (is_analyzed, lease_expires_at);
+CREATE INDEX IF NOT EXISTS idx_videos_created ON videos (created_at);
+CREATE INDEX IF NOT EXISTS idx_videos_profile ON videos (profile, is_analyzed);
+
+CREATE TABLE IF NOT EXISTS sentiment_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_id TEXT,
+    sentiment REAL,
+    archetype TEXT,
+    topic TEXT,
+    specific_trigger TEXT,
+    is_3r BOOLEAN,
+    summary TEXT,
+    impact_score REAL,
+    velocity_score REAL,
+    score_version INTEGER,
+    profile TEXT,
+    idempotency_key TEXT UNIQUE,
+    created_at TIMESTAMP DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_logs_created ON sentiment_logs (created_at);
+CREATE INDEX IF NOT EXISTS idx_logs_impact ON sentiment_logs (impact_score);
+CREATE INDEX IF NOT EXISTS idx_logs_video ON sentiment_logs (video_id);
+
+CREATE TABLE IF NOT EXISTS narrative_briefs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content JSON,
+    net_trust_score REAL,
+    created_at TIMESTAMP DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_briefs_created ON narrative_briefs (created_at);
+
+CREATE TABLE IF NOT EXISTS horizon_briefs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    horizon TEXT,
+    period_start TEXT,
+    period_end TEXT,
+    content JSON,
+    net_trust_score REAL,
+    input_key TEXT,
+    created_at TIMESTAMP DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_horizon_briefs ON horizon_briefs (horizon, created_at);
+
+CREATE TABLE IF NOT EXISTS comments (
+    id TEXT PRIMARY KEY,
+    video_id TEXT,
+    text TEXT,
+    like_count INTEGER,
+    author_handle TEXT,
+    created_at TIMESTAMP,
+    profile TEXT,
+    is_analyzed BOOLEAN DEFAULT 0,
+    attempts INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_comments_queue ON comments (is_analyzed, like_count);
+CREATE INDEX IF NOT EXISTS idx_comments_video ON comments (video_id);
+"""
+
+# Columns added to tables after they first shipped; older database files get them on open
+_ADDED_COLUMNS = [
+    ("comments", "attempts", "INTEGER DEFAULT 0"),
+]
+
+_OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+def _timestamp(value):
+    """Any ISO string / datetime -> naive UTC ISO with microseconds, so text order = time order."""
+    if value is None or value == "":
+        return None
+    dt = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.isoformat(timespec="microseconds")
+
+
+class LocalStore:
+    """Embedded SQLite backend with the Supabase client's table() entry point."""
+
+    def __init__(self, path=LOCAL_DB_PATH):
+        self.path = path
+        self._local = threading.local()  # One connection per thread (the outbox flusher runs in its own)
+        self._columns = {}
+        self._lock = threading.Lock()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.connection().executescript(_SCHEMA)
+        for table, column, kind in _ADDED_COLUMNS:
+            if column not in self.columns(table):
+                try:
+                    self.connection().execute(f'ALTER TABLE "{table}" ADD COLUMN {_quote(column)} {kind}')
+                except sqlite3.OperationalError:
+                    pass  # Another process added it first
+                with self._lock:
+                    self._columns.pop(table, None)
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def columns(self, table):
+        """{column: declared type} for one table (cached; refreshed when columns are added)."""
+        with self._lock:
+            if table not in self._columns:
+                rows = self.connection().execute(f'PRAGMA table_info("{table}")').fetchall()
+                if not rows:
+                    raise ValueError(f"Unknown table '{table}' in {self.path}")
+                self._columns[table] = {r[1]: (r[2] or "").upper() for r in rows}
+            return self._columns[table]
+
+    def ensure_columns(self, table, rows):
+        """Add any payload keys the table does not have yet (type guessed from the first value)."""
+        known = self.columns(table)
+        missing = {}
+        for row in rows:
+            for key, value in row.items():
+                if key not in known and key not in missing:
+                    missing[key] = _guess_type(value)
+        if not missing:
+            return
+        conn = self.connection()
+        for key, kind in missing.items():
+            try:
+                conn.execute(f'ALTER TABLE "{table}" ADD COLUMN {_quote(key)} {kind}')
+            except sqlite3.OperationalError:
+                pass  # Another process added it first
+        with self._lock:
+            self._columns.pop(table, None)
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _guess_type(value):
+    if isinstance(value, bool):
+        return "BOOLEAN"
+    if isinstance(value, int):
+        return "INTEGER"
+    if isinstance(value, float):
+        return "REAL"
+    if isinstance(value, (dict, list)):
+        return "JSON"
+    return "TEXT"
+
+
+class _Query:
+    """One query-builder chain. Filters are kept as SQL fragments; execute() runs them."""
+
+    def __init__(self, store, table):
+        self.store = store
+        self.table_name = table
+        self.action = "select"
+        self.fields = "*"
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.where = []
+        self.params = []
+        self.orders = []
+        self.limit_n = None
+        self.offset_n = None
+
+    # --- ACTIONS ---
+    def select(self, fields="*", count=None):
+        self.action, self.fields = "select", fields
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False):
+        self.action, self.payload = "upsert", rows
+        self.on_conflict, self.ignore_duplicates = on_conflict, ignore_duplicates
+        return self
+
+    def update(self, values):
+        self.action, self.payload = "update", values
+        return self
+
+    # --- FILTERS ---
+    def _filter(self, column, op, value):
+        if value is None and op == "eq":
+            self.where.append(f'{_quote(column)} IS NULL')
+        else:
+            self.where.append(f'{_quote(column)} {_OPERATORS[op]} ?')
+            self.params.append(self._value(column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def in_(self, column, values):
+        values = list(values)
+        if not values:
+            self.where.append("0")
+            return self
+        self.where.append(f'{_quote(column)} IN ({", ".join("?" * len(values))})')
+        self.params.extend(self._value(column, v) for v in values)
+        return self
+
+    def or_(self, filters):
+        """PostgREST or-filter: "col.op.value,col.is.null" (flat, no nested and/or)."""
+        clauses = []
+        for part in filters.split(","):
+            column, op, value = part.split(".", 2)
+            if op == "is":
+                clauses.append(f'{_quote(column)} IS {"NULL" if value == "null" else int(value == "true")}')
+            else:
+                clauses.append(f'{_quote(column)} {_OPERATORS[op]} ?')
+                self.params.append(self._value(column, value))
+        self.where.append("(" + " OR ".join(clauses) + ")")
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append(f'{_quote(column)} {"DESC" if desc else "ASC"}')
+        return self
+
+    def limit(self, n):
+        self.limit_n = int(n)
+        return self
+
+    def range(self, start, end):
+        self.offset_n, self.limit_n = int(start), int(end) - int(start) + 1
+        return self
+
+    # --- EXECUTION ---
+    def _value(self, column, value):
+        kind = self.store.columns(self.table_name).get(column, "")
+        if kind == "TIMESTAMP":
+            return _timestamp(value)
+        if kind == "JSON" and isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False)
+        if kind == "BOOLEAN" and isinstance(value, str):
+            return int(value == "true")
+        return value
+
+    def _where_sql(self):
+        return (" WHERE " + " AND ".join(self.where)) if self.where else ""
+
+    def _select(self, conn):
+        known = self.store.columns(self.table_name)
+        fields = list(known) if self.fields.strip() == "*" else [f.strip() for f in self.fields.split(",") if f.strip()]
+        # Columns this database has never seen come back as None, like an unset column would
+        selected = [f for f in fields if f in known]
+        sql = f'SELECT {", ".join(_quote(f) for f in selected) or "NULL"} FROM "{self.table_name}"{self._where_sql()}'
+        if self.orders:
+            sql += " ORDER BY " + ", ".join(self.orders)
+        if self.limit_n is not None or self.offset_n is not None:
+            sql += f" LIMIT {self.limit_n if self.limit_n is not None else -1} OFFSET {self.offset_n or 0}"
+        rows = conn.execute(sql, self.params).fetchall()
+
+        decoders = [(i, f, known[f]) for i, f in enumerate(selected) if known[f] in ("BOOLEAN", "JSON")]
+        missing = [f for f in fields if f not in known]
+        out = []
+        for r in rows:
+            row = dict(zip(selected, r))
+            for i, field, kind in decoders:
+                if r[i] is not None:
+                    row[field] = bool(r[i]) if kind == "BOOLEAN" else json.loads(r[i])
+            for field in missing:
+                row[field] = None
+            out.append(row)
+        return out
+
+    def _write_rows(self, conn, rows):
+        conflict = self.on_conflict or "id"
+        written = []
+        for row in rows:
+            cols = list(row)
+            values = [self._value(c, row[c]) for c in cols]
+            sql = f'INSERT INTO "{self.table_name}" ({", ".join(_quote(c) for c in cols)}) VALUES ({", ".join("?" * len(cols))})'
+            if self.action == "upsert":
+                updates = [c for c in cols if c != conflict]
+                if self.ignore_duplicates or not updates:
+                    sql += f' ON CONFLICT("{conflict}") DO NOTHING'
+                else:
+                    sql += f' ON CONFLICT("{conflict}") DO UPDATE SET ' + ", ".join(f'"{c}" = excluded."{c}"' for c in updates)
+            cursor = conn.execute(sql, values)
+            if cursor.rowcount:
+                written.append(dict(row, id=row.get("id", cursor.lastrowid)))
+        return written
+
+    def execute(self):
+        conn = self.store.connection()
+        if self.action == "select":
+            return SimpleNamespace(data=self._select(conn), count=None)
+
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        self.store.ensure_columns(self.table_name, rows)
+        # IMMEDIATE = write lock taken up front, so a conditional update (work_lease.claim)
+        # matches and stamps its rows atomically with respect to other workers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.action == "update":
+                matched = [r[0] for r in conn.execute(f'SELECT rowid FROM "{self.table_name}"{self._where_sql()}', self.params)]
+                data = []
+                if matched:
+                    cols = list(self.payload)
+                    marks = ", ".join("?" * len(matched))
+                    conn.execute(
+                        f'UPDATE "{self.table_name}" SET {", ".join(_quote(c) + " = ?" for c in cols)} WHERE rowid IN ({marks})',
+                        [self._value(c, self.payload[c]) for c in cols] + matched,
+                    )
+                    query = _Query(self.store, self.table_name)
+                    query.where, query.params = [f"rowid IN ({marks})"], matched
+                    data = query._select(conn)
+            else:
+                data = self._write_rows(conn, rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return SimpleNamespace(data=data, count=None)
+
+
+def connect(backend=None):
+    """The configured storage client (Supabase or LocalStore). Both expose .table(name)."""
+    backend = (backend or STORAGE_BACKEND).lower()
+    if backend == "sqlite":
+        return LocalStore(LOCAL_DB_PATH)
+    if backend != "supabase":
+        raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected 'supabase' or 'sqlite')")
+    from supabase import create_client
+
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_KEY")
+    if not supabase_url or not supabase_key:
+        raise ValueError("Missing SUPABASE_URL or SUPABASE_KEY in environment variables")
+    return create_client(supabase_url, supabase_key)
+
+
+def pull(remote, local, days=PULL_DAYS, page_size=PULL_PAGE_SIZE):
+    """Copy the last `days` of every table from Supabase into the local store (upserts, so re-runs only refresh)."""
+    cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    counts = {}
+    for table in ("videos", "sentiment_logs", "narrative_briefs", "horizon_briefs", "comments"):
+        started = time.time()
+        counts[table] = 0
+        offset = 0
+        while True:
+            rows = remote.table(table) \
+                .select("*") \
+                .gte("created_at", cutoff) \
+                .order("created_at") \
+                .range(offset, offset + page_size - 1) \
+                .execute().data or []
+            if rows:
+                local.table(table).upsert(rows).execute()
+                counts[table] += len(rows)
+            if len(rows) < page_size:
+                break
+            offset += page_size
+        print(f"  📥 {table}: {counts[table]} rows in {time.time() - started:.1f}s")
+    return counts
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    if len(sys.argv) < 2 or sys.argv[1] != "pull":
+        sys.exit("Usage: python storage.py pull [days]")
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else PULL_DAYS
+    print(f"🗄️ Pulling the last {days} days from Supabase into {LOCAL_DB_PATH}...")
+    counts = pull(connect("supabase"), LocalStore(LOCAL_DB_PATH), days)
+    print(f"✅ {sum(counts.values())} rows cached locally. Use STORAGE_BACKEND=sqlite to read from it.")
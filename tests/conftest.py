@@ -0,0 +1,21 @@
+import os
+import sys
+import pytest
+
+# Modules live flat at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch):
+    """Run every test in its own folder, so relative state/ paths never touch the repo."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Empty embedded store with the pipeline schema (stands in for Supabase)."""
+    return storage.LocalStore(str(tmp_path / "local.db"))
@@ -0,0 +1,89 @@
+import json
+import numpy as np
+import pandas as pd
+import api_server
+import trust_metrics
+
+NOW = pd.Timestamp("2026-01-10 12:00", tz="UTC").timestamp()
+
+
+def frame(hours_ago, impacts, triggers):
+    return pd.DataFrame({
+        "created_at": [pd.Timestamp(NOW - h * 3600, unit="s", tz="UTC") for h in hours_ago],
+        "topic": "Economic Anxiety",
+        "specific_trigger": triggers,
+        "archetype": "Digital Cynic",
+        "impact_score": impacts,
+        "summary": "s",
+    })
+
+
+def test_build_payloads_covers_every_path():
+    df = frame([1, 2, 50], [-2.0, 1.0, -1.0], ["Diesel", "Aid", "Diesel"])
+    payloads = api_server.build_payloads(df, {"content": {"headline": "h"}}, trust_metrics.TrustMetrics(), NOW)
+
+    expected = {"/v1/brief", "/v1/metrics"}
+    for name in api_server.API_WINDOWS:
+        expected |= {f"/v1/signals?window={name}", f"/v1/trend?window={name}"}
+    assert set(payloads) == expected
+    assert set(payloads["/v1/metrics"]["windows"]) == set(api_server.API_WINDOWS)
+    json.dumps(payloads)  # Every body must serialize
+
+
+def test_signals_are_cut_to_the_window():
+    df = frame([1, 2, 50], [-2.0, 1.0, -1.0], ["Diesel", "Aid", "Diesel"])
+    payloads = api_server.build_payloads(df, None, trust_metrics.TrustMetrics(), NOW)
+
+    day = payloads["/v1/signals?window=24H"]
+    assert day["voices"] == 2
+    assert day["threats"] == [{"trigger": "Diesel", "impact": -2.0}]
+    assert day["wins"] == [{"trigger": "Aid", "impact": 1.0}]
+    assert payloads["/v1/signals?window=3D"]["threats"] == [{"trigger": "Diesel", "impact": -3.0}]
+
+
+def test_empty_frame_still_answers_every_window():
+    payloads = api_server.build_payloads(frame([], [], []), None, trust_metrics.TrustMetrics(), NOW)
+    assert payloads["/v1/signals?window=7D"]["voices"] == 0
+    assert payloads["/v1/trend?window=7D"]["trust"] == {}
+
+
+def test_trend_stays_within_the_point_budget():
+    rng = np.random.default_rng(3)
+    hours = rng.random(5000) * 24 * 89
+    df = frame(hours, rng.normal(size=5000), rng.choice(["A", "B"], 5000))
+    trend = api_server.build_payloads(df, None, trust_metrics.TrustMetrics(), NOW)["/v1/trend?window=90D"]
+    assert len(trend["trust"]["Trust Score"]["t"]) <= api_server.downsample.TREND_MAX_POINTS
+
+
+def test_response_etag_follows_the_body():
+    a, b = api_server.Response({"x": 1}), api_server.Response({"x": 1})
+    assert a.etag == b.etag
+    assert api_server.Response({"x": 2}).etag != a.etag
+
+
+def test_refresher_rebuilds_each_hour_without_new_rows(store):
+    store.table("sentiment_logs").insert({
+        "created_at": "2026-01-10T11:00:00", "topic": "Economic Anxiety", "specific_trigger": "Diesel",
+        "archetype": "Digital Cynic", "impact_score": -1.0, "summary": "s",
+    }).execute()
+    refresher = api_server.Refresher(store, api_server.AggregateStore())
+
+    assert refresher.refresh(NOW) is True
+    assert json.loads(refresher.store.get("/v1/signals?window=24H").body)["voices"] == 1
+    assert refresher.refresh(NOW + 600) is False  # Same hour, same data
+    assert refresher.refresh(NOW + 3600) is True  # The windows moved on
+    assert refresher.refresh(NOW + 86400) is True
+
+
+def test_refresher_compacts_rows_past_the_history_window(store):
+    store.table("sentiment_logs").insert([
+        {"created_at": "2026-01-10T11:00:00", "impact_score": -1.0, "topic": "Economic Anxiety"},
+        {"created_at": "2026-01-07T12:00:00", "impact_score": 1.0, "topic": "Economic Anxiety"},
+    ]).execute()
+    refresher = api_server.Refresher(store, api_server.AggregateStore())
+    refresher.refresh(NOW)
+    assert len(refresher.index) == 2
+
+    # Two hours short of the newest row expiring, more than a day past the oldest
+    refresher.refresh(NOW + api_server.HISTORY_DAYS * 86400 - 7200)
+    assert len(refresher.index) == 1
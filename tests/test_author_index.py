@@ -0,0 +1,70 @@
+import pytest
+import author_index
+from author_index import AuthorIndex
+
+DAY = 86400
+NOW = 1_767_000_000.0
+
+
+def video(video_id, handle, views, shares=0, profile="anwar_ibrahim"):
+    return {"id": video_id, "author_handle": handle, "views": views, "share_count": shares, "profile": profile}
+
+
+def test_only_view_growth_is_added_on_rescrape():
+    index = AuthorIndex()
+    index.add_videos([video("v1", "alice", 1000)], now=NOW)
+    index.add_videos([video("v1", "alice", 1500)], now=NOW)
+    index.add_videos([video("v1", "alice", 1200)], now=NOW)  # Counts never go down for reach
+
+    a = index.authors["alice"]
+    assert a["views"] == pytest.approx(1500)
+    assert a["posts"] == pytest.approx(1)
+
+
+def test_unknown_authors_are_ignored():
+    index = AuthorIndex()
+    assert index.add_videos([video("v1", "unknown", 10), video("v2", None, 10)], now=NOW) == set()
+    assert index.authors == {}
+
+
+def test_sums_decay_with_the_half_life():
+    index = AuthorIndex()
+    index.add_videos([video("v1", "alice", 1000)], now=NOW)
+    later = index.stats("alice", now=NOW + author_index.HALF_LIFE_DAYS * DAY)
+    assert later["views_per_day"] == pytest.approx(index.stats("alice", now=NOW)["views_per_day"] / 2)
+
+
+def test_scores_rank_reach_and_impact():
+    index = AuthorIndex()
+    index.add_videos([video("v1", "big", 100_000, 500), video("v2", "small", 100)], now=NOW)
+    index.add_impacts([("big", -2.0), ("small", 0.1)], now=NOW)
+
+    big, small, stranger = index.scores(["big", "small", "nobody"], now=NOW)
+    assert big == pytest.approx(1.0)
+    assert small == pytest.approx(0.0)
+    assert stranger == 0.0
+
+
+def test_top_authors_respects_the_profile():
+    index = AuthorIndex()
+    index.add_videos([video("v1", "a", 500), video("v2", "b", 900, profile="other"), video("v3", "c", 100)], now=NOW)
+    assert index.top_authors(2, now=NOW) == ["b", "a"]
+    assert index.top_authors(5, profile="anwar_ibrahim", now=NOW) == ["a", "c"]
+
+
+def test_prune_drops_stale_authors_and_videos():
+    index = AuthorIndex()
+    index.add_videos([video("v1", "old", 100)], now=NOW)
+    index.add_videos([video("v2", "new", 100)], now=NOW + 59 * DAY)
+    index.prune(now=NOW + 61 * DAY)
+    assert set(index.authors) == {"new"}
+    assert set(index.videos) == {"v2"}
+
+
+def test_record_videos_round_trips_through_the_file(tmp_path):
+    path = str(tmp_path / "author_index.json")
+    author_index.record_videos([video("v1", "alice", 100)], path=path)
+    author_index.record_impacts([("alice", -1.5)], path=path)
+    loaded = AuthorIndex.load(path)
+    assert set(loaded.videos) == {"v1"}
+    assert loaded.stats("alice")["avg_impact"] == pytest.approx(-1.5)
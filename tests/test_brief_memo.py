@@ -0,0 +1,87 @@
+import os
+import json
+import tempfile
+from types import SimpleNamespace
+import pytest
+import brief_memo
+import storage
+import trust_metrics
+
+SCORES = {"current": -0.5, "gap_yesterday": 0.1, "gap_last_week": -0.2}
+
+
+def test_unchanged_evidence_hits_the_live_brief():
+    assert brief_memo.lookup(SCORES, [1, 2, 3]) is None
+    brief_memo.store(SCORES, [1, 2, 3], {"headline": "A"})
+
+    hit = brief_memo.lookup({**SCORES, "current": -0.48}, [3, 2, 1])
+    assert hit == {"brief": {"headline": "A"}, "live": True}
+
+
+def test_drift_beyond_tolerance_misses():
+    brief_memo.store(SCORES, [1], {"headline": "A"})
+    assert brief_memo.lookup({**SCORES, "current": -0.2}, [1]) is None
+
+
+def test_returning_to_earlier_evidence_is_not_live():
+    brief_memo.store(SCORES, ["a"], {"headline": "A"})
+    brief_memo.store(SCORES, ["b"], {"headline": "B"})
+
+    hit = brief_memo.lookup(SCORES, ["a"])
+    assert hit == {"brief": {"headline": "A"}, "live": False}
+
+    # Once A is re-published it is the live brief again, and B no longer is
+    brief_memo.store(SCORES, ["a"], hit["brief"])
+    assert brief_memo.lookup(SCORES, ["a"])["live"] is True
+    assert brief_memo.lookup(SCORES, ["b"])["live"] is False
+    assert len(brief_memo._load()["entries"]) == 2
+
+
+def test_stats_count_lookups_and_hits():
+    brief_memo.store(SCORES, [1], {"headline": "A"})
+    brief_memo.lookup(SCORES, [1])
+    brief_memo.lookup(SCORES, [2])
+    assert brief_memo.stats() == {"lookups": 2, "hits": 1, "hit_rate": 0.5}
+
+
+def test_a_b_a_republishes_the_earlier_brief_without_gemini(store, monkeypatch):
+    pytest.importorskip("google.genai")
+    pytest.importorskip("dotenv")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("GEMINI_API_KEY", "test-key")
+        mp.setattr(storage, "STORAGE_BACKEND", "sqlite")
+        mp.setattr(storage, "LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "import.db"))
+        import narrative_v2
+
+    metrics = trust_metrics.TrustMetrics()
+    evidence = {"rows": [{"id": 1}]}
+    headlines = iter(["Brief A", "Brief B"])
+    gemini_calls = []
+
+    def fake_gemini(model, tokens, fn, retries=0):
+        gemini_calls.append(model)
+        return SimpleNamespace(text=json.dumps({"headline": next(headlines), "public_narrative": "n"}))
+
+    monkeypatch.setattr(narrative_v2, "supabase", store)
+    monkeypatch.setattr(narrative_v2.trust_metrics, "load_or_rebuild", lambda supabase: metrics)
+    monkeypatch.setattr(narrative_v2.brief_trigger, "evaluate", lambda supabase, metrics: {"fire": True})
+    monkeypatch.setattr(narrative_v2.evidence_packer, "fetch_candidates", lambda supabase, since: ([{"id": 0}], []))
+    monkeypatch.setattr(narrative_v2.evidence_packer, "pack", lambda threats, wins: ("evidence", evidence["rows"], None))
+    monkeypatch.setattr(narrative_v2.gemini_quota, "call", fake_gemini)
+
+    def live_headline():
+        briefs = store.table("narrative_briefs").select("id, content").order("id", desc=True).limit(1).execute().data
+        return briefs[0]["content"]["headline"]
+
+    narrative_v2.generate_daily_brief()
+    assert live_headline() == "Brief A"
+    evidence["rows"] = [{"id": 2}]
+    narrative_v2.generate_daily_brief()
+    assert live_headline() == "Brief B"
+    evidence["rows"] = [{"id": 1}]
+    narrative_v2.generate_daily_brief()
+    assert live_headline() == "Brief A"
+    assert len(gemini_calls) == 2
+
+    narrative_v2.generate_daily_brief()  # Same evidence again: nothing new written
+    assert len(store.table("narrative_briefs").select("id").execute().data) == 3
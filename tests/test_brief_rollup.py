@@ -0,0 +1,76 @@
+import os
+import tempfile
+import pytest
+import storage
+
+pytest.importorskip("google.genai")
+pytest.importorskip("dotenv")
+# brief_rollup builds its clients at import: a dummy key and a throwaway local store
+with pytest.MonkeyPatch.context() as mp:
+    mp.setenv("GEMINI_API_KEY", "test-key")
+    mp.setattr(storage, "STORAGE_BACKEND", "sqlite")
+    mp.setattr(storage, "LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "import.db"))
+    import brief_rollup
+
+
+def logs(*specs):
+    return [{"id": i, "topic": topic, "specific_trigger": trigger, "summary": summary, "impact_score": impact}
+            for i, (topic, trigger, summary, impact) in enumerate(specs, 1)]
+
+
+def test_build_day_digest_summarizes_each_topic():
+    rows = logs(
+        ("Economic Anxiety", "Diesel", "prices up", -2.0),
+        ("Economic Anxiety", "Diesel", "queues", -1.0),
+        ("Economic Anxiety", "Aid", "cash aid", 1.0),
+        ("Public Competency", "Floods", "quick response", 2.0),
+    )
+    brief = {"content": {"headline": "Diesel Bites", "public_narrative": "n"}}
+    digest = brief_rollup.build_day_digest("2026-01-05", rows, brief)
+
+    assert digest["count"] == 4
+    assert digest["impact_sum"] == 0.0
+    assert digest["max_id"] == 4
+    assert digest["headline"] == "Diesel Bites"
+    economy = digest["topics"][0]
+    assert economy["topic"] == "Economic Anxiety"
+    assert economy["count"] == 3
+    assert economy["triggers"][0] == ["Diesel", -3.0]
+    assert economy["threat"] == "prices up"
+    assert economy["win"] == "cash aid"
+
+
+def test_build_day_digest_for_an_empty_day():
+    digest = brief_rollup.build_day_digest("2026-01-05", [], None)
+    assert digest["count"] == 0 and digest["nts"] == 0.0 and digest["topics"] == [] and digest["max_id"] is None
+
+
+def test_split_horizon_uses_whole_calendar_weeks():
+    # 2026-01-01 is a Thursday: Thu-Sun loose, Mon 5th..Sun 11th one week, Mon 12th loose
+    days = [f"2026-01-{d:02d}" for d in range(1, 13)]
+    weeks, loose = brief_rollup.split_horizon(days)
+    assert weeks == [[f"2026-01-{d:02d}" for d in range(5, 12)]]
+    assert loose == ["2026-01-01", "2026-01-02", "2026-01-03", "2026-01-04", "2026-01-12"]
+
+
+def test_encode_day_stays_small_whatever_the_volume():
+    rows = logs(*[("Economic Anxiety", f"Trigger {i % 50}", "summary text", (-1) ** i) for i in range(5000)])
+    text = brief_rollup.encode_day(brief_rollup.build_day_digest("2026-01-05", rows, None))
+    assert len(text.splitlines()) == 2
+    assert len(text) < 400
+
+
+def test_late_rows_rebuild_their_day(store, monkeypatch):
+    monkeypatch.setattr(brief_rollup, "supabase", store)
+    days = ["2026-01-05", "2026-01-06"]
+    store.table("sentiment_logs").insert([
+        {"created_at": f"{day}T10:00:00", "impact_score": 1.0, "topic": "Economic Anxiety"} for day in days
+    ]).execute()
+    cache = {"days": {}, "weeks": {}, "horizons": {}}
+    brief_rollup.day_digests(cache, days, "2026-01-07")
+    assert brief_rollup.drop_stale_days(cache, days, "2026-01-07") == []
+
+    store.table("sentiment_logs").insert({"created_at": "2026-01-05T23:00:00", "impact_score": -3.0, "topic": "Economic Anxiety"}).execute()
+    assert brief_rollup.drop_stale_days(cache, days, "2026-01-07") == ["2026-01-05"]
+    digests = brief_rollup.day_digests(cache, days, "2026-01-07")
+    assert [d["count"] for d in digests] == [2, 1]
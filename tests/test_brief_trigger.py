@@ -0,0 +1,82 @@
+import time
+import pytest
+import brief_trigger
+import trust_metrics
+
+
+@pytest.fixture(autouse=True)
+def state_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(brief_trigger, "STATE_PATH", str(tmp_path / "state" / "brief_trigger.json"))
+    monkeypatch.setattr(brief_trigger, "DECISION_LOG_PATH", str(tmp_path / "state" / "brief_decisions.jsonl"))
+
+
+def feed(detector, values):
+    return [detector.update(v) for v in values]
+
+
+def test_cusum_stays_quiet_on_noise_and_during_warmup():
+    detector = brief_trigger.Cusum()
+    alarms = feed(detector, [0.1, -0.1] * 50)
+    assert not any(alarms)
+
+
+def test_cusum_flags_a_sustained_drop():
+    detector = brief_trigger.Cusum()
+    feed(detector, [0.0] * 24)
+    alarms = feed(detector, [-1.0] * 6)
+    assert "down" in alarms
+    assert "up" not in alarms
+
+
+def test_cusum_flags_a_sustained_rise_and_resets_after_the_alarm():
+    detector = brief_trigger.Cusum()
+    feed(detector, [0.0] * 24)
+    alarms = feed(detector, [1.0] * 6)
+    assert "up" in alarms and "down" not in alarms
+    fired = alarms.index("up")
+    assert alarms[fired + 1] is None
+
+
+def test_cusum_warmup_suppresses_alarms():
+    detector = brief_trigger.Cusum()
+    assert feed(detector, [0.0, 5.0, -5.0, 5.0, -5.0, 5.0]) == [None] * brief_trigger.WARMUP_HOURS
+
+
+def test_cusum_state_round_trips():
+    detector = brief_trigger.Cusum()
+    feed(detector, [0.2, 0.4, 0.1])
+    clone = brief_trigger.Cusum(**detector.to_dict())
+    assert clone.update(0.3) == detector.update(0.3)
+    assert clone.to_dict() == detector.to_dict()
+
+
+def test_pending_reasons_are_not_repeated(store):
+    metrics = trust_metrics.TrustMetrics()
+    now = time.time()
+    for i in range(3):
+        decision = brief_trigger.evaluate(store, metrics, now + i * 60)
+    assert decision["fire"]
+    assert len(decision["reasons"]) == len(set(decision["reasons"]))
+
+
+def test_memo_hit_keeps_the_daily_floor(store):
+    metrics = trust_metrics.TrustMetrics()
+    brief_trigger.evaluate(store, metrics)
+    brief_trigger.mark_memo_hit()
+
+    state = brief_trigger._load_state()
+    assert state["pending_reasons"] == []
+    assert state["last_brief_at"] is None
+    assert state["memo_hits"] == 1
+    assert brief_trigger.evaluate(store, metrics)["fire"]
+
+
+def test_channels_keep_separate_state(store):
+    metrics = trust_metrics.TrustMetrics()
+    brief_trigger.evaluate(store, metrics, channel="narrative_gen")
+    brief_trigger.mark_generated(channel="narrative_gen")
+
+    assert brief_trigger._load_state("narrative_gen")["last_brief_at"] is not None
+    assert brief_trigger._load_state()["last_brief_at"] is None
+    assert not brief_trigger.evaluate(store, metrics, channel="narrative_gen")["fire"]
+    assert brief_trigger.evaluate(store, metrics)["fire"]
@@ -0,0 +1,46 @@
+from caption_compact import compact, MAX_HASHTAGS
+from evidence_packer import estimate_tokens
+
+
+def test_strips_urls_boilerplate_and_reach_bait_tags():
+    text = compact("Harga diesel naik lagi https://t.co/abc #fyp #viral #diesel link in bio")
+    assert text == "Harga diesel naik lagi #diesel"
+
+
+def test_keeps_first_mentions_and_topical_tags():
+    text = compact("@a @b @c @d ubah " + " ".join(f"#t{i}" for i in range(10)))
+    assert text.split()[:2] == ["@a", "@b"]
+    assert "@c" not in text
+    assert sum(1 for w in text.split() if w.startswith("#")) == MAX_HASHTAGS
+
+
+def test_collapses_repeats():
+    assert compact("hahahahaha 😂😂😂😂😂 !!!!!!") == "haha 😂😂 !!"
+    assert compact("sama sama sama sama") == "sama"
+    assert compact("ana ana anak") == "ana ana anak"
+    assert compact("kata anak anak anak") == "kata anak"
+    assert compact("RM1000000") == "RM1000000"
+
+
+def test_mandarin_and_malay_pass_through_unchanged():
+    assert compact("安华政府 subsidi minyak") == "安华政府 subsidi minyak"
+
+
+def test_caps_the_token_budget_at_a_word_boundary():
+    caption = " ".join(["rakyat"] * 200)
+    text = compact(caption.replace("rakyat rakyat", "rakyat susah"), max_tokens=20)
+    assert estimate_tokens(text) <= 20
+    assert text.endswith("…")
+
+
+def test_cuts_an_unbroken_cjk_run_by_characters():
+    text = compact("".join(chr(0x4E00 + i) for i in range(100)), max_tokens=10)
+    assert estimate_tokens(text) <= 10
+    assert text.endswith("…")
+
+
+def test_is_deterministic_and_empty_safe():
+    caption = "Subsidi #fyp @x @y @z hahahaha"
+    assert compact(caption) == compact(caption)
+    assert compact("") == ""
+    assert compact(None) == ""
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import downsample
+
+
+def test_lttb_keeps_endpoints_and_the_budget():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.sin(x / 50)
+    kept = downsample.lttb(x, y, 50)
+    assert len(kept) == 50
+    assert kept[0] == 0 and kept[-1] == 999
+    assert np.all(np.diff(kept) > 0)
+
+
+def test_lttb_keeps_a_lone_spike():
+    x = np.arange(500, dtype=np.float64)
+    y = np.zeros(500)
+    y[321] = 10.0
+    assert 321 in downsample.lttb(x, y, 20)
+
+
+def test_lttb_returns_everything_under_the_budget():
+    x = np.arange(10, dtype=np.float64)
+    assert downsample.lttb(x, x, 10).tolist() == list(range(10))
+    assert downsample.lttb(x, x, 2).tolist() == list(range(10))
+
+
+def test_bin_means_averages_per_bin():
+    t = np.array([0.0, 10.0, 3600.0, 3610.0])
+    y = np.array([1.0, 3.0, -1.0, -3.0])
+    starts, means = downsample.bin_means(t, y, max_bins=4)
+    assert means.tolist() == [2.0, -2.0]
+    assert starts.tolist() == [0.0, 3600.0]  # Empty bins in between are dropped
+
+
+def test_same_point_budget_for_any_window():
+    rng = np.random.default_rng(1)
+    for days in (1, 90):
+        rows = 20000
+        df = pd.DataFrame({
+            "created_at": pd.Timestamp("2026-01-01", tz="UTC") + pd.to_timedelta(rng.random(rows) * days * 86400, unit="s"),
+            "impact_score": rng.normal(size=rows),
+            "topic": rng.choice(["A", "B", "C"], rows),
+        })
+        main = downsample.trend_series(df)
+        assert list(main) == ["Trust Score"]
+        assert len(main["Trust Score"][0]) <= downsample.TREND_MAX_POINTS
+        overlays = downsample.trend_series(df, group_col="topic")
+        assert set(overlays) == {"A", "B", "C"}
+        assert all(len(t) <= downsample.OVERLAY_MAX_POINTS for t, _ in overlays.values())
+
+
+def test_empty_frame_has_no_series():
+    assert downsample.trend_series(pd.DataFrame(columns=["created_at", "impact_score"])) == {}
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+import evidence_index
+
+
+def row(row_id, hours_ago, summary, topic="Economic Anxiety", now=datetime(2026, 1, 10, 12)):
+    return {
+        "id": row_id,
+        "video_id": f"v{row_id}",
+        "created_at": (now - timedelta(hours=hours_ago)).isoformat(),
+        "topic": topic,
+        "specific_trigger": "Diesel Subsidy",
+        "archetype": "Digital Cynic",
+        "impact_score": -1.0,
+        "summary": summary,
+    }
+
+
+def test_tokenize_splits_cjk_into_bigrams():
+    tokens = evidence_index.tokenize("Harga minyak 拿督斯里安华")
+    assert "harga" in tokens and "minyak" in tokens
+    assert "安华" in tokens
+    assert evidence_index.tokenize("安") == ["安"]
+
+
+def test_search_is_newest_first_and_paged():
+    index = evidence_index.EvidenceIndex()
+    index.add_rows([row(i, 10 - i, f"diesel price {i}") for i in range(10)])
+
+    total, page = index.search("diesel", page_size=3)
+    assert total == 10
+    assert [r["summary"] for r in page] == ["diesel price 9", "diesel price 8", "diesel price 7"]
+    total, page = index.search("diesel", page=3, page_size=3)
+    assert [r["summary"] for r in page] == ["diesel price 0"]
+    assert index.search("petrol") == (0, [])
+
+
+def test_search_filters_on_facets_and_since():
+    index = evidence_index.EvidenceIndex()
+    index.add_rows([row(1, 5, "subsidy cut"), row(2, 1, "subsidy cut", topic="Public Competency")])
+    assert index.search("subsidy", topic="Public Competency")[0] == 1
+    since = evidence_index._to_epoch(datetime(2026, 1, 10, 9).isoformat())
+    assert index.search("subsidy", since=since)[0] == 1
+
+
+def test_late_row_with_older_timestamp_is_still_searchable_in_order():
+    index = evidence_index.EvidenceIndex()
+    index.add_rows([row(1, 2, "first"), row(2, 1, "second")])
+    index.add_rows([row(3, 5, "late replay")])  # New id, older created_at
+    assert not index.in_order
+
+    total, page = index.search()
+    assert total == 3
+    assert [r["summary"] for r in page] == ["second", "first", "late replay"]
+
+
+def test_rows_already_indexed_are_skipped():
+    index = evidence_index.EvidenceIndex()
+    assert len(index.add_rows([row(1, 1, "a")])) == 1
+    assert index.add_rows([row(1, 1, "a")]) == []
+    assert index.watermark == 1
+
+
+def test_compact_drops_old_docs_and_forgets_their_ids():
+    index = evidence_index.EvidenceIndex()
+    index.add_rows([row(1, 48, "old diesel"), row(2, 1, "new diesel")])
+    cutoff = evidence_index._to_epoch(datetime(2026, 1, 9, 12).isoformat())
+
+    assert index.compact(cutoff) == 1
+    assert 1 not in index.keys
+    total, page = index.search("diesel")
+    assert total == 1 and page[0]["summary"] == "new diesel"
+
+
+def test_sync_follows_row_ids(store):
+    store.table("sentiment_logs").insert([row(None, 3, "first"), row(None, 2, "second")]).execute()
+    index = evidence_index.EvidenceIndex()
+    seen = []
+    since = datetime(2026, 1, 1).isoformat()
+
+    assert evidence_index.sync_from_supabase(index, store, since, on_rows=seen.extend) == 2
+    # Written late (outbox replay) with an older timestamp: picked up by its id
+    store.table("sentiment_logs").insert(row(None, 30, "late")).execute()
+    assert evidence_index.sync_from_supabase(index, store, since, on_rows=seen.extend) == 1
+    assert evidence_index.sync_from_supabase(index, store, since) == 0
+    assert sorted(r["summary"] for r in seen) == ["first", "late", "second"]
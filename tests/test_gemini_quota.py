@@ -0,0 +1,103 @@
+import pytest
+import gemini_quota
+
+MODEL = "test-model"
+
+
+class FakeClock:
+    def __init__(self, now=1_767_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(gemini_quota, "_clock", fake)
+    monkeypatch.setattr(gemini_quota, "_sleep", fake.sleep)
+    monkeypatch.setitem(gemini_quota.MODEL_LIMITS, MODEL, {"rpm": 60, "tpm": 6000})
+    return fake
+
+
+def limit():
+    with gemini_quota._locked_state() as state:
+        return state[MODEL]["limit"]
+
+
+def test_request_bucket_refills_over_time(clock):
+    for i in range(60):
+        assert gemini_quota._try_acquire(MODEL, 1, f"s{i}") == 0
+        gemini_quota._release(MODEL, f"s{i}", 1, None, False)
+
+    assert gemini_quota._try_acquire(MODEL, 1, "late") == pytest.approx(1.0)  # One request per second at 60 RPM
+    clock.sleep(1.0)
+    assert gemini_quota._try_acquire(MODEL, 1, "late") == 0
+
+
+def test_token_bucket_waits_for_the_shortfall_and_settles_actual_usage(clock):
+    assert gemini_quota._try_acquire(MODEL, 5000, "a") == 0
+    assert gemini_quota._try_acquire(MODEL, 5000, "b") == pytest.approx(40.0)  # 4000 tokens short at 100/s
+
+    gemini_quota._release(MODEL, "a", 5000, 1000, False)  # Only 1000 were really used
+    assert gemini_quota._try_acquire(MODEL, 5000, "b") == 0
+
+
+def test_concurrency_limit_blocks_extra_slots(clock):
+    for i in range(4):  # Starting limit
+        assert gemini_quota._try_acquire(MODEL, 1, f"s{i}") == 0
+    assert gemini_quota._try_acquire(MODEL, 1, "extra") == gemini_quota.MAX_WAIT_SLICE
+    clock.sleep(gemini_quota.STALE_SLOT_SECONDS)
+    assert gemini_quota._try_acquire(MODEL, 1, "extra") == 0  # Crashed holders' slots expire
+
+
+def test_aimd_adds_on_success_and_halves_on_429(clock):
+    gemini_quota._try_acquire(MODEL, 1, "a")
+    gemini_quota._release(MODEL, "a", 1, None, False)
+    assert limit() == pytest.approx(4.25)
+
+    gemini_quota._release(MODEL, "a", 1, None, True)
+    assert limit() == pytest.approx(2.125)
+    for _ in range(3):
+        gemini_quota._release(MODEL, "a", 1, None, True)
+    assert limit() == gemini_quota.MIN_CONCURRENCY
+
+    for _ in range(200):
+        gemini_quota._release(MODEL, "a", 1, None, False)
+    assert limit() == gemini_quota.MAX_CONCURRENCY
+
+
+def test_a_429_raises_rate_limited_and_starts_a_cooldown(clock):
+    def quota_exhausted():
+        raise RuntimeError("429 RESOURCE_EXHAUSTED")
+
+    with pytest.raises(gemini_quota.RateLimited):
+        gemini_quota.call(MODEL, 10, quota_exhausted)
+    assert limit() == pytest.approx(2.0)
+    assert gemini_quota._try_acquire(MODEL, 10, "next") == pytest.approx(gemini_quota.COOLDOWN_SECONDS)
+
+
+def test_other_errors_are_not_rate_limits(clock):
+    def broken():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        gemini_quota.call(MODEL, 10, broken, retries=3)
+    assert limit() == pytest.approx(4.25)
+
+
+def test_retry_waits_out_the_cooldown(clock):
+    attempts = []
+
+    def flaky():
+        attempts.append(clock.now)
+        if len(attempts) == 1:
+            raise RuntimeError("429")
+        return "ok"
+
+    assert gemini_quota.call(MODEL, 10, flaky, retries=1) == "ok"
+    assert attempts[1] - attempts[0] >= gemini_quota.COOLDOWN_SECONDS
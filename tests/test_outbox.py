@@ -0,0 +1,110 @@
+import time
+import sqlite3
+import pytest
+import outbox
+
+
+@pytest.fixture(autouse=True)
+def outbox_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_PATH", str(tmp_path / "state" / "outbox.db"))
+
+
+def payload(video_id, impact=1.0):
+    return {"video_id": video_id, "impact_score": impact, "created_at": "2026-01-01T00:00:00"}
+
+
+def seed_video(store, video_id):
+    store.table("videos").insert({"id": video_id, "caption": "c", "is_analyzed": False}).execute()
+
+
+def test_same_video_and_caption_share_one_key():
+    assert outbox.make_key("v1", "caption") == outbox.make_key("v1", "caption")
+    assert outbox.make_key("v1", "caption") != outbox.make_key("v1", "edited caption")
+    assert outbox.make_key("v1", "caption") != outbox.make_key("v2", "caption")
+
+
+def test_enqueue_twice_flushes_one_row(store):
+    seed_video(store, "v1")
+    first = outbox.enqueue("v1", "caption", payload("v1"))
+    second = outbox.enqueue("v1", "caption", payload("v1"))
+
+    assert first == second
+    assert outbox.stats()["depth"] == 1
+    assert outbox.flush(store) == 1
+    assert outbox.flush(store) == 0
+
+    rows = store.table("sentiment_logs").select("idempotency_key").execute().data
+    assert [r["idempotency_key"] for r in rows] == [first]
+    assert store.table("videos").select("is_analyzed").eq("id", "v1").execute().data == [{"is_analyzed": True}]
+
+
+def test_replayed_flush_does_not_double_insert(store):
+    seed_video(store, "v1")
+    key = outbox.enqueue("v1", "caption", payload("v1"))
+    outbox.flush(store)
+    # A crash between the upsert and marking the row flushed: the row is sent again
+    with outbox._connect() as conn:
+        conn.execute("UPDATE outbox SET flushed_at = NULL WHERE idempotency_key = ?", (key,))
+    assert outbox.flush(store) == 1
+    assert len(store.table("sentiment_logs").select("id").execute().data) == 1
+
+
+def test_failed_flush_keeps_rows_pending():
+    class Down:
+        def table(self, name):
+            raise ConnectionError("supabase down")
+
+    outbox.enqueue("v1", "caption", payload("v1"))
+    assert outbox.flush(Down()) == 0
+    s = outbox.stats()
+    assert s["depth"] == 1
+    assert s["flush_errors"] >= 1
+
+
+def test_has_result_outlives_pruned_rows(store, monkeypatch):
+    seed_video(store, "v1")
+    outbox.enqueue("v1", "caption", payload("v1"))
+    outbox.flush(store)
+
+    outbox.prune(now=time.time() + (outbox.FLUSHED_TTL_DAYS + 1) * 86400)
+    with outbox._connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0] == 0
+    assert outbox.has_result("v1", "caption")
+
+    outbox.prune(now=time.time() + (outbox.CLASSIFIED_TTL_DAYS + 1) * 86400)
+    assert not outbox.has_result("v1", "caption")
+
+
+def test_prune_never_drops_pending_rows():
+    outbox.enqueue("v1", "caption", payload("v1"))
+    outbox.prune(now=time.time() + 365 * 86400)
+    assert outbox.stats()["depth"] == 1
+
+
+def test_lookup_tables_are_capped(monkeypatch):
+    monkeypatch.setattr(outbox, "MAX_CLASSIFIED", 3)
+    for i in range(5):
+        outbox.cache_classification(f"caption {i}", {"n": i})
+    outbox.prune()
+    assert outbox.cached_classification("caption 4") == {"n": 4}
+    assert outbox.cached_classification("caption 0") is None
+
+
+def test_every_call_closes_its_connection(monkeypatch):
+    opened = []
+    connect = sqlite3.connect
+
+    def tracked(*args, **kwargs):
+        opened.append(connect(*args, **kwargs))
+        return opened[-1]
+    monkeypatch.setattr(sqlite3, "connect", tracked)
+
+    outbox.enqueue("v1", "caption", {"topic": "t"})
+    outbox.has_result("v1", "caption")
+    outbox.prune()
+    outbox.stats()
+
+    assert opened
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
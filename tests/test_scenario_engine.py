@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+import scenario_engine
+
+ARCHETYPES = ["Heartland Conservative", "Economic Pragmatist", "Urban Reformist", "Digital Cynic"]
+
+
+def make_rows(n=400, seed=1):
+    rng = np.random.default_rng(seed)
+    return [{
+        "sentiment": int(rng.choice([-2, -1, 0, 1, 2])),
+        "archetype": str(rng.choice(ARCHETYPES)),
+        "topic": str(rng.choice(["Economic Anxiety", "Identity Politics"])),
+        "is_3r": bool(rng.random() < 0.1),
+        "velocity_score": float(rng.choice([10, 900])),
+        "score_version": 1,
+    } for _ in range(n)]
+
+
+@pytest.fixture
+def baseline():
+    return scenario_engine.build_baseline(make_rows())
+
+
+def test_baseline_bootstrap_is_centered_on_the_observed_score(baseline):
+    observed = scenario_engine.observed_nts(baseline)
+    nts, _ = scenario_engine.simulate(baseline, {"name": "Baseline"}, trials=4000, workers=2, seed=7)
+    summary = scenario_engine.summarize(nts, np.zeros(len(nts)), observed)
+    assert len(nts) == 4000
+    assert summary["nts_bands"]["p50"] == pytest.approx(observed, abs=0.03)
+    assert summary["nts_bands"]["p5"] < observed < summary["nts_bands"]["p95"]
+
+
+def test_certain_flip_negates_every_trial(baseline):
+    flip_all = {"name": "All flip", "flip": {"archetype": {a: 1.0 for a in ARCHETYPES}}}
+    base, _ = scenario_engine.simulate(baseline, {"name": "Baseline"}, trials=500, workers=1, seed=3)
+    flipped, _ = scenario_engine.simulate(baseline, flip_all, trials=500, workers=1, seed=3)
+    np.testing.assert_allclose(flipped, -base)
+
+
+@pytest.mark.parametrize("target", [0.0, 0.25, 0.6])
+def test_r3_share_reaches_its_target(baseline, target):
+    compiled = scenario_engine.compile_scenario(baseline, {"r3_share": {"all": target}})
+    r3 = baseline["is_3r"]
+    share = (compiled["p"] * np.where(r3, 1 - compiled["switch"], compiled["switch"])).sum()
+    assert share == pytest.approx(target)
+
+
+def test_r3_share_per_topic_leaves_other_topics_alone(baseline):
+    compiled = scenario_engine.compile_scenario(baseline, {"r3_share": {"topic": {"Identity Politics": 0.9}}})
+    assert not compiled["switch"][baseline["topic"] == "Economic Anxiety"].any()
+    assert compiled["switch"][(baseline["topic"] == "Identity Politics") & ~baseline["is_3r"]].min() > 0
+
+
+def test_volume_shock_reweights_cells(baseline):
+    compiled = scenario_engine.compile_scenario(baseline, {"volume": {"topic": {"Economic Anxiety": 2.0}}})
+    economy = baseline["topic"] == "Economic Anxiety"
+    share = baseline["count"][economy].sum() / baseline["count"].sum()
+    assert compiled["p"][economy].sum() == pytest.approx(2 * share / (1 + share))
+
+
+def test_results_round_trip_for_the_dashboard(tmp_path):
+    path = str(tmp_path / "scenarios.json")
+    assert scenario_engine.load_results(path) is None
+
+    results = scenario_engine.run_scenarios(make_rows(100), scenario_engine.DEFAULT_SCENARIOS, trials=200, workers=1)
+    scenario_engine.save_results(results, path)
+    rows = scenario_engine.summary_rows(scenario_engine.load_results(path))
+    assert [r["Scenario"] for r in rows] == ["Baseline"] + [s["name"] for s in scenario_engine.DEFAULT_SCENARIOS]
+    assert rows[0]["NTS p5"] <= rows[0]["NTS p50"] <= rows[0]["NTS p95"]
@@ -0,0 +1,80 @@
+import os
+import json
+import pytest
+import scoring
+
+V1 = scoring.SCORING_VERSIONS[1]
+
+
+def row(i, sentiment, archetype, is_3r=False, velocity=None, version=1, impact=None):
+    if impact is None:
+        impact = scoring.impact_score(sentiment, archetype, is_3r, velocity, V1)
+    return {"id": i, "sentiment": sentiment, "archetype": archetype, "is_3r": is_3r,
+            "velocity_score": velocity, "impact_score": impact, "score_version": version}
+
+
+def test_legacy_virality_is_read_back_from_the_stored_impact():
+    fast = row(1, -2, "Heartland Conservative", True, velocity=V1["viral_threshold"] + 1)
+    slow = row(2, -2, "Heartland Conservative", True, velocity=V1["viral_threshold"] - 1)
+    positive = row(3, 1, "Unknown Archetype", velocity=10_000)
+    for r in (fast, slow, positive):
+        r["velocity_score"] = None  # Scored before velocity_score was stored
+
+    assert scoring.viral_flags([fast, slow, positive]).tolist() == [True, False, True]
+    rescored = scoring.rescore_rows([fast, slow, positive], V1, 1)
+    assert [r["impact_score"] for r in rescored] == pytest.approx([fast["impact_score"], slow["impact_score"], positive["impact_score"]])
+
+
+def test_stored_velocity_wins_over_inference():
+    r = row(1, -1, "Digital Cynic", velocity=V1["viral_threshold"] + 1, impact=0.0)
+    assert scoring.viral_flags([r]).tolist() == [True]
+
+
+def test_vectorized_scores_match_the_scalar_formula():
+    rows = [row(i, s, a, r, v) for i, (s, a, r, v) in enumerate([
+        (-2, "Heartland Conservative", True, 900), (1, "Urban Reformist", False, 10), (-1, None, False, 600)])]
+    rescored = scoring.rescore_rows(rows, V1, 1)
+    assert [r["impact_score"] for r in rescored] == pytest.approx([r["impact_score"] for r in rows])
+
+
+def test_rescore_writes_only_rows_that_changed(store, monkeypatch):
+    rows = [row(i, -1, "Economic Pragmatist", velocity=10) for i in range(1, 4)]
+    rows[0]["impact_score"] = 99.0  # Stale score on the current version
+    store.table("sentiment_logs").insert(rows).execute()
+
+    written = []
+    query_cls = type(store.table("sentiment_logs"))
+    original = query_cls.upsert
+
+    def spy(self, data, **kwargs):
+        written.extend(data)
+        return original(self, data, **kwargs)
+    monkeypatch.setattr(query_cls, "upsert", spy)
+
+    assert scoring.rescore(store, full=False, page_size=2) == (0, 0)
+    assert scoring.rescore(store, full=True, page_size=2) == (1, 1)
+    assert [r["id"] for r in written] == [1]
+    assert store.table("sentiment_logs").select("impact_score").eq("id", 1).execute().data[0]["impact_score"] == pytest.approx(-1.5)
+
+
+def test_version_bump_rescores_history_and_drops_rollup_days(store, monkeypatch):
+    v2 = json.loads(json.dumps(V1))
+    v2["archetype_weights"]["Digital Cynic"] = 1.0
+    monkeypatch.setitem(scoring.SCORING_VERSIONS, 2, v2)
+
+    store.table("sentiment_logs").insert([
+        row(1, -1, "Digital Cynic", velocity=10),
+        row(2, -1, "Urban Reformist", velocity=10),
+    ]).execute()
+    rollup = {"days": {"2026-01-05": {"count": 2}}, "last_id": 2}
+    os.makedirs(os.path.dirname(scoring.ROLLUP_PATH), exist_ok=True)
+    with open(scoring.ROLLUP_PATH, "w", encoding="utf-8") as f:
+        json.dump(rollup, f)
+
+    assert scoring.rescore(store, version=2) == (2, 1)  # Both move to v2, only the Cynic's score changes
+    data = store.table("sentiment_logs").select("id, impact_score, score_version").order("id").execute().data
+    assert [r["score_version"] for r in data] == [2, 2]
+    assert [r["impact_score"] for r in data] == pytest.approx([-1.0, -1.0])
+    assert scoring.rescore(store, version=2) == (0, 0)
+    with open(scoring.ROLLUP_PATH, encoding="utf-8") as f:
+        assert json.load(f)["days"] == {}
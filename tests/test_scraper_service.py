@@ -0,0 +1,150 @@
+import os
+import tempfile
+import threading
+import pytest
+import storage
+import tracking_profiles
+from fake_apify import FakeApifyClient
+
+pytest.importorskip("dotenv")
+pytest.importorskip("apify_client")
+# scraper_service checks the token and connects at import: a dummy token and a throwaway local store
+with pytest.MonkeyPatch.context() as mp:
+    mp.setenv("APIFY_TOKEN", "test-token")
+    mp.setattr(storage, "STORAGE_BACKEND", "sqlite")
+    mp.setattr(storage, "LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "import.db"))
+    import scraper_service
+
+PROFILE = tracking_profiles._normalize({
+    "name": "test_profile",
+    "queries": {"en": ["q1", "q2"], "ms": ["q3"]},
+    "sampling": {"topAuthors": 0},
+}, "test")
+
+
+def item(video_id, query, views=100, caption="caption"):
+    return {"id": video_id, "searchQuery": query, "playCount": views, "text": caption,
+            "createTimeISO": "2026-01-05T10:00:00", "authorMeta": {"name": "alice"}}
+
+
+class CountingClient(FakeApifyClient):
+    """Records the most actor runs ever in flight at once."""
+
+    def __init__(self, items, query_latency=0.0):
+        super().__init__(items, query_latency)
+        self.active = 0
+        self.peak = 0
+        self._count_lock = threading.Lock()
+
+    def _start_run(self, queries):
+        with self._count_lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            return super()._start_run(queries)
+        finally:
+            with self._count_lock:
+                self.active -= 1
+
+
+def test_overlapping_shards_are_deduped_and_streamed():
+    items = [item("v1", "q1"), item("v1", "q2"), item("v2", "q2"), item("v3", "q3"), item("v3", "q1")]
+    client = FakeApifyClient(items)
+    batches = []
+
+    merged = scraper_service.run_scraper_sharded(on_items=batches.append, profile=PROFILE, shard_mode="query", client=client)
+
+    assert sorted(i["id"] for i in merged) == ["v1", "v2", "v3"]
+    assert sorted(map(tuple, client.runs)) == [("q1",), ("q2",), ("q3",)]
+    streamed = [i["id"] for batch in batches for i in batch]
+    assert sorted(streamed) == ["v1", "v2", "v3"]  # Every video streamed exactly once
+    assert all(batches)  # No empty batches
+
+
+def test_language_shards_are_one_run_per_group():
+    client = FakeApifyClient([item("v1", "q1"), item("v2", "q3")])
+    merged = scraper_service.run_scraper_sharded(profile=PROFILE, shard_mode="language", client=client)
+    assert sorted(map(tuple, client.runs)) == [("q1", "q2"), ("q3",)]
+    assert len(merged) == 2
+
+
+def test_max_concurrent_runs_is_respected():
+    profile = tracking_profiles._normalize({
+        "name": "wide", "queries": {"all": [f"q{i}" for i in range(8)]}, "sampling": {"topAuthors": 0},
+    }, "test")
+    client = CountingClient([], query_latency=0.05)
+    scraper_service.run_scraper_sharded(profile=profile, shard_mode="query", max_concurrent=3, client=client)
+    assert len(client.runs) == 8
+    assert client.peak == 3
+
+
+def test_dedupe_items_drops_missing_and_seen_ids():
+    seen = {"v1"}
+    fresh = scraper_service.dedupe_items([{"id": "v1"}, {"video_id": "v2"}, {}, {"id": "v2"}], seen)
+    assert fresh == [{"video_id": "v2"}]
+    assert seen == {"v1", "v2"}
+
+
+@pytest.fixture
+def videos(store, monkeypatch):
+    monkeypatch.setattr(scraper_service, "supabase", store)
+    monkeypatch.setattr(scraper_service, "CHANGE_DETECTION", True)
+    monkeypatch.setattr(scraper_service, "ingest_stats", scraper_service.defaultdict(scraper_service.Counter))
+
+    def rows():
+        data = store.table("videos").select("id, is_analyzed, views, caption_hash").order("id").execute().data
+        return {r["id"]: r for r in data}
+    return rows
+
+
+def mark_analyzed(store, *video_ids):
+    store.table("videos").update({"is_analyzed": True}).in_("id", list(video_ids)).execute()
+
+
+def test_unchanged_caption_keeps_is_analyzed(store, videos):
+    scraper_service.save_results([item("v1", "q1", views=100)], PROFILE)
+    mark_analyzed(store, "v1")
+
+    scraper_service.save_results([item("v1", "q1", views=500)], PROFILE)
+    row = videos()["v1"]
+    assert row["is_analyzed"] is True
+    assert row["views"] == 500  # Metrics still refresh
+
+
+def test_edited_caption_requeues(store, videos):
+    scraper_service.save_results([item("v1", "q1", caption="before")], PROFILE)
+    mark_analyzed(store, "v1")
+
+    scraper_service.save_results([item("v1", "q1", caption="after")], PROFILE)
+    assert videos()["v1"]["is_analyzed"] is False
+    assert scraper_service.ingest_stats["test_profile"]["changed"] == 1
+
+
+def test_legacy_rows_without_a_hash_requeue_once(store, videos):
+    store.table("videos").insert([
+        {"id": "same", "caption": "caption", "is_analyzed": True},
+        {"id": "edited", "caption": "old caption", "is_analyzed": True},
+    ]).execute()
+
+    batch = [item("same", "q1"), item("edited", "q1", caption="new caption")]
+    scraper_service.save_results(batch, PROFILE)
+    rows = videos()
+    # The stored caption stands in for the missing hash: only a real edit re-queues
+    assert rows["same"]["is_analyzed"] is True
+    assert rows["edited"]["is_analyzed"] is False
+    assert rows["same"]["caption_hash"] and rows["edited"]["caption_hash"]
+
+    mark_analyzed(store, "edited")
+    scraper_service.save_results(batch, PROFILE)
+    assert all(r["is_analyzed"] for r in videos().values())  # Hash backfilled: no second re-queue
+
+
+def test_avoided_counts_only_already_analyzed_videos(store, videos):
+    scraper_service.save_results([item("done", "q1"), item("waiting", "q1")], PROFILE)
+    mark_analyzed(store, "done")
+
+    scraper_service.save_results([item("done", "q1"), item("waiting", "q1"), item("fresh", "q1")], PROFILE)
+    counts = scraper_service.ingest_stats["test_profile"]
+    assert counts["avoided"] == 1
+    assert counts["unchanged"] == 1
+    assert counts["new"] == 3  # Two on the first save, one on the second
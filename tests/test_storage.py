@@ -0,0 +1,117 @@
+import sqlite3
+import threading
+import pytest
+import storage
+
+
+def seed(store):
+    store.table("videos").insert([
+        {"id": "a", "views": 10, "profile": "p1", "is_analyzed": False, "created_at": "2026-01-01T00:00:00"},
+        {"id": "b", "views": 30, "profile": "p1", "is_analyzed": True, "created_at": "2026-01-02T00:00:00Z"},
+        {"id": "c", "views": 20, "profile": "p2", "is_analyzed": False, "created_at": "2026-01-03T08:00:00+08:00"},
+    ]).execute()
+
+
+def ids(query):
+    return [r["id"] for r in query.execute().data]
+
+
+def test_comparison_filters(store):
+    seed(store)
+    videos = lambda: store.table("videos").select("id").order("id")
+    assert ids(videos().eq("profile", "p1")) == ["a", "b"]
+    assert ids(videos().neq("profile", "p1")) == ["c"]
+    assert ids(videos().gt("views", 10)) == ["b", "c"]
+    assert ids(videos().gte("views", 20).lte("views", 20)) == ["c"]
+    assert ids(videos().lt("views", 20)) == ["a"]
+    assert ids(videos().in_("id", ["a", "c", "zzz"])) == ["a", "c"]
+    assert ids(videos().in_("id", [])) == []
+
+
+def test_boolean_filters_and_values(store):
+    seed(store)
+    rows = store.table("videos").select("id, is_analyzed").eq("is_analyzed", False).order("id").execute().data
+    assert rows == [{"id": "a", "is_analyzed": False}, {"id": "c", "is_analyzed": False}]
+
+
+def test_or_filter_with_null(store):
+    seed(store)
+    store.table("videos").update({"claimed_by": "w"}).eq("id", "a").execute()
+    query = store.table("videos").select("id").or_("claimed_by.is.null,views.gt.25").order("id")
+    assert ids(query) == ["b", "c"]
+
+
+def test_timestamps_compare_as_utc(store):
+    seed(store)
+    # "2026-01-03T08:00:00+08:00" is midnight UTC on the 3rd
+    response = store.table("videos").select("id, created_at").gte("created_at", "2026-01-02T12:00:00Z").execute()
+    assert response.data == [{"id": "c", "created_at": "2026-01-03T00:00:00.000000"}]
+
+
+def test_order_range_and_limit(store):
+    seed(store)
+    assert ids(store.table("videos").select("id").order("views", desc=True).limit(2)) == ["b", "c"]
+    assert ids(store.table("videos").select("id").order("views").range(1, 2)) == ["c", "b"]
+
+
+def test_unknown_columns_are_added_on_write_and_read_back_as_none(store):
+    store.table("videos").insert({"id": "a", "brand_new": {"k": [1, 2]}}).execute()
+    row = store.table("videos").select("id, brand_new, never_written").execute().data[0]
+    assert row == {"id": "a", "brand_new": {"k": [1, 2]}, "never_written": None}
+
+
+def test_upsert_on_a_unique_key_updates_in_place(store):
+    rows = [{"idempotency_key": "k1", "impact_score": 1.0}]
+    store.table("sentiment_logs").upsert(rows, on_conflict="idempotency_key").execute()
+    store.table("sentiment_logs").upsert([{"idempotency_key": "k1", "impact_score": 2.0}], on_conflict="idempotency_key").execute()
+    data = store.table("sentiment_logs").select("id, impact_score").execute().data
+    assert len(data) == 1 and data[0]["impact_score"] == 2.0
+
+
+def test_insert_duplicate_key_raises(store):
+    seed(store)
+    with pytest.raises(sqlite3.IntegrityError):
+        store.table("videos").insert({"id": "a"}).execute()
+
+
+def test_conditional_update_returns_only_matched_rows(store):
+    seed(store)
+    response = store.table("videos").update({"claimed_by": "w1"}).in_("id", ["a", "b", "c"]).eq("is_analyzed", False).execute()
+    assert sorted(r["id"] for r in response.data) == ["a", "c"]
+    assert all(r["claimed_by"] == "w1" for r in response.data)
+    assert store.table("videos").update({"claimed_by": "w2"}).eq("id", "missing").execute().data == []
+
+
+def test_conditional_update_is_exclusive_across_threads(store):
+    store.table("videos").insert([{"id": f"v{i}", "is_analyzed": False} for i in range(50)]).execute()
+    won = {}
+
+    def worker(name):
+        won[name] = ids(store.table("videos").update({"claimed_by": name}).or_("claimed_by.is.null"))
+
+    threads = [threading.Thread(target=worker, args=(f"w{n}",)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    claimed = [i for rows in won.values() for i in rows]
+    assert sorted(claimed) == sorted(f"v{i}" for i in range(50))
+
+
+def test_older_database_files_get_added_columns(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE comments (id TEXT PRIMARY KEY, video_id TEXT, text TEXT, like_count INTEGER, "
+                 "author_handle TEXT, created_at TIMESTAMP, profile TEXT, is_analyzed BOOLEAN DEFAULT 0)")
+    conn.commit()
+    conn.close()
+
+    store = storage.LocalStore(path)
+    store.table("comments").insert({"id": "c1", "is_analyzed": False}).execute()
+    assert store.table("comments").select("id, attempts").lt("attempts", 3).execute().data == [{"id": "c1", "attempts": 0}]
+
+
+def test_connect_rejects_unknown_backends():
+    with pytest.raises(ValueError):
+        storage.connect("postgres")
@@ -0,0 +1,80 @@
+from datetime import datetime, timezone
+import pytest
+import trust_metrics
+
+HOUR = 3600
+NOW = datetime(2026, 1, 10, 12, 30, tzinfo=timezone.utc).timestamp()
+
+
+def iso(hours_ago):
+    return datetime.fromtimestamp(NOW - hours_ago * HOUR, tz=timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def test_window_counts_only_rows_inside_it():
+    metrics = trust_metrics.TrustMetrics()
+    metrics.add(iso(1), -2.0)
+    metrics.add(iso(30), 1.0)
+    metrics.add(iso(100), 4.0)
+
+    day = metrics.window("24H", NOW)
+    assert day["count"] == 1
+    assert day["avg_impact"] == pytest.approx(-2.0)
+    assert day["resistance_pct"] == pytest.approx(100.0)
+    assert metrics.window("48H", NOW)["count"] == 2
+    assert metrics.window("7D", NOW)["count"] == 3
+
+
+def test_between_is_the_slice_of_two_windows():
+    metrics = trust_metrics.TrustMetrics()
+    metrics.add(iso(1), -1.0)
+    metrics.add(iso(30), 3.0)
+    yesterday = metrics.between("24H", "48H", NOW)
+    assert yesterday["count"] == 1
+    assert yesterday["avg_impact"] == pytest.approx(3.0)
+
+
+def test_rows_expire_as_time_moves_on():
+    metrics = trust_metrics.TrustMetrics()
+    metrics.add(iso(1), 1.0)
+    assert metrics.window("24H", NOW)["count"] == 1
+    assert metrics.window("24H", NOW + 24 * HOUR)["count"] == 0
+    assert metrics.window("48H", NOW + 24 * HOUR)["count"] == 1
+
+
+def test_empty_window():
+    assert trust_metrics.TrustMetrics().window("24H", NOW) == {"count": 0, "avg_impact": 0.0, "resistance_pct": 0.0, "consensus_pct": 0.0}
+
+
+def test_snapshot_round_trip(tmp_path):
+    metrics = trust_metrics.TrustMetrics()
+    metrics.add(iso(2), -1.0, key="k1")
+    metrics.add(iso(50), 2.0)
+    path = str(tmp_path / "m.npz")
+    metrics.save(path)
+
+    loaded = trust_metrics.TrustMetrics.load(path)
+    for name in ("24H", "3D", "90D"):
+        assert loaded.window(name, NOW) == metrics.window(name, NOW)
+    assert loaded.local_keys == {"k1"}
+
+
+def test_load_or_rebuild_tops_up_rows_written_elsewhere(store, tmp_path):
+    path = str(tmp_path / "m.npz")
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    store.table("sentiment_logs").insert({"created_at": now.isoformat(), "impact_score": 1.0, "idempotency_key": "a"}).execute()
+    assert trust_metrics.load_or_rebuild(store, path).window("24H")["count"] == 1
+
+    # This process counted "b" before the outbox flushed it; another host wrote "c"
+    metrics = trust_metrics.TrustMetrics.load(path)
+    metrics.add(now.isoformat(), -1.0, key="b")
+    metrics.save(path)
+    store.table("sentiment_logs").insert([
+        {"created_at": now.isoformat(), "impact_score": -1.0, "idempotency_key": "b"},
+        {"created_at": now.isoformat(), "impact_score": 2.0, "idempotency_key": "c"},
+    ]).execute()
+
+    metrics = trust_metrics.load_or_rebuild(store, path)
+    assert metrics.window("24H")["count"] == 3
+    assert metrics.window("24H")["avg_impact"] == pytest.approx(2.0 / 3)
+    assert metrics.local_keys == set()
+    assert trust_metrics.load_or_rebuild(store, path).window("24H")["count"] == 3
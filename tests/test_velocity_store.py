@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+import velocity_store
+from velocity_store import SnapshotStore
+
+HOUR = 3600
+DAY = 86400
+NOW = 1_767_000_000
+
+
+def test_velocity_over_the_recent_window():
+    store = SnapshotStore()
+    store.append(["a", "b"], [100, 50], ts=NOW - 12 * HOUR)
+    store.append(["a", "b"], [700, 50], ts=NOW - 6 * HOUR)
+    store.append(["a", "b"], [1900, 40], ts=NOW)
+
+    velocity, acceleration = store.velocity(["a", "b", "unseen"])
+    assert velocity[0] == pytest.approx(200.0)
+    assert velocity[1] == 0.0  # Counts going down never read as negative reach
+    assert np.isnan(velocity[2])
+    # 100/hr over the window before, 200/hr now, over 6h on average
+    assert acceleration[0] == pytest.approx(100 / 6)
+
+
+def test_a_single_snapshot_has_no_velocity():
+    store = SnapshotStore()
+    store.append(["a"], [100], ts=NOW)
+    velocity, acceleration = store.velocity(["a"])
+    assert np.isnan(velocity[0]) and np.isnan(acceleration[0])
+
+
+def test_duplicates_in_one_batch_keep_the_last_count():
+    store = SnapshotStore()
+    store.append(["a", "a"], [100, 200], ts=1000)
+    assert len(store) == 1
+    assert store.views.tolist() == [200]
+    velocity, _ = store.velocity(["a"])
+    assert np.isnan(velocity[0])
+
+
+def test_snapshots_sharing_a_timestamp_never_give_infinite_rates():
+    store = SnapshotStore()
+    store.append(["a"], [100], ts=1000)
+    store.append(["a"], [200], ts=1000)
+    velocity, acceleration = store.velocity(["a"])
+    assert not np.isinf(velocity).any() and not np.isinf(acceleration).any()
+
+
+def test_compact_downsamples_old_days_and_drops_stale_videos():
+    store = SnapshotStore()
+    for h in range(0, 72, 6):
+        store.append(["a"], [h * 10], ts=NOW - h * HOUR)
+    store.append(["old"], [5], ts=NOW - (velocity_store.RETENTION_DAYS + 1) * DAY)
+    store.compact(now=NOW)
+
+    assert store.ids == ["a"]
+    recent = store.ts >= NOW - velocity_store.FULL_RES_HOURS * HOUR
+    old_days = store.ts[~recent] // DAY
+    assert len(old_days) == len(set(old_days.tolist()))
+    assert recent.sum() == 9  # Every snapshot in the last 48h kept
+    assert (np.diff(store.ts) > 0).all()
+
+
+def test_compact_caps_history_per_video():
+    store = SnapshotStore()
+    for i in range(velocity_store.MAX_SNAPSHOTS_PER_VIDEO + 10):
+        store.append(["a"], [i], ts=NOW - i * 60)
+    store.compact(now=NOW)
+    assert len(store) == velocity_store.MAX_SNAPSHOTS_PER_VIDEO
+    assert store.ts.max() == NOW
+
+
+def test_record_scrape_round_trips_through_the_file(tmp_path):
+    path = str(tmp_path / "snapshots.npz")
+    velocity_store.record_scrape(["a", "b", "a"], [1, 2, 3], path=path)
+    loaded = SnapshotStore.load(path)
+    assert sorted(loaded.ids) == ["a", "b"]
+    assert len(loaded) == 2
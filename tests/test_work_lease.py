@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+import lease_loadtest
+import work_lease
+
+
+def seed(store, n, **extra):
+    store.table("videos").insert([{"id": f"v{i}", "views": i, "is_analyzed": False, **extra} for i in range(n)]).execute()
+
+
+def test_a_leased_video_cannot_be_claimed_again(store):
+    seed(store, 3)
+    assert work_lease.claim(store, ["v0", "v1"], worker_id="a") == {"v0", "v1"}
+    assert work_lease.claim(store, ["v0", "v1", "v2"], worker_id="b") == {"v2"}
+    holders = {r["id"]: r["claimed_by"] for r in store.table("videos").select("id, claimed_by").execute().data}
+    assert holders == {"v0": "a", "v1": "a", "v2": "b"}
+
+
+def test_expired_leases_are_claimable(store):
+    expired = (datetime.now(timezone.utc) - timedelta(minutes=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    seed(store, 1, claimed_by="dead-worker", lease_expires_at=expired)
+    assert work_lease.claim(store, ["v0"], worker_id="b") == {"v0"}
+
+
+def test_analyzed_videos_are_never_claimed(store):
+    seed(store, 1)
+    store.table("videos").update({"is_analyzed": True}).eq("id", "v0").execute()
+    assert work_lease.claim(store, ["v0"], worker_id="a") == set()
+
+
+def test_release_only_gives_back_own_leases(store):
+    seed(store, 2)
+    work_lease.claim(store, ["v0"], worker_id="a")
+    work_lease.claim(store, ["v1"], worker_id="b")
+    work_lease.release(store, ["v0", "v1"], worker_id="a")
+    assert work_lease.claim(store, ["v0", "v1"], worker_id="c") == {"v0"}
+
+
+def test_claim_ranked_backfills_rows_lost_to_other_workers(store):
+    seed(store, 6)
+    candidates = [{"id": f"v{i}"} for i in range(6)]
+    work_lease.claim(store, ["v0", "v2"], worker_id="other")
+
+    claimed, lost = work_lease.claim_ranked(store, candidates, 3, worker_id="me")
+    assert [c["id"] for c in claimed] == ["v1", "v3", "v4"]
+    assert lost == 2
+
+
+def test_worker_processes_never_share_a_video():
+    assert lease_loadtest.scenario(videos=300, workers=4, work_ms=0)
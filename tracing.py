@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import functools
+from contextlib import nullcontext
+
+# SPAN TRACING
+# Wrap stages and network calls in span("name") / @traced("name"). With
+# TRACE=1 every span becomes a Chrome trace event (open the JSON in
+# chrome://tracing or ui.perfetto.dev) and a per-stage summary table is
+# printed when the process exits. With tracing off, span() hands back one
+# shared no-op context and @traced returns the function untouched.
+
+TRACE_ENABLED = os.getenv("TRACE") == "1"
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+
+_NULL_SPAN = nullcontext()
+_events = []
+_pid = os.getpid()
+_origin = time.perf_counter()
+_wall_origin = time.time()
+
+
+class _Span:
+    __slots__ = ("name", "cat", "args", "start")
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        event = {
+            "name": self.name,
+            "cat": self.cat,
+            "ph": "X",
+            "ts": (self.start - _origin) * 1e6,
+            "dur": (end - self.start) * 1e6,
+            "pid": _pid,
+            "tid": threading.get_ident(),
+        }
+        if exc_type is not None:
+            self.args = dict(self.args or {}, error=exc_type.__name__)
+        if self.args:
+            event["args"] = self.args
+        _events.append(event)  # list.append is atomic, no lock needed
+        return False
+
+
+def span(name, cat="stage", **args):
+    """Context manager timing one stage / call. cat: "stage", "net" or "local"."""
+    if not TRACE_ENABLED:
+        return _NULL_SPAN
+    return _Span(name, cat, args)
+
+
+def traced(name=None, cat="stage"):
+    """Decorator form of span(). A no-op (returns func itself) when tracing is off."""
+    def wrap(func):
+        if not TRACE_ENABLED:
+            return func
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def inner(*a, **kw):
+            with _Span(label, cat, None):
+                return func(*a, **kw)
+        return inner
+    return wrap
+
+
+def export(path=None):
+    """Write collected spans as Chrome trace-event JSON. Returns the path."""
+    if path is None:
+        script = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+        path = os.path.join(TRACE_DIR, f"{script}-{time.strftime('%Y%m%dT%H%M%S', time.gmtime(_wall_origin))}.json")
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": list(_events), "displayTimeUnit": "ms",
+                   "otherData": {"argv": sys.argv, "started_at": _wall_origin}}, f)
+    return path
+
+
+def summary():
+    """Per-span totals: {name: {"cat", "count", "total_ms", "max_ms"}}, slowest first."""
+    rows = {}
+    for e in list(_events):
+        row = rows.setdefault(e["name"], {"cat": e["cat"], "count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        ms = e["dur"] / 1000
+        row["count"] += 1
+        row["total_ms"] += ms
+        row["max_ms"] = max(row["max_ms"], ms)
+    return dict(sorted(rows.items(), key=lambda kv: kv[1]["total_ms"], reverse=True))
+
+
+def report():
+    wall_ms = (time.perf_counter() - _origin) * 1000
+    print(f"\n🧭 TRACE SUMMARY (wall {wall_ms / 1000:.1f}s)")
+    print(f"{'span':<36}{'cat':<7}{'count':>7}{'total s':>10}{'mean ms':>10}{'max ms':>10}{'% wall':>8}")
+    for name, row in summary().items():
+        print(f"{name[:35]:<36}{row['cat']:<7}{row['count']:>7}{row['total_ms'] / 1000:>10.2f}"
+              f"{row['total_ms'] / row['count']:>10.1f}{row['max_ms']:>10.1f}{row['total_ms'] / wall_ms * 100:>7.0f}%")
+
+
+def _flush_at_exit():
+    if _events:
+        report()
+        print(f"🧭 Trace written to {export()}")
+
+
+if TRACE_ENABLED:
+    atexit.register(_flush_at_exit)
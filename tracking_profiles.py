@@ -0,0 +1,109 @@
+import os
+import json
+import glob
+
+# TRACKING PROFILES
+# One JSON file per politician / issue in profiles/. Each profile carries its
+# own trilingual queries, sampling settings and output partition (the value
+# written to the 'profile' column of videos and sentiment_logs).
+# apify_config.json holds the shared actor settings (proxy, subtitles) that
+# every profile's run input starts from.
+# A query written as "@handle" is an author-level job (the actor's "profiles"
+# input) rather than a search; scraper_service adds the profile's top authors
+# from the author reach index that way.
+# Settings that change what Apify bills are explicit: comments are scraped only
+# when a profile sets sampling.commentsPerPage > 0 (never from apify_config.json),
+# and every run logs the billable settings it sends (describe_billing).
+
+PROFILES_DIR = os.getenv("PROFILES_DIR", "profiles")
+APIFY_CONFIG_PATH = os.getenv("APIFY_CONFIG_PATH", "apify_config.json")
+DEFAULT_PROFILE = os.getenv("DEFAULT_PROFILE", "anwar_ibrahim")
+
+DEFAULT_SAMPLING = {
+    "resultsPerPage": 50,
+    "maxItems": 50,
+    "sortType": 1,          # 1 = Recency (Fresh), 0 = Relevance
+    "candidatePool": 100,   # Unanalyzed videos fetched for velocity triage
+    "analyzeBatchSize": 20, # Videos classified per run (per profile, so no profile starves another)
+    "topAuthors": 5,        # Highest-reach authors scraped directly each run (0 = off)
+    "commentsPerPage": 0,   # Comments scraped per video (0 = off; Apify bills every comment)
+}
+
+# Keys in apify_config.json that are per-profile, not shared
+_PROFILE_OWNED_KEYS = {"searchQueries", "profiles", "resultsPerPage", "maxItems", "sortType", "scrapeComments", "commentsPerPage"}
+
+
+def _normalize(profile, source):
+    if not profile.get("name"):
+        raise ValueError(f"Profile in {source} is missing 'name'")
+    queries = profile.get("queries") or {}
+    if isinstance(queries, list):
+        queries = {"all": queries}
+    if not any(queries.values()):
+        raise ValueError(f"Profile '{profile['name']}' has no queries")
+    return {
+        "name": profile["name"],
+        "label": profile.get("label", profile["name"]),
+        "queries": queries,
+        "sampling": {**DEFAULT_SAMPLING, **profile.get("sampling", {})},
+        "maxConcurrentRuns": int(profile.get("maxConcurrentRuns", 2)),
+        "actorInput": profile.get("actorInput", {}),
+    }
+
+
+def load_profiles(names=None):
+    """All profiles in PROFILES_DIR (or just the named ones), sorted by name."""
+    profiles = []
+    for path in sorted(glob.glob(os.path.join(PROFILES_DIR, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            profile = _normalize(json.load(f), path)
+        if names and profile["name"] not in names:
+            continue
+        profiles.append(profile)
+    if names:
+        missing = set(names) - {p["name"] for p in profiles}
+        if missing:
+            raise ValueError(f"Unknown profiles: {', '.join(sorted(missing))}")
+    return profiles
+
+
+def load_profile(name=DEFAULT_PROFILE):
+    return load_profiles([name])[0]
+
+
+def all_queries(profile):
+    return [q for queries in profile["queries"].values() for q in queries]
+
+
+def shared_actor_settings():
+    """Actor settings common to every profile, from apify_config.json."""
+    if not os.path.exists(APIFY_CONFIG_PATH):
+        return {}
+    with open(APIFY_CONFIG_PATH, encoding="utf-8") as f:
+        config = json.load(f)
+    return {k: v for k, v in config.items() if k not in _PROFILE_OWNED_KEYS}
+
+
+def build_run_input(profile, queries):
+    """Actor input for one run: shared settings < profile sampling < profile overrides. "@handle" queries become author jobs."""
+    sampling = profile["sampling"]
+    authors = [q[1:] for q in queries if q.startswith("@")]
+    searches = [q for q in queries if not q.startswith("@")]
+    return {
+        **shared_actor_settings(),
+        "searchQueries": searches,
+        **({"profiles": authors} if authors else {}),
+        "resultsPerPage": sampling["resultsPerPage"],
+        "maxItems": sampling["maxItems"],
+        "sortType": sampling["sortType"],
+        "scrapeComments": sampling["commentsPerPage"] > 0,
+        **({"commentsPerPage": sampling["commentsPerPage"]} if sampling["commentsPerPage"] > 0 else {}),
+        **profile["actorInput"],
+    }
+
+
+def describe_billing(run_input):
+    """One line naming the run-input settings that drive Apify cost."""
+    comments = f"{run_input['commentsPerPage']} comments/video" if run_input.get("scrapeComments") else "comments off"
+    proxy = "Apify proxy" if (run_input.get("proxyConfiguration") or {}).get("useApifyProxy") else "no proxy"
+    return f"Billing: up to {run_input.get('maxItems')} items, {comments}, {proxy}"
@@ -0,0 +1,245 @@
+import os
+import time
+import threading
+from datetime import datetime, timezone
+import numpy as np
+
+# SLIDING-WINDOW TRUST METRICS
+# Hourly buckets in a ring buffer plus a running total per dashboard window.
+# Each sentiment_logs row touches one bucket and the window totals (O(1)),
+# each hour boundary subtracts the bucket that just fell out of every window,
+# so "Approval Score", "Anger Level" and the narrative score gaps are answered
+# without scanning rows.
+# The snapshot is reconciled with sentiment_logs on load: it remembers the highest
+# row id folded in and tops up everything above it, so rows written by other
+# hosts (or replayed late by an outbox) are counted. Rows this process adds
+# itself before they are flushed carry their idempotency key and are skipped
+# when the top-up reads them back.
+
+METRICS_PATH = os.getenv("TRUST_METRICS_PATH", os.path.join("state", "trust_metrics.npz"))
+
+BUCKET_SECONDS = 3600
+WINDOWS = {
+    "24H": 24,
+    "48H": 48,    # 24H..48H = "yesterday"
+    "3D": 72,
+    "7D": 168,
+    "8D": 192,    # 7D..8D = "same day last week"
+    "30D": 720,
+    "90D": 2160,
+}
+RING_SIZE = max(WINDOWS.values()) + 1
+
+# Bucket columns
+COUNT, IMPACT, ABS_IMPACT, NEG_IMPACT = range(4)
+
+# Ids become visible at commit, not insert: each top-up re-reads this many ids
+# below the watermark (rows already folded in are skipped)
+ID_LOOKBACK = 500
+
+
+def to_epoch(value):
+    """ISO string (naive = UTC) / datetime / number -> unix seconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class TrustMetrics:
+    def __init__(self):
+        self.buckets = np.zeros((RING_SIZE, 4))
+        self.head = None  # Hour number of the newest bucket
+        self.totals = {name: np.zeros(4) for name in WINDOWS}
+        self.last_id = None        # Highest sentiment_logs id folded in
+        self.recent_ids = set()    # Folded ids within ID_LOOKBACK of last_id
+        self.local_keys = set()    # Idempotency keys added locally, not read back yet
+        self.lock = threading.Lock()
+
+    # --- WRITES ---
+    def _advance(self, hour):
+        if self.head is None:
+            self.head = hour
+            return
+        if hour <= self.head:
+            return
+        if hour - self.head >= RING_SIZE:
+            # Long gap: everything expired
+            self.buckets[:] = 0
+            for total in self.totals.values():
+                total[:] = 0
+            self.head = hour
+            return
+        for h in range(self.head + 1, hour + 1):
+            for name, width in WINDOWS.items():
+                self.totals[name] -= self.buckets[(h - width) % RING_SIZE]
+            self.buckets[h % RING_SIZE] = 0
+        self.head = hour
+
+    def add(self, created_at, impact, key=None):
+        """
+        Fold one sentiment_logs row into the buckets and every window it belongs to.
+        key = the row's idempotency key, for rows not yet written to sentiment_logs.
+        """
+        if key is not None:
+            with self.lock:
+                self.local_keys.add(key)
+        impact = float(impact or 0)
+        hour = int(to_epoch(created_at) // BUCKET_SECONDS)
+        row = np.array([1.0, impact, abs(impact), -impact if impact < 0 else 0.0])
+        with self.lock:
+            self._advance(hour)
+            age = self.head - hour
+            if age >= RING_SIZE - 1:
+                return  # Older than the longest window
+            self.buckets[hour % RING_SIZE] += row
+            for name, width in WINDOWS.items():
+                if age < width:
+                    self.totals[name] += row
+
+    def add_rows(self, rows):
+        for r in rows:
+            if r.get("created_at"):
+                self.add(r["created_at"], r.get("impact_score"))
+
+    def add_stored_rows(self, rows):
+        """
+        Fold sentiment_logs rows (with id) read back from the database, skipping ids
+        already folded in and rows this process added itself. Returns how many were new.
+        """
+        fresh = []
+        with self.lock:
+            for r in rows:
+                row_id = r.get("id")
+                if row_id in self.recent_ids or (self.last_id is not None and row_id <= self.last_id - ID_LOOKBACK):
+                    continue
+                self.recent_ids.add(row_id)
+                if self.last_id is None or row_id > self.last_id:
+                    self.last_id = row_id
+                key = r.get("idempotency_key")
+                if key in self.local_keys:
+                    self.local_keys.discard(key)
+                    continue
+                fresh.append(r)
+            floor = self.last_id - ID_LOOKBACK if self.last_id is not None else None
+            self.recent_ids = {i for i in self.recent_ids if floor is None or i > floor}
+        self.add_rows(fresh)
+        return len(fresh)
+
+    # --- READS (constant time) ---
+    def _totals(self, name, now):
+        with self.lock:
+            self._advance(int((now or time.time()) // BUCKET_SECONDS))
+            return self.totals[name].copy()
+
+    def window(self, name, now=None):
+        """Stats for the last WINDOWS[name] hours."""
+        return _summarize(self._totals(name, now))
+
+    def between(self, newer, older, now=None):
+        """Stats for the slice between two windows, e.g. between("24H", "48H") = yesterday."""
+        return _summarize(self._totals(older, now) - self._totals(newer, now))
+
+    # --- PERSISTENCE ---
+    def save(self, path=METRICS_PATH):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        with self.lock:
+            np.savez(
+                tmp_path,
+                buckets=self.buckets,
+                head=np.array(-1 if self.head is None else self.head),
+                last_id=np.array(-1 if self.last_id is None else self.last_id),
+                recent_ids=np.array(sorted(self.recent_ids), dtype=np.int64),
+                local_keys=np.array(sorted(self.local_keys), dtype=str),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=METRICS_PATH):
+        metrics = cls()
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if data["buckets"].shape != metrics.buckets.shape or "last_id" not in data.files:
+                return None  # Window layout changed (or no id watermark yet), rebuild instead
+            metrics.buckets = data["buckets"].copy()
+            head = int(data["head"])
+            last_id = int(data["last_id"])
+            metrics.last_id = last_id if last_id >= 0 else None
+            metrics.recent_ids = {int(i) for i in data["recent_ids"]}
+            metrics.local_keys = {str(k) for k in data["local_keys"]}
+        if head >= 0:
+            metrics.head = head
+            # Recompute totals from buckets (also clears float drift)
+            for name, width in WINDOWS.items():
+                hours = np.arange(head - width + 1, head + 1) % RING_SIZE
+                metrics.totals[name] = metrics.buckets[hours].sum(axis=0)
+        return metrics
+
+
+def _summarize(total):
+    count, impact, abs_impact, neg_impact = total
+    count = int(round(count))
+    resistance_pct = (neg_impact / abs_impact) * 100 if abs_impact > 1e-9 else 0.0
+    return {
+        "count": count,
+        "avg_impact": float(impact / count) if count else 0.0,
+        "resistance_pct": float(resistance_pct),
+        "consensus_pct": float(100 - resistance_pct) if abs_impact > 1e-9 else 0.0,
+    }
+
+
+def _cutoff_iso():
+    return datetime.fromtimestamp(time.time() - WINDOWS["90D"] * 3600, tz=timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def top_up(metrics, supabase, page_size=1000):
+    """Fold in sentiment_logs rows above the snapshot's id watermark (last 90 days only)."""
+    last_id = max(metrics.last_id - ID_LOOKBACK, 0) if metrics.last_id is not None else None
+    cutoff = _cutoff_iso()
+    added = 0
+    while True:
+        query = supabase.table("sentiment_logs") \
+            .select("id, created_at, impact_score, idempotency_key") \
+            .gte("created_at", cutoff)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        response = query.order("id").limit(page_size).execute()
+        rows = response.data or []
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        added += metrics.add_stored_rows(rows)
+        if len(rows) < page_size:
+            break
+    return added
+
+
+def rebuild_from_supabase(supabase, page_size=1000):
+    """Cold start: one scan of the last 90 days of sentiment_logs."""
+    started = time.time()
+    metrics = TrustMetrics()
+    top_up(metrics, supabase, page_size)
+    print(f"📊 Trust metrics rebuilt from Supabase in {time.time() - started:.1f}s.")
+    return metrics
+
+
+def load_or_rebuild(supabase, path=METRICS_PATH):
+    """Snapshot topped up with rows written since it was saved, otherwise a one-off rebuild (then snapshotted)."""
+    metrics = TrustMetrics.load(path)
+    if metrics is None:
+        metrics = rebuild_from_supabase(supabase)
+    else:
+        added = top_up(metrics, supabase)
+        if added:
+            print(f"📊 Trust metrics: +{added} rows written since the last snapshot.")
+    metrics.save(path)
+    return metrics
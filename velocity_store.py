@@ -0,0 +1,176 @@
+import os
+import time
+import numpy as np
+
+# VIEW-COUNT SNAPSHOT STORE
+# Append-only (video_id, timestamp, views) snapshots, one per video per scrape,
+# held in flat NumPy arrays. Lets the engine tell a video going viral RIGHT NOW
+# from one that spiked days ago, for thousands of videos in one vectorized pass.
+
+STORE_PATH = os.getenv("VELOCITY_STORE_PATH", os.path.join("state", "view_snapshots.npz"))
+
+RECENT_WINDOW_HOURS = 6        # Velocity = views gained over the latest window
+FULL_RES_HOURS = 48            # Keep every snapshot this recent, older ones are downsampled to 1/day
+MAX_SNAPSHOTS_PER_VIDEO = 48   # Hard cap per video after downsampling
+RETENTION_DAYS = 30            # Forget videos not seen for this long
+
+_KEY_SHIFT = np.int64(2 ** 32)  # Composite sort key: (video index << 32) | unix seconds
+
+
+class SnapshotStore:
+    def __init__(self, ids=None, vid=None, ts=None, views=None):
+        self.ids = list(ids) if ids is not None else []
+        self.index = {video_id: i for i, video_id in enumerate(self.ids)}
+        self.vid = vid if vid is not None else np.empty(0, dtype=np.int64)
+        self.ts = ts if ts is not None else np.empty(0, dtype=np.int64)
+        self.views = views if views is not None else np.empty(0, dtype=np.int64)
+        self._sorted = False
+
+    def __len__(self):
+        return len(self.vid)
+
+    # --- PERSISTENCE ---
+    @classmethod
+    def load(cls, path=STORE_PATH):
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path) as data:
+            store = cls(data["ids"].tolist(), data["vid"], data["ts"], data["views"])
+        store._sorted = True  # Always saved compacted (sorted)
+        return store
+
+    def save(self, path=STORE_PATH):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, ids=np.array(self.ids, dtype=str), vid=self.vid, ts=self.ts, views=self.views)
+        os.replace(tmp_path, path)
+
+    # --- WRITES ---
+    def _lookup(self, video_ids, create=False):
+        out = np.empty(len(video_ids), dtype=np.int64)
+        for i, video_id in enumerate(video_ids):
+            video_id = str(video_id)
+            idx = self.index.get(video_id, -1)
+            if idx < 0 and create:
+                idx = len(self.ids)
+                self.ids.append(video_id)
+                self.index[video_id] = idx
+            out[i] = idx
+        return out
+
+    def append(self, video_ids, views, ts=None):
+        """Record one snapshot per video (ts defaults to now, unix seconds). Repeated ids keep the last count."""
+        if not len(video_ids):
+            return
+        # Overlapping search queries can return the same video twice in one batch
+        latest = dict(zip(map(str, video_ids), views))
+        ts = int(ts if ts is not None else time.time())
+        self.vid = np.concatenate([self.vid, self._lookup(list(latest), create=True)])
+        self.ts = np.concatenate([self.ts, np.full(len(latest), ts, dtype=np.int64)])
+        self.views = np.concatenate([self.views, np.fromiter(latest.values(), dtype=np.int64, count=len(latest))])
+        self._sorted = False
+
+    def _sort(self):
+        if self._sorted:
+            return
+        order = np.lexsort((self.ts, self.vid))
+        self.vid, self.ts, self.views = self.vid[order], self.ts[order], self.views[order]
+        self._sorted = True
+
+    def compact(self, now=None):
+        """Downsample old snapshots to one per day, cap per-video history, drop stale videos."""
+        if not len(self):
+            return
+        now = int(now if now is not None else time.time())
+        self._sort()
+        vid, ts, views = self.vid, self.ts, self.views
+
+        # 1. Old snapshots: keep only the last one of each (video, day)
+        day = ts // 86400
+        last_in_day = np.ones(len(vid), dtype=bool)
+        last_in_day[:-1] = (vid[:-1] != vid[1:]) | (day[:-1] != day[1:])
+        keep = (ts >= now - FULL_RES_HOURS * 3600) | last_in_day
+        vid, ts, views = vid[keep], ts[keep], views[keep]
+
+        # 2. Cap history per video (keep the newest N)
+        _, starts, counts = np.unique(vid, return_index=True, return_counts=True)
+        group_end = np.repeat(starts + counts, counts)
+        keep = (group_end - np.arange(len(vid))) <= MAX_SNAPSHOTS_PER_VIDEO
+        vid, ts, views = vid[keep], ts[keep], views[keep]
+
+        # 3. Drop videos whose newest snapshot is past retention, then re-index ids
+        _, starts, counts = np.unique(vid, return_index=True, return_counts=True)
+        latest_ts = ts[starts + counts - 1]
+        alive = np.repeat(latest_ts >= now - RETENTION_DAYS * 86400, counts)
+        vid, ts, views = vid[alive], ts[alive], views[alive]
+
+        used, vid = np.unique(vid, return_inverse=True)
+        self.ids = [self.ids[i] for i in used]
+        self.index = {video_id: i for i, video_id in enumerate(self.ids)}
+        self.vid, self.ts, self.views = vid.astype(np.int64), ts, views
+        self._sorted = True
+
+    # --- READS ---
+    def velocity(self, video_ids, window_hours=RECENT_WINDOW_HOURS):
+        """
+        Vectorized recent-window velocity (views/hr) and acceleration (views/hr^2).
+        Velocity is measured over the window ending at each video's latest snapshot,
+        acceleration compares it with the window before. NaN where a video has
+        fewer than two snapshots.
+        """
+        n = len(video_ids)
+        velocity = np.full(n, np.nan)
+        acceleration = np.full(n, np.nan)
+        if not len(self) or not n:
+            return velocity, acceleration
+
+        self._sort()
+        key = self.vid * _KEY_SHIFT + self.ts
+        q = self._lookup(video_ids)
+        known = q >= 0
+        q = np.where(known, q, 0)
+        window = np.int64(window_hours * 3600)
+
+        first = np.searchsorted(key, q * _KEY_SHIFT, side="left")
+        last = np.searchsorted(key, (q + 1) * _KEY_SHIFT, side="left") - 1
+        known &= (last >= first)
+        last = np.where(known, last, first).clip(0, len(key) - 1)
+        first = first.clip(0, len(key) - 1)
+
+        def anchor(idx):
+            # Latest snapshot at least one window before idx (or the video's first)
+            a = np.searchsorted(key, q * _KEY_SHIFT + self.ts[idx] - window, side="right") - 1
+            return np.maximum(a, first)
+
+        mid = anchor(last)
+        prev = anchor(mid)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            recent_hours = (self.ts[last] - self.ts[mid]) / 3600
+            v_recent = (self.views[last] - self.views[mid]) / recent_hours
+            prev_hours = (self.ts[mid] - self.ts[prev]) / 3600
+            v_prev = (self.views[mid] - self.views[prev]) / prev_hours
+            accel = (v_recent - v_prev) / ((recent_hours + prev_hours) / 2)
+
+        # Snapshots sharing a timestamp span zero hours: no rate to report
+        has_recent = known & (last > mid) & (recent_hours > 0)
+        has_prev = (mid > prev) & (prev_hours > 0)
+        velocity[has_recent] = np.maximum(v_recent[has_recent], 0)
+        acceleration[has_recent] = np.where(has_prev[has_recent], accel[has_recent], 0.0)
+        return velocity, acceleration
+
+    def memory_bytes(self):
+        return self.vid.nbytes + self.ts.nbytes + self.views.nbytes
+
+
+def record_scrape(video_ids, views, path=STORE_PATH):
+    """Append one snapshot per scraped video, compact and persist. Called from save_results."""
+    store = SnapshotStore.load(path)
+    store.append(video_ids, views)
+    store.compact()
+    store.save(path)
+    tracked = len(store.ids)
+    print(f"📈 Velocity store: {len(store)} snapshots for {tracked} videos ({store.memory_bytes() / 1024:.0f} KB).")
+    return store
@@ -0,0 +1,77 @@
+import os
+import uuid
+import socket
+from datetime import datetime, timedelta, timezone
+
+# WORK LEASES (Claim Protocol)
+# Lets any number of analyzer workers (overlapping cron runs, extra hosts)
+# drain the videos backlog without classifying the same video twice.
+# A worker claims a video by stamping claimed_by + lease_expires_at on it with
+# a conditional UPDATE that only matches rows nobody holds (no lease, or an
+# expired one). Postgres re-checks that condition under the row lock, so when
+# two workers race for the same row exactly one of them gets it back.
+# A worker that dies simply lets its leases expire; the rows become claimable
+# again with no cleanup job.
+#
+# Requires on videos: claimed_by text, lease_expires_at timestamptz
+# (index on (is_analyzed, lease_expires_at) recommended).
+
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+LEASE_SECONDS = int(os.getenv("LEASE_SECONDS", "600"))  # Comfortably longer than one batch
+
+
+def _iso(dt):
+    # 'Z' instead of '+00:00' so the value survives PostgREST filter strings intact
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def unclaimed_filter(now=None):
+    """PostgREST or-filter matching rows with no live lease."""
+    now = now or datetime.now(timezone.utc)
+    return f"lease_expires_at.is.null,lease_expires_at.lt.{_iso(now)}"
+
+
+def claim(supabase, video_ids, worker_id=WORKER_ID, lease_seconds=LEASE_SECONDS):
+    """
+    Try to lease the given videos. Returns the set of IDs this worker now holds;
+    anything missing was taken by another worker first.
+    """
+    if not video_ids:
+        return set()
+    now = datetime.now(timezone.utc)
+    response = supabase.table("videos") \
+        .update({"claimed_by": worker_id, "lease_expires_at": _iso(now + timedelta(seconds=lease_seconds))}) \
+        .in_("id", list(video_ids)) \
+        .eq("is_analyzed", False) \
+        .or_(unclaimed_filter(now)) \
+        .execute()
+    return {str(row["id"]) for row in (response.data or [])}
+
+
+def claim_ranked(supabase, candidates, batch_size, worker_id=WORKER_ID, lease_seconds=LEASE_SECONDS):
+    """
+    Claim up to batch_size candidates in priority order. Rows lost to another
+    worker are replaced by the next-best candidates until the pool runs out.
+    Returns (claimed candidates in priority order, number of rows lost to races).
+    """
+    claimed = []
+    lost = 0
+    pos = 0
+    while len(claimed) < batch_size and pos < len(candidates):
+        chunk = candidates[pos:pos + batch_size - len(claimed)]
+        pos += len(chunk)
+        won = claim(supabase, [c["id"] for c in chunk], worker_id, lease_seconds)
+        claimed.extend(c for c in chunk if str(c["id"]) in won)
+        lost += len(chunk) - len(won)
+    return claimed, lost
+
+
+def release(supabase, video_ids, worker_id=WORKER_ID):
+    """Give leases back early (e.g. a video we failed on) so another worker can retry now."""
+    if not video_ids:
+        return
+    supabase.table("videos") \
+        .update({"claimed_by": None, "lease_expires_at": None}) \
+        .in_("id", list(video_ids)) \
+        .eq("claimed_by", worker_id) \
+        .execute()